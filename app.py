@@ -835,31 +835,62 @@ import traceback # For detailed traceback logging
 from dotenv import load_dotenv # To load .env file
 
 # IMPORTS for Flask and Flask-SocketIO
-from flask import Flask, request, jsonify, render_template # Added render_template
+from flask import Flask, request, jsonify, render_template, send_file # Added render_template
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS # For handling CORS with Flask
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
 
 # Patch standard library to be non-blocking with eventlet.
 # This MUST be called as early as possible.
 import eventlet
-eventlet.monkey_patch()
-
-# Imports for document parsing and AI calls
-import fitz  # PyMuPDF for PDF text extraction
+import multiprocessing
+# Pool workers run worker_tasks, not this module. Only when app.py is started as a script do spawned
+# workers re-run it (as __mp_main__) before their first task; they get their own process name, which
+# keeps them from patching the standard library and from opening the process-wide resources below.
+IN_WORKER_PROCESS = multiprocessing.current_process().name != 'MainProcess'
+if not IN_WORKER_PROCESS:
+    eventlet.monkey_patch()
+
+import argparse
+import atexit
+import bisect
+import copy
+import hashlib
+import hmac
+import math
+import multiprocessing.util # Before the pools register their exit handlers, so daemon workers are not terminated first
+import re
+import secrets
+import select
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+# Imports for PDF generation and AI calls
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
-from reportlab.platypus import Paragraph, Spacer, Frame # Added Frame for multi-flowable support in PDF
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
-from reportlab.platypus import SimpleDocTemplate # Added for building PDF with flowables
+from reportlab.platypus import Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
 import httpx # Using httpx for LM Studio API calls
-from docx import Document # For .docx files
-import openpyxl # For .xlsx files
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Document parsing, PDF rendering and ranking run in the worker pools; their code lives in worker_tasks,
+# which reads its limits from the environment, so it is imported once .env is loaded.
+from worker_tasks import (
+    EXTRACTION_MAX_CHARS, PDF_PAGE_BREAK, PREVIEW_IMAGE_MIMETYPES, TEXT_EXTRACTORS, apply_edits_to_template,
+    compute_preliminary_analysis, extract_text_from_document, extract_text_from_xlsx, generate_fallback_pdf,
+    iter_xlsx_text, process_worker_main, rank_resumes, render_pdf_preview,
+)
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -884,9 +915,185 @@ GLOBAL_MODEL_NAME = "gemma3:4b" # Still using gemma3:4b as per your instruction
 # LM Studio API endpoint
 LM_STUDIO_API_URL = "http://192.168.234.1:1234/v1/chat/completions"
 
+# Additional OpenAI-compatible backends: a comma-separated list of chat completion URLs.
+# Requests are routed across all of them; defaults to the single LM_STUDIO_API_URL.
+LM_STUDIO_API_URLS = [url.strip() for url in os.environ.get("LM_STUDIO_API_URLS", LM_STUDIO_API_URL).split(",") if url.strip()]
+LLM_HEALTH_CHECK_INTERVAL = float(os.environ.get("LLM_HEALTH_CHECK_INTERVAL", "15")) # seconds, 0 disables probes
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("LLM_CIRCUIT_FAILURE_THRESHOLD", "3")) # consecutive failures before ejecting a backend
+LLM_CIRCUIT_RESET_TIMEOUT = float(os.environ.get("LLM_CIRCUIT_RESET_TIMEOUT", "30")) # seconds before an ejected backend gets a trial request
+
+# Connection pool settings for the shared LM Studio HTTP client.
+# All values can be overridden from the environment to size the pool against the backend.
+LLM_POOL_MAX_CONNECTIONS = int(os.environ.get("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.environ.get("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_POOL_KEEPALIVE_EXPIRY", "60")) # seconds
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10")) # seconds
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "300")) # seconds
+LLM_POOL_TIMEOUT = float(os.environ.get("LLM_POOL_TIMEOUT", "60")) # seconds to wait for a free connection
+
+# Default sampling parameters sent with LM Studio requests (also part of the response cache key)
+LM_STUDIO_SAMPLING_PARAMS = {
+    "temperature": 0.7,
+    "top_p": 0.7,
+    "max_tokens": 4096,
+}
+
+# Generation profile per result event, so short answers cannot run on for the default 4096 tokens.
+# The output cap is base_output_tokens plus output_tokens_per_prompt_token for each prompt token
+# (only the resume rewrite grows with its input), never above max_tokens.
+LLM_GENERATION_PROFILES = {
+    'analysis_result': {'temperature': 0.7, 'top_p': 0.7, 'base_output_tokens': 512, 'output_tokens_per_prompt_token': 1.0, 'max_tokens': 4096},
+    'interview_prep_materials': {'temperature': 0.7, 'top_p': 0.8, 'base_output_tokens': 1536, 'output_tokens_per_prompt_token': 0, 'max_tokens': 1536},
+    'interview_question': {'temperature': 0.8, 'top_p': 0.9, 'base_output_tokens': 384, 'output_tokens_per_prompt_token': 0, 'max_tokens': 384},
+    'interview_feedback': {'temperature': 0.4, 'top_p': 0.7, 'base_output_tokens': 1024, 'output_tokens_per_prompt_token': 0, 'max_tokens': 1024},
+    'career_roadmap': {'temperature': 0.7, 'top_p': 0.7, 'base_output_tokens': 2048, 'output_tokens_per_prompt_token': 0, 'max_tokens': 2048},
+    # Sub-tasks of a fanned-out analysis (see ANALYSIS_FANOUT_DEFAULT)
+    'analysis_score': {'temperature': 0.5, 'top_p': 0.7, 'base_output_tokens': 768, 'output_tokens_per_prompt_token': 0, 'max_tokens': 768},
+    'analysis_summary': {'temperature': 0.7, 'top_p': 0.7, 'base_output_tokens': 256, 'output_tokens_per_prompt_token': 0, 'max_tokens': 256},
+    'analysis_rewrite': {'temperature': 0.7, 'top_p': 0.7, 'base_output_tokens': 256, 'output_tokens_per_prompt_token': 1.0, 'max_tokens': 4096},
+}
+LLM_OUTPUT_TOKEN_SCALE = float(os.environ.get("LLM_OUTPUT_TOKEN_SCALE", "1")) # multiplies every output cap, e.g. for verbose models
+# Stop reading (and so generating) as soon as the JSON answer has closed with every required field
+LLM_STOP_AFTER_JSON = os.environ.get("LLM_STOP_AFTER_JSON", "true").lower() in ("1", "true", "yes")
+
+# Context window budgeting: prompts are compacted and, if needed, trimmed so that the prompt plus
+# the reserved output (the event's largest max_tokens) fits the model's context window
+LLM_CONTEXT_WINDOW_TOKENS = int(os.environ.get("LLM_CONTEXT_WINDOW_TOKENS", "8192")) # of the loaded model
+LLM_CHARS_PER_TOKEN = float(os.environ.get("LLM_CHARS_PER_TOKEN", "4")) # estimate used instead of a tokenizer
+LLM_CONTEXT_SAFETY_MARGIN_TOKENS = int(os.environ.get("LLM_CONTEXT_SAFETY_MARGIN_TOKENS", "256")) # covers estimation error
+LLM_PROMPT_MIN_SECTION_TOKENS = int(os.environ.get("LLM_PROMPT_MIN_SECTION_TOKENS", "256")) # sections are never trimmed below this
+
+# LLM response cache: a bounded in-memory LRU in front of a persistent SQLite tier.
+# Set LLM_CACHE_DB_PATH to an empty string to keep the cache in memory only.
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MEMORY_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_MAX_ENTRIES", "512"))
+LLM_CACHE_MEMORY_MAX_BYTES = int(os.environ.get("LLM_CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024))) # 64 MB
+LLM_CACHE_DB_PATH = os.environ.get("LLM_CACHE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite3"))
+LLM_CACHE_DISK_MAX_BYTES = int(os.environ.get("LLM_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024))) # 512 MB
+
+# How long (in seconds) a cached LLM response stays valid for each result event. 0 disables caching.
+LLM_CACHE_TTL_SECONDS = {
+    'analysis_result': 24 * 3600,
+    'interview_prep_materials': 7 * 24 * 3600, # Depends on the job description only, so it is widely shared
+    'interview_question': 0, # Sampled with temperature, so every request gets a fresh generation
+    'interview_feedback': 0,
+    'career_roadmap': 24 * 3600,
+    'analysis_score': 24 * 3600,
+    'analysis_summary': 24 * 3600,
+    'analysis_rewrite': 24 * 3600,
+}
+
+# Streaming: when enabled, partial model output is forwarded to the client as progress events.
+# Clients can also opt in per request by sending `stream: true`.
+LLM_STREAMING_DEFAULT = os.environ.get("LLM_STREAMING_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_PROGRESS_EMIT_INTERVAL = float(os.environ.get("LLM_PROGRESS_EMIT_INTERVAL", "0.25")) # seconds between progress emits
+
+# Progress event emitted while each result event is being generated
+PROGRESS_EVENT_NAMES = {
+    'analysis_result': 'analysis_progress',
+    'interview_prep_materials': 'interview_prep_progress',
+    'interview_question': 'interview_question_progress',
+    'interview_feedback': 'interview_feedback_progress',
+    'career_roadmap': 'career_roadmap_progress',
+    'analysis_score': 'analysis_score_progress',
+    'analysis_summary': 'analysis_summary_progress',
+    'analysis_rewrite': 'analysis_progress', # The long part, so existing analysis progress UIs keep working
+}
+
+# Analysis fan-out: score + suggestions, summary and rewrite run as concurrent sub-requests, each emitted
+# as an analysis_partial event when done, followed by the assembled analysis_result.
+# Clients can also opt in per request by sending `fanout: true`.
+ANALYSIS_FANOUT_DEFAULT = os.environ.get("ANALYSIS_FANOUT_ENABLED", "false").lower() in ("1", "true", "yes")
+# Deferred rewrite: the analysis leaves out the full resume rewrite (by far its most expensive output), which is
+# only generated when the client sends request_full_rewrite. Clients can also opt in by sending `defer_rewrite: true`.
+# Independent of fan-out: without it, the analysis stays a single prompt, just without the rewrite.
+ANALYSIS_DEFER_REWRITE_DEFAULT = os.environ.get("ANALYSIS_DEFER_REWRITE", "false").lower() in ("1", "true", "yes")
+
+# LLM job scheduler: caps concurrent generations against the backend and queues the rest.
+LLM_MAX_CONCURRENT_JOBS = int(os.environ.get("LLM_MAX_CONCURRENT_JOBS", "4"))
+LLM_MAX_QUEUED_JOBS_PER_CLIENT = int(os.environ.get("LLM_MAX_QUEUED_JOBS_PER_CLIENT", "5"))
+LLM_MAX_QUEUE_LENGTH = int(os.environ.get("LLM_MAX_QUEUE_LENGTH", "500"))
+
+# Scheduling priority per result event (lower runs first): interactive steps jump ahead of long rewrites
+LLM_EVENT_PRIORITIES = {
+    'interview_feedback': 0,
+    'interview_question': 0,
+    'interview_prep_materials': 1,
+    'analysis_score': 1,
+    'analysis_summary': 1,
+    'career_roadmap': 2,
+    'analysis_result': 2,
+    'analysis_rewrite': 2,
+}
+
+# Maximum number of concurrently running jobs per result event, so long jobs cannot hold every slot
+LLM_EVENT_CONCURRENCY_LIMITS = {
+    'analysis_result': max(1, LLM_MAX_CONCURRENT_JOBS - 1),
+    'analysis_rewrite': max(1, LLM_MAX_CONCURRENT_JOBS - 1),
+    'career_roadmap': max(1, LLM_MAX_CONCURRENT_JOBS - 1),
+}
+
+# Server-side session context (resume, job description, latest analysis) referenced by session_id
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", str(2 * 3600))) # idle time before a session expires
+SESSION_STORE_MAX_ENTRIES = int(os.environ.get("SESSION_STORE_MAX_ENTRIES", "10000"))
+SESSION_STORE_MAX_BYTES = int(os.environ.get("SESSION_STORE_MAX_BYTES", str(256 * 1024 * 1024))) # 256 MB
+
 # File size limit (10 MB)
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024 # 10 MB
 
+# Chunked binary uploads (upload_begin / upload_chunk / upload_complete)
+UPLOAD_CHUNK_SIZE_BYTES = int(os.environ.get("UPLOAD_CHUNK_SIZE_BYTES", str(256 * 1024))) # must stay below the Socket.IO message size limit
+UPLOAD_SPOOL_MAX_MEMORY_BYTES = int(os.environ.get("UPLOAD_SPOOL_MAX_MEMORY_BYTES", str(1024 * 1024))) # larger uploads spill to a temp file
+UPLOAD_TTL_SECONDS = int(os.environ.get("UPLOAD_TTL_SECONDS", "600")) # unused uploads are discarded after this
+UPLOAD_MAX_PENDING_PER_CLIENT = int(os.environ.get("UPLOAD_MAX_PENDING_PER_CLIENT", "2"))
+UPLOAD_MULTIPART_OVERHEAD_BYTES = 64 * 1024 # allowance for multipart headers on POST /api/uploads
+
+# Generated files served from /api/artifacts/<id>
+ARTIFACT_TTL_SECONDS = int(os.environ.get("ARTIFACT_TTL_SECONDS", "3600"))
+ARTIFACT_STORE_MAX_ENTRIES = int(os.environ.get("ARTIFACT_STORE_MAX_ENTRIES", "1000"))
+ARTIFACT_STORE_MAX_BYTES = int(os.environ.get("ARTIFACT_STORE_MAX_BYTES", str(128 * 1024 * 1024))) # 128 MB
+
+# Worker processes for CPU-bound document work, kept off the eventlet hub
+WORKER_POOL_START_METHOD = os.environ.get("WORKER_POOL_START_METHOD", "spawn")
+WORKER_MAX_TASKS_PER_CHILD = int(os.environ.get("WORKER_MAX_TASKS_PER_CHILD", "100")) # recycle workers to bound memory
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_TIMEOUT_SECONDS = float(os.environ.get("EXTRACTION_TIMEOUT_SECONDS", "30")) # runaway parsers are killed after this
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", str(min(2, os.cpu_count() or 1))))
+RENDER_TIMEOUT_SECONDS = float(os.environ.get("RENDER_TIMEOUT_SECONDS", "20")) # slower renders fall back to the basic PDF
+
+# Rendered PDF cache keyed by the rendering inputs, so repeated "apply edits" clicks skip layout
+RENDER_CACHE_MAX_ENTRIES = int(os.environ.get("RENDER_CACHE_MAX_ENTRIES", "256"))
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))) # 64 MB
+RENDERER_VERSION = "1" # Bump when templates or layout change so stale PDFs are not served
+
+# First-page preview images sent with apply_edits when the client asks for `preview`
+PREVIEW_DPI = int(os.environ.get("PREVIEW_DPI", "60"))
+PREVIEW_MAX_DPI = int(os.environ.get("PREVIEW_MAX_DPI", "150")) # upper bound for a client-requested preview_dpi
+PREVIEW_IMAGE_FORMAT = os.environ.get("PREVIEW_IMAGE_FORMAT", "png") # "png" or "jpeg"
+
+# Local TF-IDF pre-score, emitted as preliminary_analysis before the LLM analysis finishes
+PRESCORE_ENABLED = os.environ.get("PRESCORE_ENABLED", "true").lower() in ("1", "true", "yes")
+PRESCORE_SKIP_LLM_BELOW = int(os.environ.get("PRESCORE_SKIP_LLM_BELOW", "0")) # skip the LLM below this pre-score (1-10); 0 never skips
+
+# Bulk candidate ranking (POST /api/rank)
+RANK_MAX_CANDIDATES = int(os.environ.get("RANK_MAX_CANDIDATES", "5000"))
+RANK_MAX_REQUEST_BYTES = int(os.environ.get("RANK_MAX_REQUEST_BYTES", str(64 * 1024 * 1024))) # 64 MB
+RANK_TIMEOUT_SECONDS = float(os.environ.get("RANK_TIMEOUT_SECONDS", "120"))
+RANK_WORKERS = int(os.environ.get("RANK_WORKERS", "1")) # separate from the extraction workers, so ranking never delays uploads
+
+# Offline batch analysis (python app.py batch ...)
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", str(LLM_MAX_CONCURRENT_JOBS))) # concurrent LLM analyses
+
+# Extracted text cache keyed by the SHA-256 of the uploaded bytes, so re-uploading a resume skips parsing.
+# Set EXTRACTION_CACHE_DB_PATH to an empty string to keep the cache in memory only.
+EXTRACTION_CACHE_ENABLED = os.environ.get("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EXTRACTION_CACHE_MEMORY_MAX_ENTRIES = int(os.environ.get("EXTRACTION_CACHE_MEMORY_MAX_ENTRIES", "256"))
+EXTRACTION_CACHE_MEMORY_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MEMORY_MAX_BYTES", str(32 * 1024 * 1024))) # 32 MB
+EXTRACTION_CACHE_DB_PATH = os.environ.get("EXTRACTION_CACHE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_cache.sqlite3"))
+EXTRACTION_CACHE_DISK_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_DISK_MAX_BYTES", str(128 * 1024 * 1024))) # 128 MB
+EXTRACTION_CACHE_TTL_SECONDS = int(os.environ.get("EXTRACTION_CACHE_TTL_SECONDS", str(30 * 24 * 3600))) # 30 days
+EXTRACTOR_VERSION = "4" # Bump when extraction output changes so stale cached text is not served
+
 # Allowed MIME types (for server-side validation)
 ALLOWED_MIME_TYPES = {
     'application/pdf': '.pdf',
@@ -894,61 +1101,7 @@ ALLOWED_MIME_TYPES = {
     'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx',
 }
 
-# --- Utility Functions for Text Extraction ---
-
-def extract_text_from_pdf(pdf_bytes):
-    """
-    Extracts text content from PDF bytes using PyMuPDF.
-    """
-    text_content = ""
-    try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text_content += page.get_text()
-        doc.close()
-    except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
-        return None
-    return text_content
-
-def extract_text_from_docx(docx_bytes):
-    """
-    Extracts text content from DOCX bytes using python-docx.
-    """
-    text_content = ""
-    try:
-        doc = Document(io.BytesIO(docx_bytes))
-        for paragraph in doc.paragraphs:
-            text_content += paragraph.text + "\n"
-    except Exception as e:
-        print(f"Error extracting text from DOCX: {e}")
-        return None
-    return text_content
-
-def extract_text_from_xlsx(xlsx_bytes):
-    """
-    Extracts text content from XLSX bytes using openpyxl.
-    Iterates through all sheets and cells.
-    """
-    text_content = ""
-    try:
-        workbook = openpyxl.load_workbook(io.BytesIO(xlsx_bytes))
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text_content += f"--- Sheet: {sheet_name} ---\n"
-            for row in sheet.iter_rows():
-                row_values = []
-                for cell in row:
-                    if cell.value is not None:
-                        row_values.append(str(cell.value))
-                if row_values:
-                    text_content += " ".join(row_values) + "\n"
-            text_content += "\n"
-    except Exception as e:
-        print(f"Error extracting text from XLSX: {e}")
-        return None
-    return text_content
+# --- Utility Functions for PDF Generation ---
 
 def generate_pdf_from_text_basic(text_content):
     """
@@ -985,113 +1138,1272 @@ def generate_pdf_from_text_basic(text_content):
     return buffer.getvalue()
 
 
-def apply_edits_to_template(edited_text: str, revised_summary: str, template_name: str) -> bytes:
+# --- Resume Sections ---
+
+# Canonical resume sections and the headings that introduce them (matched case-insensitively)
+RESUME_SECTION_HEADINGS = {
+    'summary': ("summary", "professional summary", "career summary", "profile", "professional profile",
+                "objective", "career objective", "about me"),
+    'experience': ("experience", "work experience", "professional experience", "relevant experience",
+                   "employment", "employment history", "work history", "career history", "professional background",
+                   "internships", "internship", "internship experience", "industry experience", "positions held"),
+    'projects': ("projects", "key projects", "personal projects", "selected projects"),
+    'skills': ("skills", "technical skills", "key skills", "core competencies", "competencies",
+               "technologies", "tools and technologies", "skills and tools"),
+    'education': ("education", "academic background", "education and training", "certifications",
+                  "certificates", "licenses and certifications", "courses", "training"),
+    'other': ("awards", "achievements", "honors", "publications", "languages", "interests",
+              "volunteering", "volunteer experience", "references"),
+}
+RESUME_SECTION_ORDER = ('contact', 'summary', 'experience', 'projects', 'skills', 'education', 'other')
+RESUME_HEADING_LOOKUP = {alias: name for name, aliases in RESUME_SECTION_HEADINGS.items() for alias in aliases}
+# Leading words that qualify a heading without changing its section ("Relevant Work Experience")
+RESUME_HEADING_QUALIFIERS = ("relevant", "professional", "work", "key", "selected", "additional", "technical",
+                             "core", "academic", "other", "personal", "related", "recent")
+RESUME_BULLET_PATTERN = re.compile(r"^(?:[-*•▪●◦–]|\d+[.)])\s*")
+
+# Sections each prompt needs; the full resume is only sent for analysis and rewriting
+INTERVIEW_QUESTION_RESUME_SECTIONS = ('summary', 'experience', 'projects', 'skills')
+INTERVIEW_FEEDBACK_RESUME_SECTIONS = ('experience', 'projects')
+CAREER_ROADMAP_RESUME_SECTIONS = ('summary', 'experience', 'projects', 'skills', 'education', 'other')
+
+
+def resume_section_for_heading(line):
+    """
+    Returns the canonical section a heading line starts, or None for ordinary lines.
+    Known headings match exactly, also after dropping qualifiers ("Relevant Work Experience").
+    A line set like a heading (upper or title case, or ending in a colon) that joins a known heading
+    with "and"/"&" matches that heading, so "Work Experience & Internships" counts as experience.
+    """
+    if len(line) > 40:
+        return None
+    words = re.sub(r"[^a-z ]+", " ", line.lower().replace("&", " and ")).split()
+    section = RESUME_HEADING_LOOKUP.get(" ".join(words))
+    while section is None and len(words) > 1 and words[0] in RESUME_HEADING_QUALIFIERS:
+        words = words[1:]
+        section = RESUME_HEADING_LOOKUP.get(" ".join(words))
+    heading_cased = all(word[0].isupper() for word in re.findall(r"[A-Za-z]+", line) if word not in ("and", "of", "the"))
+    if section is None and (heading_cased or line.rstrip().endswith(':')):
+        for length in range(len(words) - 1, 0, -1):
+            section = RESUME_HEADING_LOOKUP.get(" ".join(words[:length])) if words[length] == "and" else None
+            if section:
+                break
+    return section
+
+
+def parse_resume_sections(resume_text):
     """
-    Applies edited resume text and revised summary to a selected template (conceptually)
-    and generates a PDF. This function uses ReportLab for basic PDF generation.
+    Splits extracted resume text into canonical sections, after compaction so that page headers and
+    footers do not leak into them. Text before the first recognised heading is the contact block.
+    The experience section is split into one entry per role: a new entry starts at a non-bullet line
+    after the previous entry's bullets.
+    Returns a dict with a string per section, except 'experience' which is a list of entry strings.
+    """
+    lines = {name: [] for name in RESUME_SECTION_ORDER}
+    current = 'contact'
+    for line in compact_prompt_text(resume_text).splitlines():
+        section = resume_section_for_heading(line) if line else None
+        if section:
+            current = section
+        elif line:
+            lines[current].append(line)
+
+    entries = []
+    entry_has_bullets = False
+    for line in lines['experience']:
+        is_bullet = bool(RESUME_BULLET_PATTERN.match(line))
+        if not entries or (entry_has_bullets and not is_bullet):
+            entries.append([])
+            entry_has_bullets = False
+        entries[-1].append(line)
+        entry_has_bullets = entry_has_bullets or is_bullet
+
+    sections = {name: "\n".join(section_lines) for name, section_lines in lines.items()}
+    sections['experience'] = ["\n".join(entry) for entry in entries]
+    return sections
+
+
+def format_resume_sections(sections, names):
+    """
+    Renders the requested sections as headed plain text for a prompt. When none of them were found
+    (the resume has no recognisable headings), or experience is requested but was not found under
+    any heading we know, every section is rendered so nothing is lost.
+    """
+    def render(section_names):
+        parts = []
+        for name in section_names:
+            content = sections.get(name)
+            if isinstance(content, list):
+                content = "\n\n".join(content)
+            if content:
+                parts.append(content if name == 'contact' else f"{name.upper()}\n{content}")
+        return "\n\n".join(parts)
+
+    if 'experience' in names and not sections.get('experience'):
+        return render(RESUME_SECTION_ORDER)
+    return render(names) or render(RESUME_SECTION_ORDER)
 
-    Template options (`template_name`) are just for demonstration here, affecting
-    the PDF's title and basic styling, not loading actual visual templates.
+
+# --- Local Pre-Scoring ---
+
+def preliminary_analysis_result(preliminary):
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter,
-                            rightMargin=inch, leftMargin=inch,
-                            topMargin=inch, bottomMargin=inch)
-    
-    styles = getSampleStyleSheet()
+    Builds an analysis_result payload from the pre-score alone, for pairs too mismatched to send to the LLM.
+    """
+    suggestions = ["This resume covers few of the job description's key terms; check whether the role is a good fit before tailoring it."]
+    suggestions.extend(f"If you have experience with '{keyword}', make it visible in your resume." for keyword in preliminary['missing_keywords'][:8])
+    return {
+        'score': preliminary['score'],
+        'suggestions': suggestions,
+        'revised_summary': '',
+        'ai_revised_full_resume_text': '',
+        'preliminary_only': True,
+    }
 
-    style_heading = ParagraphStyle(
-        'Heading',
-        parent=styles['h1'],
-        fontSize=24,
-        leading=28,
-        alignment=TA_CENTER,
-        spaceAfter=14
-    )
-    style_summary = ParagraphStyle(
-        'Summary',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=13,
-        alignment=TA_CENTER,
-        spaceAfter=12,
-        fontName='Helvetica-Oblique'
-    )
-    style_normal = ParagraphStyle(
-        'Normal',
-        parent=styles['Normal'],
-        fontSize=10,
-        leading=12,
-        alignment=TA_JUSTIFY,
-        spaceAfter=6
-    )
-    style_bullet = ParagraphStyle(
-        'Bullet',
-        parent=styles['Normal'],
-        fontSize=10,
-        leading=12,
-        alignment=TA_LEFT,
-        leftIndent=0.5 * inch,
-        bulletIndent=0.25 * inch,
-        bulletFontName='Helvetica',
-        spaceAfter=3
-    )
-    style_h2 = ParagraphStyle(
-        'H2',
-        parent=styles['h2'],
-        fontSize=14,
-        leading=16,
-        alignment=TA_LEFT,
-        spaceAfter=10
-    )
 
-    story = []
+# --- Cache Utilities ---
 
-    story.append(Paragraph(f"AI-Enhanced Resume ({template_name})", style_heading))
-    
-    if revised_summary:
-        story.append(Paragraph("Professional Summary", style_h2))
-        story.append(Paragraph(revised_summary, style_summary))
-        story.append(Spacer(1, 0.2 * inch))
-
-    story.append(Paragraph("--- Main Resume Content ---", style_h2))
-
-    lines = edited_text.split('\n')
-    for line in lines:
-        stripped_line = line.strip()
-        if stripped_line.startswith('- '):
-            story.append(Paragraph(stripped_line.lstrip('- ').strip(), style_bullet))
-        elif stripped_line:
-            story.append(Paragraph(stripped_line, style_normal))
+class BoundedLRUCache:
+    """
+    In-memory LRU cache bounded by entry count and total size in bytes.
+    Entries may carry their own time-to-live.
+    """
+
+    def __init__(self, max_entries, max_bytes, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict() # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None, refresh_ttl=None):
+        """
+        Returns the value for `key` and marks it most recently used.
+        With `refresh_ttl`, a hit also pushes the entry's expiry to `refresh_ttl` seconds from now.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            now = time.time()
+            if expires_at is not None and expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            if refresh_ttl:
+                self._entries[key] = (value, size, now + refresh_ttl)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, size=None):
+        if size is None:
+            size = self._sizeof(value)
+        if size > self.max_bytes:
+            return False # Never let a single oversized entry flush the whole cache
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.time())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class SQLiteCacheStore:
+    """
+    Persistent cache tier backed by a single SQLite table.
+    When the stored payloads exceed `max_bytes`, expired rows are dropped first,
+    then the least recently used ones.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries (last_access)")
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns `(value_bytes, expires_at)` or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return bytes(value), expires_at
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        size = len(value)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.total_bytes -= row[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), size, expires_at, now),
+            )
+            self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now):
+        target = int(self.max_bytes * 0.9) # Free some headroom so eviction does not run on every write
+        expired_bytes, expired_count = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).fetchone()
+        self._conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        self.total_bytes -= expired_bytes
+        self.evictions += expired_count
+        while self.total_bytes > target:
+            rows = self._conn.execute("SELECT key, size FROM cache_entries ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.evictions += 1
+                if self.total_bytes <= target:
+                    break
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'path': self.path,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class TieredCache:
+    """
+    JSON value cache with a BoundedLRUCache in front of an optional SQLiteCacheStore.
+    Disk hits are promoted back into memory with their remaining time-to-live.
+    Values are copied in and out, so callers are free to mutate what they store or get back.
+    """
+
+    def __init__(self, name, memory_max_entries, memory_max_bytes, db_path=None, disk_max_bytes=0):
+        self.name = name
+        self.memory = BoundedLRUCache(memory_max_entries, memory_max_bytes)
+        self.disk = None
+        if db_path:
+            try:
+                self.disk = SQLiteCacheStore(db_path, disk_max_bytes)
+            except sqlite3.Error as e:
+                print(f"WARNING: Could not open {name} cache database at {db_path}, using memory only: {e}")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return copy.deepcopy(value)
+        if self.disk is not None:
+            try:
+                found = self.disk.get(key)
+            except sqlite3.Error as e:
+                print(f"WARNING: {self.name} cache disk read failed: {e}")
+                found = None
+            if found is not None:
+                raw, expires_at = found
+                value = json.loads(raw)
+                ttl = expires_at - time.time() if expires_at is not None else None
+                self.memory.set(key, json.loads(raw), ttl=ttl, size=len(raw))
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        raw = json.dumps(value).encode('utf-8')
+        self.memory.set(key, json.loads(raw), ttl=ttl, size=len(raw))
+        if self.disk is not None:
+            try:
+                self.disk.set(key, raw, ttl=ttl)
+            except sqlite3.Error as e:
+                print(f"WARNING: {self.name} cache disk write failed: {e}")
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None,
+        }
+
+
+# --- Worker Process Pool ---
+
+class WorkerTaskError(Exception):
+    """A task failed inside a worker process, or its worker died while running it."""
+
+
+class WorkerTimeout(WorkerTaskError):
+    """A task exceeded its time limit; the worker process running it was killed."""
+
+
+class ProcessWorkerPool:
+    """
+    Bounded pool of long-lived worker processes for CPU-bound work that eventlet cannot make
+    cooperative (document parsing, PDF layout). Callers wait for a free worker and for the
+    result cooperatively, so the hub keeps serving other sockets meanwhile.
+    A task that exceeds its timeout gets its worker killed and replaced; workers are also
+    recycled after `max_tasks_per_worker` tasks to bound memory growth in the parsers.
+    """
+
+    class _Worker:
+        def __init__(self, process, conn):
+            self.process = process
+            self.conn = conn
+            self.tasks_done = 0
+
+    def __init__(self, name, max_workers, task_timeout, max_tasks_per_worker=100, start_method='spawn'):
+        self.name = name
+        self.max_workers = max_workers
+        self.task_timeout = task_timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = multiprocessing.get_context(start_method)
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.waiting = 0
+        self.running = 0
+        self.peak_waiting = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.workers_started = 0
+        self.workers_killed = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """
+        Runs `fn(*args, **kwargs)` in a worker process and returns its result.
+        `fn` and its arguments must be picklable (module-level functions and plain data).
+        Raises WorkerTimeout or WorkerTaskError on failure.
+        """
+        if self._closed:
+            raise WorkerTaskError(f"The {self.name} worker pool is shut down.")
+        timeout = self.task_timeout if timeout is None else timeout
+        enqueued_at = time.monotonic()
+        with self._lock:
+            self.submitted += 1
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+        self._slots.acquire() # Cooperative wait for a free worker slot
+        started_at = time.monotonic()
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+            self.total_wait_seconds += started_at - enqueued_at
+        worker = None
+        try:
+            worker = self._checkout()
+            try:
+                worker.conn.send((fn, args, kwargs))
+            except (BrokenPipeError, EOFError, OSError):
+                # The idle worker died since its last task; replace it once
+                self._kill(worker)
+                worker = self._spawn()
+                worker.conn.send((fn, args, kwargs))
+
+            ready, _, _ = select.select([worker.conn], [], [], timeout)
+            if not ready:
+                self._kill(worker)
+                worker = None
+                with self._lock:
+                    self.timeouts += 1
+                    self.failed += 1
+                raise WorkerTimeout(f"{self.name} task did not finish within {timeout:.0f} seconds and was stopped.")
+            try:
+                ok, value = worker.conn.recv()
+            except (EOFError, OSError):
+                exit_code = worker.process.exitcode
+                self._kill(worker)
+                worker = None
+                with self._lock:
+                    self.failed += 1
+                raise WorkerTaskError(f"{self.name} worker process died while running the task (exit code {exit_code}).")
+            worker.tasks_done += 1
+            with self._lock:
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            if not ok:
+                raise WorkerTaskError(value)
+            return value
+        finally:
+            if worker is not None:
+                self._checkin(worker)
+            with self._lock:
+                self.running -= 1
+                self.total_run_seconds += time.monotonic() - started_at
+            self._slots.release()
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=process_worker_main, args=(child_conn,),
+                                        name=f"{self.name}-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        with self._lock:
+            self.workers_started += 1
+        return self._Worker(process, parent_conn)
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.conn.close()
+        return self._spawn()
+
+    def _checkin(self, worker):
+        if self._closed or worker.tasks_done >= self.max_tasks_per_worker:
+            self._stop(worker)
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def _stop(self, worker):
+        try:
+            worker.conn.send(None)
+        except OSError:
+            pass
+        worker.process.join(timeout=1)
+        if worker.process.is_alive():
+            self._kill(worker)
         else:
-            story.append(Spacer(1, 0.1 * inch))
+            worker.conn.close()
+
+    def _kill(self, worker):
+        if worker.process.is_alive():
+            worker.process.kill()
+            with self._lock:
+                self.workers_killed += 1
+        worker.process.join(timeout=5)
+        worker.conn.close()
+
+    def shutdown(self, timeout=2):
+        """
+        Stops every idle worker; busy workers are stopped when their task returns.
+        Runs at interpreter exit, when the eventlet hub can no longer wait on pipes, so instead of
+        sending a stop message the pool closes each worker's pipe: the worker reads end-of-file and
+        exits on its own. Workers still alive after `timeout` seconds are terminated.
+        """
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.conn.close()
+        deadline = time.monotonic() + timeout
+        for worker in idle:
+            worker.process.join(timeout=max(0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(timeout=1)
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                'max_workers': self.max_workers,
+                'idle_workers': len(self._idle),
+                'running': self.running,
+                'queue_depth': self.waiting,
+                'peak_queue_depth': self.peak_waiting,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'workers_started': self.workers_started,
+                'workers_killed': self.workers_killed,
+                'avg_wait_seconds': self.total_wait_seconds / max(1, finished + self.running),
+                'avg_run_seconds': self.total_run_seconds / max(1, finished),
+            }
+
+
+# --- Document Extraction Workers ---
+
+extraction_pool = ProcessWorkerPool(
+    'extraction',
+    max_workers=EXTRACTION_WORKERS,
+    task_timeout=EXTRACTION_TIMEOUT_SECONDS,
+    max_tasks_per_worker=WORKER_MAX_TASKS_PER_CHILD,
+    start_method=WORKER_POOL_START_METHOD,
+)
+if not IN_WORKER_PROCESS:
+    atexit.register(extraction_pool.shutdown)
+
+
+def extract_text_off_loop(file_bytes, file_type):
+    """
+    Extracts document text in the extraction process pool and waits for it cooperatively,
+    so parsing a large file does not freeze other clients' sockets.
+    Raises WorkerTimeout if the parser runs away; returns None if the document is unreadable.
+    """
+    return extraction_pool.run(extract_text_from_document, file_bytes, file_type)
+
+
+extraction_cache = None
+if EXTRACTION_CACHE_ENABLED and not IN_WORKER_PROCESS:
+    extraction_cache = TieredCache(
+        'extraction',
+        memory_max_entries=EXTRACTION_CACHE_MEMORY_MAX_ENTRIES,
+        memory_max_bytes=EXTRACTION_CACHE_MEMORY_MAX_BYTES,
+        db_path=EXTRACTION_CACHE_DB_PATH,
+        disk_max_bytes=EXTRACTION_CACHE_DISK_MAX_BYTES,
+    )
+    atexit.register(extraction_cache.close)
+
+
+def extraction_cache_key(file_bytes, file_type, digest=None):
+    """
+    Builds the extraction cache key from the raw document bytes, its type and the extractor version.
+    `digest` is the SHA-256 hex digest of the bytes, when it is already known.
+    """
+    digest = digest or hashlib.sha256(file_bytes).hexdigest()
+    return f"{EXTRACTOR_VERSION}:{file_type}:{digest}"
+
+
+def extract_document_text(file_bytes, file_type, digest=None):
+    """
+    Returns the text of an uploaded document, parsing it only if the same bytes were not seen before.
+    Only successful extractions are cached, so a document that failed to parse is retried next time.
+    `file_bytes` may also be a function that loads the bytes, passed with their `digest`; it is only
+    called on a cache miss, so a document seen before is never read into memory.
+    """
+    load = file_bytes if callable(file_bytes) else lambda: file_bytes
+    if extraction_cache is None:
+        return extract_text_off_loop(load(), file_type)
+    cache_key = extraction_cache_key(None if callable(file_bytes) else file_bytes, file_type, digest)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        print(f"INFO: Extraction cache hit for {file_type} (sha256 {cache_key.rsplit(':', 1)[-1][:12]}), skipping parsing.")
+        return cached
+    text = extract_text_off_loop(load(), file_type)
+    if text:
+        extraction_cache.set(cache_key, text, ttl=EXTRACTION_CACHE_TTL_SECONDS)
+    return text
 
+
+
+# --- PDF Rendering Workers ---
+
+render_pool = ProcessWorkerPool(
+    'render',
+    max_workers=RENDER_WORKERS,
+    task_timeout=RENDER_TIMEOUT_SECONDS,
+    max_tasks_per_worker=WORKER_MAX_TASKS_PER_CHILD,
+    start_method=WORKER_POOL_START_METHOD,
+)
+if not IN_WORKER_PROCESS:
+    atexit.register(render_pool.shutdown)
+
+render_cache = BoundedLRUCache(RENDER_CACHE_MAX_ENTRIES, RENDER_CACHE_MAX_BYTES)
+
+
+def render_cache_key(edited_text, revised_summary, template_name):
+    """Hashes every input that affects the rendered PDF, including the renderer version."""
+    material = json.dumps([RENDERER_VERSION, template_name, revised_summary, edited_text])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def render_resume_pdf(edited_text, revised_summary, template_name):
+    """
+    Lays out the templated resume PDF in the render process pool, so ReportLab does not stall the hub.
+    Identical requests are answered from render_cache without a layout pass.
+    Falls back to the basic canvas PDF (not cached) if the worker fails or the render times out.
+    Returns `(pdf_bytes, cache_key)`; the key is None for the fallback PDF.
+    """
+    cache_key = render_cache_key(edited_text, revised_summary, template_name)
+    cached = render_cache.get(cache_key)
+    if cached is not None:
+        print(f"INFO: Render cache hit for '{template_name}'.")
+        return cached, cache_key
     try:
-        doc.build(story)
-    except Exception as e:
-        print(f"Error building PDF with ReportLab: {e}")
-        traceback.print_exc()
-        fallback_buffer = io.BytesIO()
-        p_fallback = canvas.Canvas(fallback_buffer, pagesize=letter)
-        p_fallback.drawString(inch, letter[1] - inch, "Error generating templated PDF.")
-        p_fallback.drawString(inch, letter[1] - inch - 20, "Please see backend logs for details.")
-        p_fallback.drawString(inch, letter[1] - inch - 40, "Generated Content (Basic):")
-        p_fallback.drawString(inch, letter[1] - inch - 60, edited_text[:500] + "...")
-        p_fallback.save()
-        fallback_buffer.seek(0)
-        return fallback_buffer.getvalue()
+        pdf_bytes = render_pool.run(apply_edits_to_template, edited_text, revised_summary, template_name)
+        render_cache.set(cache_key, pdf_bytes)
+        return pdf_bytes, cache_key
+    except WorkerTimeout as e:
+        print(f"ERROR: PDF rendering timed out, using the fallback PDF: {e}")
+    except WorkerTaskError as e:
+        print(f"ERROR: PDF rendering failed, using the fallback PDF: {e}")
+    return generate_fallback_pdf(edited_text), None
 
-    buffer.seek(0)
-    return buffer.getvalue()
+
+def render_resume_preview(pdf_bytes, dpi=None):
+    """
+    Returns `(image_bytes, mimetype)` for a first-page preview of a rendered PDF, or None on failure.
+    Previews are rasterized in the render pool and cached alongside the PDFs.
+    """
+    image_format = PREVIEW_IMAGE_FORMAT if PREVIEW_IMAGE_FORMAT in PREVIEW_IMAGE_MIMETYPES else 'png'
+    try:
+        dpi = max(24, min(int(dpi or PREVIEW_DPI), PREVIEW_MAX_DPI))
+    except (TypeError, ValueError):
+        dpi = PREVIEW_DPI
+    cache_key = f"preview:{hashlib.sha256(pdf_bytes).hexdigest()}:{dpi}:{image_format}"
+    image_bytes = render_cache.get(cache_key)
+    if image_bytes is None:
+        try:
+            image_bytes = render_pool.run(render_pdf_preview, pdf_bytes, dpi, image_format)
+        except WorkerTaskError as e:
+            print(f"ERROR: Preview rendering failed: {e}")
+            return None
+        render_cache.set(cache_key, image_bytes)
+    return image_bytes, PREVIEW_IMAGE_MIMETYPES[image_format]
+
+
+# --- Candidate Ranking Workers ---
+
+# Bulk ranking jobs are large (up to RANK_MAX_REQUEST_BYTES of text) and slow, so they get their own pool
+rank_pool = ProcessWorkerPool(
+    'rank',
+    max_workers=RANK_WORKERS,
+    task_timeout=RANK_TIMEOUT_SECONDS,
+    max_tasks_per_worker=WORKER_MAX_TASKS_PER_CHILD,
+    start_method=WORKER_POOL_START_METHOD,
+)
+if not IN_WORKER_PROCESS:
+    atexit.register(rank_pool.shutdown)
+
+# --- Shared LLM HTTP Client Pool ---
+
+class LLMClientPool:
+    """
+    Long-lived httpx client shared by every LM Studio call.
+    Connections to the model server are kept alive and reused between prompts
+    instead of paying TCP setup for each analysis, question or roadmap.
+    """
+
+    def __init__(self, max_connections, max_keepalive, keepalive_expiry,
+                 connect_timeout, read_timeout, pool_timeout):
+        self.max_connections = max_connections
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=pool_timeout)
+        self._client = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_requests = 0
+        self._pool_waits = 0
+        self._pool_timeouts = 0
+
+    def start(self):
+        """Creates the underlying client. Safe to call more than once."""
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(limits=self.limits, timeout=self.timeout)
+                print(f"INFO: LLM client pool started (max_connections={self.limits.max_connections}, "
+                      f"max_keepalive={self.limits.max_keepalive_connections}, keepalive_expiry={self.limits.keepalive_expiry}s).")
+            return self._client
+
+    def close(self):
+        """Closes the client and every pooled connection."""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+            print("INFO: LLM client pool closed.")
+
+    @contextmanager
+    def _track_request(self):
+        with self._lock:
+            if self._in_flight >= self.max_connections:
+                self._pool_waits += 1 # Every connection is busy, this request has to queue in the pool
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._total_requests += 1
+        try:
+            yield
+        except httpx.PoolTimeout:
+            with self._lock:
+                self._pool_timeouts += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def post(self, url, **kwargs):
+        """Sends a POST request over a pooled connection."""
+        client = self._client or self.start()
+        with self._track_request():
+            return client.post(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        """Sends a GET request over a pooled connection (used for health probes)."""
+        client = self._client or self.start()
+        return client.get(url, **kwargs)
+
+    @contextmanager
+    def stream(self, method, url, **kwargs):
+        """Streams a response over a pooled connection; the connection is held until the block exits."""
+        client = self._client or self.start()
+        with self._track_request():
+            with client.stream(method, url, **kwargs) as response:
+                yield response
+
+    def stats(self):
+        """Returns a snapshot of pool usage for sizing the pool against the backend."""
+        connections = []
+        client = self._client
+        if client is not None:
+            # httpx does not expose its connection pool publicly, so read it defensively.
+            pool = getattr(getattr(client, '_transport', None), '_pool', None)
+            connections = list(getattr(pool, 'connections', []) or [])
+        idle = sum(1 for conn in connections if conn.is_idle())
+        with self._lock:
+            return {
+                'started': client is not None,
+                'max_connections': self.limits.max_connections,
+                'max_keepalive_connections': self.limits.max_keepalive_connections,
+                'keepalive_expiry': self.limits.keepalive_expiry,
+                'open_connections': len(connections),
+                'in_use_connections': len(connections) - idle,
+                'idle_connections': idle,
+                'in_flight_requests': self._in_flight,
+                'peak_in_flight_requests': self._peak_in_flight,
+                'total_requests': self._total_requests,
+                'pool_waits': self._pool_waits,
+                'pool_timeouts': self._pool_timeouts,
+            }
+
+
+# Created once at startup (not in pool workers) and shared by all background tasks; closed on interpreter shutdown.
+llm_client_pool = LLMClientPool(
+    max_connections=LLM_POOL_MAX_CONNECTIONS,
+    max_keepalive=LLM_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+    connect_timeout=LLM_CONNECT_TIMEOUT,
+    read_timeout=LLM_READ_TIMEOUT,
+    pool_timeout=LLM_POOL_TIMEOUT,
+)
+if not IN_WORKER_PROCESS:
+    llm_client_pool.start()
+    atexit.register(llm_client_pool.close)
+
+
+# --- LLM Backend Router ---
+
+class LLMBackendUnavailable(Exception):
+    """Raised when every configured LLM backend is ejected by its circuit breaker."""
+
+
+class LLMBackend:
+    """One OpenAI-compatible model server and its routing/circuit-breaker state."""
+
+    def __init__(self, url):
+        self.url = url
+        if url.endswith('/chat/completions'):
+            self.health_url = url[:-len('/chat/completions')] + '/models'
+        else:
+            self.health_url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.state = 'closed' # closed: healthy, open: ejected, half_open: one trial request allowed
+        self.opened_at = None
+        self.total_requests = 0
+        self.total_failures = 0
+        self.last_error = None
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'state': self.state,
+            'outstanding': self.outstanding,
+            'consecutive_failures': self.consecutive_failures,
+            'total_requests': self.total_requests,
+            'total_failures': self.total_failures,
+            'last_error': self.last_error,
+        }
+
+
+class LLMBackendRouter:
+    """
+    Routes LLM requests across several OpenAI-compatible backends.
+    Each request goes to the healthy backend with the fewest outstanding requests.
+    A backend that fails `failure_threshold` times in a row is ejected (circuit open)
+    for `reset_timeout` seconds, then gets a single trial request (half open).
+    Background health probes close the circuit again as soon as the backend answers.
+    """
+
+    def __init__(self, urls, failure_threshold, reset_timeout, health_check_interval):
+        self.backends = [LLMBackend(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._health_checks_started = False
+
+    def acquire(self, exclude=()):
+        """Reserves the least loaded available backend, or raises LLMBackendUnavailable."""
+        self.ensure_health_checks()
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for backend in self.backends:
+                if backend in exclude:
+                    continue
+                if backend.state == 'open' and now - backend.opened_at >= self.reset_timeout:
+                    backend.state = 'half_open'
+                if backend.state == 'closed' or (backend.state == 'half_open' and backend.outstanding == 0):
+                    candidates.append(backend)
+            if not candidates:
+                raise LLMBackendUnavailable(
+                    f"No healthy LLM backend available ({len(self.backends)} configured, all ejected or already tried)."
+                )
+            backend = min(candidates, key=lambda b: (b.outstanding, b.total_requests))
+            backend.outstanding += 1
+            backend.total_requests += 1
+            return backend
+
+    def release(self, backend, error=None):
+        """Returns a backend reserved with acquire() and records whether the request failed."""
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                self._record_success(backend)
+            else:
+                self._record_failure(backend, error)
+
+    @staticmethod
+    def is_backend_failure(error):
+        """Whether an exception says something about the backend's health (not about our request)."""
+        if isinstance(error, httpx.PoolTimeout):
+            return False # Our own connection pool is exhausted; the backend is not at fault
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+    def _record_success(self, backend):
+        if backend.state != 'closed':
+            print(f"INFO: LLM backend {backend.url} recovered, closing its circuit.")
+        backend.state = 'closed'
+        backend.consecutive_failures = 0
+        backend.opened_at = None
+
+    def _record_failure(self, backend, error):
+        backend.consecutive_failures += 1
+        backend.total_failures += 1
+        backend.last_error = f"{type(error).__name__}: {error}"
+        if backend.state == 'half_open' or backend.consecutive_failures >= self.failure_threshold:
+            if backend.state != 'open':
+                print(f"WARNING: Ejecting LLM backend {backend.url} after {backend.consecutive_failures} consecutive failures.")
+            backend.state = 'open'
+            backend.opened_at = time.monotonic()
+
+    def ensure_health_checks(self):
+        if self._health_checks_started or self.health_check_interval <= 0:
+            return
+        self._health_checks_started = True
+        sio.start_background_task(self._health_check_loop)
+
+    def _health_check_loop(self):
+        while True:
+            for backend in self.backends:
+                try:
+                    response = llm_client_pool.get(backend.health_url, timeout=LLM_CONNECT_TIMEOUT)
+                    response.raise_for_status()
+                except Exception as e:
+                    if self.is_backend_failure(e):
+                        with self._lock:
+                            self._record_failure(backend, e)
+                else:
+                    with self._lock:
+                        if backend.state != 'closed' or backend.consecutive_failures:
+                            self._record_success(backend)
+            eventlet.sleep(self.health_check_interval)
+
+    def stats(self):
+        with self._lock:
+            return [backend.stats() for backend in self.backends]
+
+
+llm_router = LLMBackendRouter(
+    LM_STUDIO_API_URLS,
+    failure_threshold=LLM_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=LLM_CIRCUIT_RESET_TIMEOUT,
+    health_check_interval=LLM_HEALTH_CHECK_INTERVAL,
+)
+
+
+# --- Incremental JSON Parsing ---
+
+class IncrementalJSONParser:
+    """
+    Single-pass parser for model output that may contain several top-level JSON objects,
+    code fences or trailing garbage. Text can be fed in chunks as it streams in.
+
+    Every complete top-level object is merged into `result`, like the model's output was
+    one object. `on_field(key, value)` is called as soon as a top-level field's value is
+    complete, before the rest of the document has been generated. Malformed or truncated
+    objects still contribute the fields that did parse.
+    """
+
+    _OBJECT_TOKENS = re.compile(r'[{}\[\]",:]')
+    _STRING_TOKENS = re.compile(r'["\\]')
+    _decoder = json.JSONDecoder(strict=False) # Models often emit raw newlines inside strings
+
+    def __init__(self, on_field=None, required=()):
+        self.on_field = on_field
+        self.required = required # Fields that make the answer complete (see `complete`)
+        self.result = {}
+        self.objects_parsed = 0
+        self.errors = 0
+        self.truncated = False
+        # Only the text of the object being parsed is retained; offsets are global.
+        self._chunks = []
+        self._offsets = []
+        self._end = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._object_start = None
+        self._expect_key = False
+        self._key = None
+        self._value_start = None
+        self._fields = {}
+
+    def feed(self, text):
+        """Scans a new chunk of text, continuing exactly where the previous chunk stopped."""
+        if text:
+            self._chunks.append(text)
+            self._offsets.append(self._end)
+            self._end += len(text)
+            self._scan()
+        return self
+
+    @property
+    def complete(self):
+        """Whether a top-level object has closed and the merged result has every required field."""
+        return self._depth == 0 and self.objects_parsed > 0 and all(key in self.result for key in self.required)
+
+    def close(self):
+        """Finishes parsing and returns the merged result."""
+        if self._depth > 0:
+            # The generation stopped mid-object: keep the top-level fields that were completed.
+            self.truncated = True
+            self.result.update(self._fields)
+            print(f"DEBUG: JSON output ended inside an unterminated object; recovered fields: {list(self._fields)}")
+        self._chunks, self._offsets = [], []
+        return self.result
+
+    def _scan(self):
+        start_chunk = len(self._chunks) - 1
+        for i in range(start_chunk, len(self._chunks)):
+            chunk = self._chunks[i]
+            base = self._offsets[i]
+            local = self._pos - base
+            length = len(chunk)
+            while local < length:
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                        local += 1
+                        continue
+                    match = self._STRING_TOKENS.search(chunk, local)
+                    if match is None:
+                        local = length
+                        break
+                    local = match.end()
+                    if match.group() == '\\':
+                        self._escape = True # The escaped character may be in the next chunk
+                    else:
+                        self._in_string = False
+                        self._end_string(base + local)
+                elif self._depth == 0:
+                    brace = chunk.find('{', local)
+                    if brace == -1:
+                        local = length
+                        break
+                    self._begin_object(base + brace)
+                    local = brace + 1
+                else:
+                    match = self._OBJECT_TOKENS.search(chunk, local)
+                    if match is None:
+                        local = length
+                        break
+                    local = match.end()
+                    self._handle_token(match.group(), base + match.start())
+            self._pos = base + local
+        self._discard_consumed()
+
+    def _handle_token(self, token, position):
+        if token == '"':
+            self._in_string = True
+            self._string_start = position
+        elif token == '{' or token == '[':
+            self._depth += 1
+        elif token == '}' or token == ']':
+            if self._depth == 1:
+                self._finish_field(position)
+                self._depth = 0
+                self._finish_object(position + 1)
+            else:
+                self._depth -= 1
+        elif self._depth == 1:
+            if token == ':' and self._key is not None:
+                self._value_start = position + 1
+                self._expect_key = False
+            elif token == ',':
+                self._finish_field(position)
+                self._expect_key = True
+
+    def _begin_object(self, position):
+        self._depth = 1
+        self._object_start = position
+        self._expect_key = True
+        self._key = None
+        self._value_start = None
+        self._fields = {}
+
+    def _end_string(self, end):
+        if self._depth == 1 and self._expect_key:
+            try:
+                self._key = self._decoder.decode(self._slice(self._string_start, end))
+            except ValueError:
+                self._key = None
+
+    def _finish_field(self, end):
+        key, value_start = self._key, self._value_start
+        self._key = None
+        self._value_start = None
+        if key is None or value_start is None:
+            return
+        try:
+            value = self._decoder.decode(self._slice(value_start, end).strip())
+        except ValueError:
+            return
+        self._fields[key] = value
+        if self.on_field is not None:
+            self.on_field(key, value)
+
+    def _finish_object(self, end):
+        text = self._slice(self._object_start, end)
+        try:
+            obj = self._decoder.decode(text)
+        except ValueError as e:
+            self.errors += 1
+            print(f"DEBUG: Skipping malformed JSON object ({e}); keeping {len(self._fields)} parsed fields. Segment: '{text[:50]}...'")
+            obj = self._fields
+        if isinstance(obj, dict):
+            self.result.update(obj)
+            self.objects_parsed += 1
+        self._object_start = None
+        self._fields = {}
+
+    def _slice(self, start, end):
+        """Returns the fed text between two global offsets."""
+        i = bisect.bisect_right(self._offsets, start) - 1
+        pieces = []
+        while i < len(self._chunks) and self._offsets[i] < end:
+            base = self._offsets[i]
+            pieces.append(self._chunks[i][max(0, start - base):end - base])
+            i += 1
+        return "".join(pieces)
+
+    def _discard_consumed(self):
+        keep_from = self._object_start if self._object_start is not None else self._pos
+        drop = bisect.bisect_right(self._offsets, keep_from) - 1
+        if drop > 0:
+            del self._chunks[:drop]
+            del self._offsets[:drop]
+
+def iter_lm_studio_stream(response):
+    """
+    Yields content deltas from an OpenAI-compatible `stream: true` response
+    (server-sent events, one `data:` line per chunk, terminated by `data: [DONE]`).
+    """
+    for line in response.iter_lines():
+        if not line.startswith('data:'):
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            break
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            print(f"DEBUG: Skipping malformed stream chunk: '{data[:100]}'")
+            continue
+        choices = chunk.get('choices') or [{}]
+        delta = (choices[0].get('delta') or {}).get('content')
+        if delta:
+            yield delta
+
+
+def request_lm_studio_completion(url, payload, on_delta=None, json_parser=None):
+    """
+    Sends one chat completion request to a single backend and returns
+    `(content, full_response)`. Streams when `on_delta` is given, feeding
+    `json_parser` with the text as it arrives.
+    With LLM_STOP_AFTER_JSON, JSON requests are always streamed and the response is closed as soon
+    as the parser has a complete answer, which makes the backend stop generating.
+    """
+    # The shared pooled client is cooperative thanks to eventlet.monkey_patch()
+    stop_after_json = LLM_STOP_AFTER_JSON and json_parser is not None
+    if on_delta is not None or stop_after_json:
+        content_parts = []
+        stopped_early = False
+        with llm_client_pool.stream("POST", url, json={**payload, "stream": True}) as response:
+            if response.is_error:
+                response.read() # Load the error body so it can be reported by the caller
+            response.raise_for_status()
+            for delta in iter_lm_studio_stream(response):
+                content_parts.append(delta)
+                if on_delta is not None:
+                    on_delta(delta)
+                if json_parser is not None:
+                    json_parser.feed(delta) # Parse while the model is still generating
+                    if stop_after_json and json_parser.complete:
+                        stopped_early = True # Leaving the block closes the connection
+                        break
+        return "".join(content_parts), {"streamed_chunks": len(content_parts), "stopped_after_json": stopped_early}
+
+    response = llm_client_pool.post(url, json=payload)
+    response.raise_for_status()
+
+    full_response = response.json()
+    content = full_response.get('choices', [{}])[0].get('message', {}).get('content', '')
+    if json_parser is not None and content:
+        json_parser.feed(content)
+    return content, full_response
 
 
-def call_lm_studio_api(prompt: str, response_schema: dict = None):
+def generation_params(event_name, prompt):
+    """
+    Sampling parameters for one request: the event's generation profile with max_tokens sized from
+    the prompt, or LM_STUDIO_SAMPLING_PARAMS for events without a profile.
+    """
+    profile = LLM_GENERATION_PROFILES.get(event_name)
+    if profile is None:
+        return dict(LM_STUDIO_SAMPLING_PARAMS)
+    max_tokens = profile['base_output_tokens'] + profile['output_tokens_per_prompt_token'] * estimate_tokens(prompt)
+    return {
+        "temperature": profile['temperature'],
+        "top_p": profile['top_p'],
+        "max_tokens": int(min(max_tokens, profile['max_tokens']) * LLM_OUTPUT_TOKEN_SCALE),
+    }
+
+
+def generation_budget(event_name):
+    """The largest output (in tokens) an event may request; reserved in its prompt's context budget."""
+    profile = LLM_GENERATION_PROFILES.get(event_name, LM_STUDIO_SAMPLING_PARAMS)
+    return int(profile['max_tokens'] * LLM_OUTPUT_TOKEN_SCALE)
+
+
+# Per-event generation counters, reported under llm_generation in /api/metrics
+llm_generation_stats = {}
+
+
+def call_lm_studio_api(prompt: str, response_schema: dict = None, on_delta=None, on_field=None, sampling_params=None, event_name=None):
     """
     Makes a synchronous call to LM Studio's OpenAI-compatible API for the specified model.
     Handles cases where the model might output multiple concatenated JSON objects.
+    `sampling_params` (default LM_STUDIO_SAMPLING_PARAMS) come from generation_params();
+    `event_name` only attributes the request in llm_generation_stats.
+
+    When `on_delta` is given the completion is requested with `stream: true` and every
+    partial chunk of text is passed to `on_delta` as soon as it arrives. `on_field` receives
+    each top-level JSON field of a schema response as soon as its value is complete.
     """
     model_name = GLOBAL_MODEL_NAME
     raw_response_content = None
+    sampling_params = sampling_params or LM_STUDIO_SAMPLING_PARAMS
+    stats = llm_generation_stats.setdefault(event_name or 'other', Counter())
+    stats['requests'] += 1
+    stats['max_tokens_requested'] += sampling_params['max_tokens']
     
     try:
         messages = [{"role": "user", "content": prompt}]
@@ -1099,18 +2411,36 @@ def call_lm_studio_api(prompt: str, response_schema: dict = None):
         payload = {
             "model": model_name,
             "messages": messages,
-            "temperature": 0.7,
-            "top_p": 0.7,
-            "max_tokens": 4096,
+            **sampling_params,
         }
 
-        # httpx client is now cooperative thanks to eventlet.monkey_patch()
-        with httpx.Client(timeout=300.0) as client:
-            response = client.post(LM_STUDIO_API_URL, json=payload)
-            response.raise_for_status()
-
-            full_lm_studio_response = response.json()
-            raw_response_content = full_lm_studio_response.get('choices', [{}])[0].get('message', {}).get('content', '')
+        json_parser = IncrementalJSONParser(on_field=on_field, required=response_schema.get('required', ())) if response_schema else None
+
+        # Route to the least loaded healthy backend. Connection failures happen before any
+        # output was produced, so they are retried on another backend.
+        tried_backends = []
+        while True:
+            backend = llm_router.acquire(exclude=tried_backends)
+            try:
+                raw_response_content, full_lm_studio_response = request_lm_studio_completion(backend.url, payload, on_delta, json_parser)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                llm_router.release(backend, error=e)
+                tried_backends.append(backend)
+                if len(tried_backends) >= len(llm_router.backends):
+                    raise
+                print(f"WARNING: Could not connect to LLM backend {backend.url} ({e}), retrying on another backend.")
+                continue
+            except Exception as e:
+                llm_router.release(backend, error=e if llm_router.is_backend_failure(e) else None)
+                raise
+            llm_router.release(backend)
+            break
+
+        stats['output_chars'] += len(raw_response_content or "")
+        if full_lm_studio_response.get('stopped_after_json'):
+            stats['stopped_after_json'] += 1
+        elif (full_lm_studio_response.get('choices') or [{}])[0].get('finish_reason') == 'length':
+            stats['hit_max_tokens'] += 1
 
         if not raw_response_content:
             print(f"ERROR: LM Studio model {model_name} returned empty content. Full LM Studio response: {full_lm_studio_response}")
@@ -1120,46 +2450,42 @@ def call_lm_studio_api(prompt: str, response_schema: dict = None):
             print(f"ERROR: LM STUDIO model {model_name} explicitly returned JSON_ERROR_RESPONSE_LITERAL.")
             return {"error": "AI Model explicitly indicated malformed JSON output.", "raw_response": raw_response_content}
 
-        result_text = raw_response_content
-        if result_text.startswith('```json') and result_text.endswith('```'):
-            result_text = result_text.removeprefix('```json').removesuffix('```').strip()
-        elif result_text.startswith('```') and result_text.endswith('```'):
-            result_text = result_text.removeprefix('```').removesuffix('```').strip()
-
-        if response_schema:
-            final_result = {}
-            decoder = json.JSONDecoder()
-            idx = 0
-            while idx < len(result_text):
-                try:
-                    obj, new_idx = decoder.raw_decode(result_text[idx:])
-                    if isinstance(obj, dict):
-                        final_result.update(obj)
-                    idx += new_idx
-                    while idx < len(result_text) and result_text[idx].isspace():
-                        idx += 1
-                except json.JSONDecodeError as e:
-                    print(f"DEBUG: JSONDecodeError at index {idx}. Error: {e}. Raw text segment causing error: '{result_text[idx:idx+50]}...'")
-                    next_brace = result_text.find('{', idx)
-                    if next_brace != -1:
-                        idx = next_brace
-                    else:
-                        break
-                except Exception as e:
-                    print(f"DEBUG: Unexpected error during JSON decoding loop: {e}. Raw text: {result_text}")
-                    traceback.print_exc()
-                    break 
-
+        if json_parser is not None:
+            # Code fences and any text around the JSON objects are skipped by the parser
+            final_result = json_parser.close()
+            if json_parser.truncated:
+                stats['hit_max_tokens'] += 1 # Streamed responses carry no finish_reason here
             if not final_result:
-                print(f"WARNING: Expected JSON from {model_name}, but failed to parse and merge any valid JSON objects. Raw response after cleaning: '{result_text}'")
-                return {"error": f"Failed to parse JSON from {model_name} API. Ensure {model_name} is outputting valid JSON or can be merged.", "raw_response": result_text}
-            
+                print(f"WARNING: Expected JSON from {model_name}, but failed to parse and merge any valid JSON objects. Raw response: '{raw_response_content}'")
+                return {"error": f"Failed to parse JSON from {model_name} API. Ensure {model_name} is outputting valid JSON or can be merged.", "raw_response": raw_response_content}
+
             return final_result
         else:
+            result_text = raw_response_content
+            if result_text.startswith('```json') and result_text.endswith('```'):
+                result_text = result_text.removeprefix('```json').removesuffix('```').strip()
+            elif result_text.startswith('```') and result_text.endswith('```'):
+                result_text = result_text.removeprefix('```').removesuffix('```').strip()
             return result_text
 
+    except LLMBackendUnavailable as e:
+        error_message = f"{e} Please try again shortly."
+        print(f"ERROR: {error_message}")
+        return {"error": error_message, "raw_response": str(e)}
+    except httpx.PoolTimeout:
+        error_message = f"Timed out after {LLM_POOL_TIMEOUT:.0f} seconds waiting for a free LM Studio connection for model {model_name}. All {LLM_POOL_MAX_CONNECTIONS} pooled connections are busy."
+        print(f"ERROR: {error_message}")
+        traceback.print_exc()
+        return {"error": error_message, "raw_response": "Timeout"}
+    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+        # Every backend refused or timed out the connection; the model never saw the prompt
+        ejected = sum(1 for backend in llm_router.stats() if backend['state'] == 'open')
+        error_message = (f"All {len(llm_router.backends)} LLM backends are unreachable ({ejected} ejected by their circuit breaker). "
+                         f"Last error: {e}. Please try again shortly.")
+        print(f"ERROR: {error_message}")
+        return {"error": error_message, "raw_response": str(e)}
     except httpx.TimeoutException:
-        error_message = f"LM Studio API call timed out after 300 seconds for model {model_name}. The model might be taking too long to generate a response or is stuck."
+        error_message = f"LM Studio API call timed out after {LLM_READ_TIMEOUT:.0f} seconds for model {model_name}. The model might be taking too long to generate a response or is stuck."
         print(f"ERROR: {error_message}")
         traceback.print_exc()
         return {"error": error_message, "raw_response": "Timeout"}
@@ -1186,29 +2512,258 @@ def call_lm_studio_api(prompt: str, response_schema: dict = None):
             print("INFO: No raw LM Studio content captured or content was empty.")
 
 
-def async_lm_studio_call(sid, prompt, schema, event_name, original_resume_text=None):
+# --- LLM Response Cache ---
+
+llm_response_cache = None
+if LLM_CACHE_ENABLED and not IN_WORKER_PROCESS:
+    llm_response_cache = TieredCache(
+        'llm_response',
+        memory_max_entries=LLM_CACHE_MEMORY_MAX_ENTRIES,
+        memory_max_bytes=LLM_CACHE_MEMORY_MAX_BYTES,
+        db_path=LLM_CACHE_DB_PATH,
+        disk_max_bytes=LLM_CACHE_DISK_MAX_BYTES,
+    )
+    atexit.register(llm_response_cache.close)
+
+
+def llm_cache_key(model_name, prompt, sampling_params, response_schema):
+    """Content address of an LLM request: identical requests always map to the same key."""
+    fingerprint = json.dumps({
+        'model': model_name,
+        'prompt': prompt,
+        'params': sampling_params,
+        'schema': response_schema,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls. The first caller for a key runs the call;
+    callers arriving while it is in flight wait for it and share its result.
+    When the leading call streams, its progress is fanned out to every waiter, and a
+    waiter that joins late first receives the output streamed so far.
+    """
+
+    class _Flight:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.delta_listeners = []
+            self.field_listeners = []
+            self.deltas = [] # Everything published so far, replayed to late joiners
+            self.fields = []
+            self.lock = threading.Lock() # Keeps a replay and new publishes in order
+
+        def listen(self, on_delta=None, on_field=None):
+            """Adds listeners, first replaying to them what has already been published."""
+            with self.lock:
+                if on_delta is not None:
+                    self.delta_listeners.append(on_delta)
+                    if self.deltas:
+                        self._notify([on_delta], "".join(self.deltas))
+                if on_field is not None:
+                    self.field_listeners.append(on_field)
+                    for key, value in self.fields:
+                        self._notify([on_field], key, value)
+
+        def publish_delta(self, delta):
+            with self.lock:
+                self.deltas.append(delta)
+                self._notify(list(self.delta_listeners), delta)
+
+        def publish_field(self, key, value):
+            with self.lock:
+                self.fields.append((key, value))
+                self._notify(list(self.field_listeners), key, value)
+
+        @staticmethod
+        def _notify(listeners, *args):
+            for listener in listeners:
+                try:
+                    listener(*args)
+                except Exception as e:
+                    print(f"WARNING: Progress listener failed: {e}")
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, on_delta=None, on_field=None):
+        """
+        Runs `fn(flight)` unless a call for `key` is already in flight, in which case
+        the caller blocks cooperatively until that call finishes and gets its result.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = self._Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        flight.listen(on_delta, on_field)
+
+        if not is_leader:
+            print(f"INFO: Joined in-flight LLM request (key {key[:12]}).")
+            flight.done.wait()
+            return copy.deepcopy(flight.result) # The leader may mutate its own copy
+
+        try:
+            flight.result = fn(flight)
+        except Exception as e:
+            flight.result = {"error": f"Shared LLM request failed: {e}", "raw_response": str(e)}
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
+
+
+llm_single_flight = SingleFlight()
+
+
+def cached_lm_studio_call(prompt: str, response_schema: dict, event_name: str, on_delta=None, on_field=None):
+    """
+    Returns a cached LLM result for this exact request while it is still fresh,
+    otherwise calls LM Studio and stores a successful result with the TTL configured
+    for `event_name`. Error results are never cached.
+    Identical requests that arrive while one is already being generated share that
+    generation instead of sending a duplicate to the model.
+    `on_delta` and `on_field` only fire when the result actually has to be generated.
+    Streaming and non-streaming callers never share a generation, so every caller that
+    asked for progress gets it even when the leading call did not.
+    """
+    ttl = LLM_CACHE_TTL_SECONDS.get(event_name, 0)
+    use_cache = llm_response_cache is not None and ttl > 0
+    sampling_params = generation_params(event_name, prompt)
+    key = llm_cache_key(GLOBAL_MODEL_NAME, prompt, sampling_params, response_schema)
+    stream = on_delta is not None or on_field is not None
+
+    if use_cache:
+        cached_result = llm_response_cache.get(key)
+        if cached_result is not None:
+            print(f"INFO: LLM cache hit for {event_name} (key {key[:12]}).")
+            return cached_result
+
+    def generate(flight):
+        if use_cache:
+            # A flight for the same key may have finished between the lookup above and now
+            cached_result = llm_response_cache.get(key)
+            if cached_result is not None:
+                return cached_result
+        result = call_lm_studio_api(
+            prompt, response_schema,
+            on_delta=flight.publish_delta if stream else None,
+            on_field=flight.publish_field if stream else None,
+            sampling_params=sampling_params,
+            event_name=event_name,
+        )
+        if use_cache and not (isinstance(result, dict) and "error" in result):
+            llm_response_cache.set(key, result, ttl=ttl)
+        return result
+
+    flight_key = f"{key}:stream" if stream else key
+    return llm_single_flight.do(flight_key, generate, on_delta=on_delta, on_field=on_field)
+
+
+class StreamProgressEmitter:
+    """
+    Forwards streamed model output to a client as `*_progress` events.
+    Deltas are batched so a fast model does not flood the socket with one emit per token;
+    completed top-level JSON fields (e.g. `score`) are pushed immediately.
+    """
+
+    def __init__(self, sid, event_name, interval=LLM_PROGRESS_EMIT_INTERVAL):
+        self.sid = sid
+        self.progress_event = PROGRESS_EVENT_NAMES.get(event_name, f"{event_name}_progress")
+        self.interval = interval
+        self._pending = []
+        self._received_chars = 0
+        self._last_emit = 0.0
+
+    def __call__(self, delta):
+        self._pending.append(delta)
+        self._received_chars += len(delta)
+        if time.monotonic() - self._last_emit >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        delta = "".join(self._pending)
+        self._pending = []
+        self._last_emit = time.monotonic()
+        sio.emit(self.progress_event, {'delta': delta, 'received_chars': self._received_chars}, room=self.sid, namespace='/')
+
+    def on_field(self, key, value):
+        self.flush() # Keep the text deltas ordered before the field
+        sio.emit(self.progress_event, {'field': key, 'value': value, 'received_chars': self._received_chars}, room=self.sid, namespace='/')
+
+
+def emit_analysis_result(sid, analysis_result, session_id=None, original_resume_text=None, extra_payload=None, rewrite_deferred=False):
+    """
+    Sends `analysis_result` to the client and saves the analysis to its session.
+    With `rewrite_deferred` the payload says the rewrite is left for request_full_rewrite.
+    """
+    analysis_payload = {
+        'score': analysis_result.get('score', 0),
+        'suggestions': analysis_result.get('suggestions', []),
+        'revised_summary': analysis_result.get('revised_summary', ''),
+        'ai_revised_full_resume_text': analysis_result.get('ai_revised_full_resume_text', '')
+    }
+    if session_id:
+        session_store.update(session_id, analysis=analysis_payload)
+        analysis_payload['session_id'] = session_id
+    if original_resume_text is not None:
+        analysis_payload['extracted_resume_text'] = original_resume_text # Pass original text
+    if extra_payload:
+        analysis_payload.update(extra_payload)
+    if rewrite_deferred:
+        analysis_payload['rewrite_deferred'] = True
+    sio.emit('analysis_result', analysis_payload, room=sid, namespace='/')
+
+
+def async_lm_studio_call(sid, prompt, schema, event_name, original_resume_text=None, stream=False, session_id=None, extra_payload=None, rewrite_deferred=False):
     """
     Handles the LM Studio API call and emits the result to the client.
-    This function is run as a background task via sio.start_background_task,
+    This function is run as a background task started by llm_scheduler,
     and because eventlet.monkey_patch() is used, blocking I/O within it
     will be cooperative.
+    With `stream=True`, partial output is pushed as progress events before the final event.
+    Analyses are also saved to the session `session_id` for follow-up events.
+    Pass `original_resume_text=None` to leave the extracted text out of `analysis_result`.
+    `extra_payload` fields (e.g. `candidate_id` for bulk ranking) are added to `analysis_result`.
+    `rewrite_deferred` marks an analysis prompted without the rewrite (see emit_analysis_result).
     """
     with app.app_context(): # Ensure Flask app context is available for emit
         try:
-            analysis_result = call_lm_studio_api(prompt, schema) # Direct call, now cooperative
+            progress_emitter = StreamProgressEmitter(sid, event_name) if stream else None
+            analysis_result = cached_lm_studio_call(
+                prompt, schema, event_name,
+                on_delta=progress_emitter,
+                on_field=progress_emitter.on_field if progress_emitter is not None else None,
+            ) # Cooperative, served from cache when possible
+            if progress_emitter is not None:
+                progress_emitter.flush()
 
             if "error" in analysis_result:
                 sio.emit('error', {'message': f"AI Analysis Error: {analysis_result['error']}"}, room=sid, namespace='/')
                 return
 
             if event_name == 'analysis_result':
-                sio.emit(event_name, {
-                    'score': analysis_result.get('score', 0),
-                    'suggestions': analysis_result.get('suggestions', []),
-                    'revised_summary': analysis_result.get('revised_summary', ''),
-                    'extracted_resume_text': original_resume_text, # Pass original text
-                    'ai_revised_full_resume_text': analysis_result.get('ai_revised_full_resume_text', '')
-                }, room=sid, namespace='/')
+                emit_analysis_result(sid, analysis_result, session_id, original_resume_text, extra_payload, rewrite_deferred)
             elif event_name == 'interview_prep_materials':
                 sio.emit(event_name, analysis_result, room=sid, namespace='/')
             elif event_name == 'interview_question':
@@ -1224,84 +2779,780 @@ def async_lm_studio_call(sid, prompt, schema, event_name, original_resume_text=N
             sio.emit('error', {'message': f'Server error processing LLM result: {e}'}, room=sid, namespace='/')
 
 
-# --- Flask Routes ---
-@app.route('/')
-def index():
-    """Serves the index.html file from the templates folder."""
-    return render_template('index.html')
+class AnalysisFanout:
+    """
+    One resume analysis split into independent sub-requests (ANALYSIS_SUBTASKS) that run concurrently
+    on the scheduler. Each sub-result is pushed as an `analysis_partial` event as soon as it arrives;
+    once all are in, they are merged into the usual `analysis_result`. If a sub-request fails, the
+    client gets one error and no final result, as with the single-prompt analysis. The sub-requests
+    are queued as one scheduler group, so they are either all accepted or all rejected.
+    Without the 'analysis_rewrite' task the rewrite is deferred until request_full_rewrite.
+    """
 
-@app.route('/test', methods=['GET'])
-def test_api():
-    dummy_data = {
-        "id": 1,
-        "name": "Dummy Data",
-        "status": "success"
-    }
-    return jsonify(dummy_data)
+    def __init__(self, sid, tasks, session_id=None, original_resume_text=None):
+        self.sid = sid
+        self.session_id = session_id
+        self.original_resume_text = original_resume_text
+        self.rewrite_deferred = 'analysis_rewrite' not in tasks
+        self.started_at = time.monotonic()
+        self._pending = set(tasks)
+        self._result = {}
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def complete(self, task, result):
+        """Records the result of sub-request `task` (an error dict if it failed)."""
+        failed = "error" in result
+        if not failed:
+            # Only the fields this sub-request is responsible for, in case the model volunteered others
+            result = {key: value for key, value in result.items() if key in ANALYSIS_SUBTASKS[task]['properties']}
+        with self._lock:
+            self._pending.discard(task)
+            report_error = failed and not self._failed
+            self._failed = self._failed or failed
+            if not failed:
+                self._result.update(result)
+            finished = not self._pending and not self._failed
+
+        if report_error:
+            sio.emit('error', {'message': f"AI Analysis Error: {result['error']}"}, room=self.sid, namespace='/')
+        if not failed:
+            partial = {'task': task.removeprefix('analysis_'), **result}
+            if self.session_id:
+                partial['session_id'] = self.session_id
+            sio.emit('analysis_partial', partial, room=self.sid, namespace='/')
+        if finished:
+            print(f"INFO: Fanned-out analysis for {self.sid} finished in {time.monotonic() - self.started_at:.1f}s.")
+            emit_analysis_result(self.sid, self._result, self.session_id, self.original_resume_text, rewrite_deferred=self.rewrite_deferred)
+
+
+def analysis_subtask_call(sid, prompt, schema, event_name, fanout, stream=False):
+    """Scheduler job for one sub-request of an AnalysisFanout."""
+    with app.app_context(): # Ensure Flask app context is available for emit
+        try:
+            progress_emitter = StreamProgressEmitter(sid, event_name) if stream else None
+            result = cached_lm_studio_call(
+                prompt, schema, event_name,
+                on_delta=progress_emitter,
+                on_field=progress_emitter.on_field if progress_emitter is not None else None,
+            )
+            if progress_emitter is not None:
+                progress_emitter.flush()
+        except Exception as e:
+            print(f"ERROR: Exception in analysis sub-request {event_name}: {e}")
+            traceback.print_exc()
+            result = {"error": f"Server error processing LLM result: {e}"}
+        fanout.complete(event_name, result)
 
 
-# --- Socket.IO Event Handlers (using Flask-SocketIO decorators) ---
+def submit_analysis_fanout(sid, resume_text, job_description, session_id=None, original_resume_text=None, stream=False, tasks=None):
+    """
+    Queues the analysis sub-requests `tasks` (default: all of ANALYSIS_SUBTASKS) for one resume
+    as a single scheduler group; returns False if the scheduler rejected them.
+    """
+    tasks = list(ANALYSIS_SUBTASKS) if tasks is None else tasks
+    fanout = AnalysisFanout(sid, tasks, session_id, original_resume_text)
+    jobs = [
+        (analysis_subtask_call, task, {
+            'prompt': build_analysis_subtask_prompt(task, resume_text, job_description),
+            'schema': ANALYSIS_SUBTASKS[task], 'fanout': fanout, 'stream': stream,
+        })
+        for task in tasks
+    ]
+    return llm_scheduler.submit_group(sid, jobs)
+
+
+def full_rewrite_call(sid, prompt, schema, event_name, session_id, stream=False):
+    """
+    Scheduler job for request_full_rewrite: generates the deferred rewrite, keeps it in the
+    session for follow-up prompts and sends it as a `full_rewrite` event.
+    """
+    with app.app_context(): # Ensure Flask app context is available for emit
+        try:
+            progress_emitter = StreamProgressEmitter(sid, event_name) if stream else None
+            result = cached_lm_studio_call(
+                prompt, schema, event_name,
+                on_delta=progress_emitter,
+                on_field=progress_emitter.on_field if progress_emitter is not None else None,
+            )
+            if progress_emitter is not None:
+                progress_emitter.flush()
+
+            if "error" in result:
+                sio.emit('error', {'message': f"AI Analysis Error: {result['error']}"}, room=sid, namespace='/')
+                return
 
-@sio.on('connect')
-def connect():
-    print(f'Client connected: {request.sid}')
-    emit('status', {'message': 'Connected to backend!'}, room=request.sid)
+            rewrite = result.get('ai_revised_full_resume_text', '')
+            session_store.update(session_id, full_rewrite=rewrite) # Separate from `analysis`, which may still be in flight
+            sio.emit('full_rewrite', {'ai_revised_full_resume_text': rewrite, 'session_id': session_id}, room=sid, namespace='/')
 
-@sio.on('disconnect')
-def disconnect():
-    print(f'Client disconnected: {request.sid}')
+        except Exception as e:
+            print(f"ERROR: Exception in full_rewrite_call: {e}")
+            traceback.print_exc()
+            sio.emit('error', {'message': f'Server error processing LLM result: {e}'}, room=sid, namespace='/')
 
-@sio.on('upload_resume_and_jd')
-def handle_upload_resume_and_jd(data):
+
+# --- LLM Job Scheduler ---
+
+class LLMJobScheduler:
     """
-    Receives resume PDF and job description, then performs analysis.
-    Handles multiple file types and size validation.
+    Bounded scheduler in front of the LLM background tasks.
+    At most `max_concurrent` jobs run at once. Queued jobs are served by event priority
+    (lower first) and, within a priority, round-robin across clients so one client with
+    many requests cannot starve the others. Per-event limits stop one kind of long job
+    from holding every slot. Waiting clients receive `queue_position` events.
     """
-    print(f"Received upload_resume_and_jd event from {request.sid}")
-    resume_file_b64 = data.get('resume_file')
+
+    class _Job:
+        __slots__ = ('fn', 'sid', 'event_name', 'priority', 'kwargs', 'client_slots', 'enqueued_at', 'last_position')
+
+        def __init__(self, fn, sid, event_name, priority, kwargs, client_slots=1):
+            self.fn = fn
+            self.sid = sid
+            self.event_name = event_name
+            self.priority = priority
+            self.kwargs = kwargs
+            self.client_slots = client_slots # Queue slots of the client this job holds until it starts
+            self.enqueued_at = time.monotonic()
+            self.last_position = None
+
+    def __init__(self, max_concurrent, priorities, event_limits, max_queued_per_client, max_queue_length):
+        self.max_concurrent = max_concurrent
+        self.priorities = priorities
+        self.event_limits = event_limits
+        self.max_queued_per_client = max_queued_per_client
+        self.max_queue_length = max_queue_length
+        self._lock = threading.Lock()
+        self._queues = {} # priority -> OrderedDict(sid -> deque of jobs), in round-robin order
+        self._queued = 0
+        self._queued_by_sid = Counter()
+        self._running = 0
+        self._running_by_event = Counter()
+        self.submitted = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def submit(self, fn, sid, event_name, **kwargs):
+        """
+        Queues `fn(sid=sid, event_name=event_name, **kwargs)` to run as a background task.
+        Returns False (after telling the client) when the job is rejected.
+        """
+        return self.submit_group(sid, [(fn, event_name, kwargs)])
+
+    def submit_group(self, sid, jobs):
+        """
+        Queues the `(fn, event_name, kwargs)` jobs of one client request (e.g. the sub-requests of a
+        fanned-out analysis) all together or not at all. The group holds a single one of the client's
+        queue slots, released when its first job starts.
+        Returns False (after telling the client) when the group is rejected.
+        """
+        with self._lock:
+            if self._queued + len(jobs) > self.max_queue_length:
+                self.rejected += 1
+                rejection = 'The server is busy right now. Please try again in a moment.'
+            elif self._queued_by_sid[sid] >= self.max_queued_per_client:
+                self.rejected += 1
+                rejection = f'You already have {self._queued_by_sid[sid]} requests waiting. Please wait for them to finish.'
+            else:
+                rejection = None
+                for position, (fn, event_name, kwargs) in enumerate(jobs):
+                    priority = self.priorities.get(event_name, max(self.priorities.values(), default=0))
+                    job = self._Job(fn, sid, event_name, priority, kwargs, client_slots=1 if position == 0 else 0)
+                    self._queues.setdefault(priority, OrderedDict()).setdefault(sid, deque()).append(job)
+                self._queued += len(jobs)
+                self._queued_by_sid[sid] += 1
+                self.submitted += len(jobs)
+        if rejection is not None:
+            event_names = ', '.join(event_name for _, event_name, _ in jobs)
+            print(f"WARNING: Rejected {event_names} job for {sid}: {rejection}")
+            sio.emit('error', {'message': rejection}, room=sid, namespace='/')
+            return False
+        self._dispatch()
+        return True
+
+    def cancel_client(self, sid):
+        """Drops every queued (not yet running) job of a client, e.g. when it disconnects."""
+        with self._lock:
+            dropped = 0
+            for by_sid in self._queues.values():
+                jobs = by_sid.pop(sid, None)
+                if jobs:
+                    dropped += len(jobs)
+            self._queued -= dropped
+            self._queued_by_sid.pop(sid, None)
+            self.cancelled += dropped
+        if dropped:
+            print(f"INFO: Cancelled {dropped} queued LLM jobs for {sid}.")
+            self._notify_positions()
+
+    def _next_job(self):
+        for priority in sorted(self._queues):
+            by_sid = self._queues[priority]
+            for sid, jobs in by_sid.items():
+                job = jobs[0]
+                limit = self.event_limits.get(job.event_name)
+                if limit is not None and self._running_by_event[job.event_name] >= limit:
+                    continue
+                jobs.popleft()
+                if jobs:
+                    by_sid.move_to_end(sid) # Round-robin: this client goes to the back of the line
+                else:
+                    del by_sid[sid]
+                if not by_sid:
+                    del self._queues[priority]
+                return job
+        return None
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            while self._running < self.max_concurrent:
+                job = self._next_job()
+                if job is None:
+                    break
+                self._queued -= 1
+                self._queued_by_sid[job.sid] -= job.client_slots
+                if self._queued_by_sid[job.sid] <= 0:
+                    del self._queued_by_sid[job.sid]
+                self._running += 1
+                self._running_by_event[job.event_name] += 1
+                waited = time.monotonic() - job.enqueued_at
+                self.total_wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+                started.append(job)
+        for job in started:
+            if job.last_position is not None:
+                # The client was told it was waiting, so tell it the job has started
+                sio.emit('queue_position', {'event': job.event_name, 'position': 0, 'queued': self._queued}, room=job.sid, namespace='/')
+            sio.start_background_task(self._run, job)
+        self._notify_positions()
+
+    def _run(self, job):
+        try:
+            job.fn(sid=job.sid, event_name=job.event_name, **job.kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._running_by_event[job.event_name] -= 1
+                self.completed += 1
+            self._dispatch()
+
+    def _dispatch_order(self):
+        """Queued jobs in the order they would be started, ignoring per-event limits."""
+        order = []
+        for priority in sorted(self._queues):
+            lanes = [list(jobs) for jobs in self._queues[priority].values()]
+            for round_index in range(max((len(lane) for lane in lanes), default=0)):
+                order.extend(lane[round_index] for lane in lanes if round_index < len(lane))
+        return order
+
+    def _notify_positions(self):
+        updates = []
+        with self._lock:
+            order = self._dispatch_order()
+            for position, job in enumerate(order, start=1):
+                if job.last_position != position:
+                    job.last_position = position
+                    updates.append((job, position))
+            queued = len(order)
+        for job, position in updates:
+            sio.emit('queue_position', {'event': job.event_name, 'position': position, 'queued': queued}, room=job.sid, namespace='/')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'running': self._running,
+                'running_by_event': {name: count for name, count in self._running_by_event.items() if count},
+                'queued': self._queued,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'cancelled': self.cancelled,
+                'completed': self.completed,
+                'avg_wait_seconds': self.total_wait_seconds / max(1, self.completed + self._running),
+                'max_wait_seconds': self.max_wait_seconds,
+            }
+
+
+llm_scheduler = LLMJobScheduler(
+    max_concurrent=LLM_MAX_CONCURRENT_JOBS,
+    priorities=LLM_EVENT_PRIORITIES,
+    event_limits=LLM_EVENT_CONCURRENCY_LIMITS,
+    max_queued_per_client=LLM_MAX_QUEUED_JOBS_PER_CLIENT,
+    max_queue_length=LLM_MAX_QUEUE_LENGTH,
+)
+
+# --- Session Context Store ---
+
+class SessionContextStore:
+    """
+    Server-side context for an analysis session: the extracted resume, the job description
+    and the latest analysis. Later events reference it by `session_id` instead of re-sending
+    multi-KB texts over the socket.
+    Sessions expire after `ttl` seconds without use, and the store is capped by total size
+    with least-recently-used eviction.
+    """
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self._sessions = BoundedLRUCache(max_entries, max_bytes)
+        self._sid_sessions = {} # Socket.IO sid -> session_id of that connection
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _field_size(key, value):
+        if isinstance(value, str):
+            return len(value)
+        if key in ('analysis', 'resume_sections') and value:
+            return len(json.dumps(value))
+        return 0
+
+    def _store(self, session_id, context, size):
+        # The size is kept with the context, so updates only measure the fields they change
+        self._sessions.set(session_id, (context, size), ttl=self.ttl, size=size)
+
+    def create(self, sid, resume_text, job_description, bind=True):
+        """
+        Starts a new session and returns its id. With `bind`, it also becomes the session of the
+        connection `sid`, used by that client's later events that carry no session_id.
+        """
+        session_id = secrets.token_urlsafe(16) # Unguessable: the id grants access to the resume
+        self._store(session_id, {
+            'resume_text': resume_text,
+            'job_description': job_description,
+            'analysis': None,
+        }, size=len(resume_text) + len(job_description))
+        if bind:
+            self.bind(sid, session_id)
+        return session_id
+
+    def get(self, session_id):
+        """Returns the session context, refreshing its expiry, or None if unknown or expired."""
+        entry = self._sessions.get(session_id, refresh_ttl=self.ttl) if session_id else None # Sliding expiry
+        return entry[0] if entry is not None else None
+
+    def update(self, session_id, **fields):
+        entry = self._sessions.get(session_id) if session_id else None
+        if entry is None:
+            return False
+        context, size = entry
+        size += sum(self._field_size(key, value) - self._field_size(key, context.get(key)) for key, value in fields.items())
+        self._store(session_id, {**context, **fields}, size)
+        return True
+
+    def discard(self, session_id):
+        self._sessions.pop(session_id)
+
+    def bind(self, sid, session_id):
+        with self._lock:
+            self._sid_sessions[sid] = session_id
+
+    def unbind(self, sid):
+        with self._lock:
+            self._sid_sessions.pop(sid, None)
+
+    def session_for_sid(self, sid):
+        with self._lock:
+            return self._sid_sessions.get(sid)
+
+    def stats(self):
+        stats = self._sessions.stats()
+        with self._lock:
+            stats['bound_connections'] = len(self._sid_sessions)
+        return stats
+
+
+session_store = SessionContextStore(
+    ttl=SESSION_TTL_SECONDS,
+    max_entries=SESSION_STORE_MAX_ENTRIES,
+    max_bytes=SESSION_STORE_MAX_BYTES,
+)
+
+
+def session_resume_text(context):
+    """The resume used for follow-up prompts: the AI-revised version once available, else the extracted text."""
+    analysis = context.get('analysis') or {}
+    return analysis.get('ai_revised_full_resume_text') or context.get('full_rewrite') or context.get('resume_text')
+
+
+def session_resume_sections(session_id, resume_text):
+    """
+    Returns the parsed sections of `resume_text`, cached in the session so each resume version
+    (extracted, then AI-revised) is parsed once rather than on every follow-up event.
+    """
+    digest = hashlib.sha256(resume_text.encode('utf-8')).hexdigest()
+    context = session_store.get(session_id)
+    cached = context.get('resume_sections') if context else None
+    if cached and cached['digest'] == digest:
+        return cached['sections']
+    sections = parse_resume_sections(resume_text)
+    if context is not None:
+        session_store.update(session_id, resume_sections={'digest': digest, 'sections': sections})
+    return sections
+
+
+def resolve_session_inputs(data, sid):
+    """
+    Returns `(session_id, resume_text, job_description)` for an event.
+    Texts sent explicitly by the client win; missing ones are filled from the session
+    referenced by `session_id` (or the session bound to this connection).
+    """
+    session_id = data.get('session_id') or session_store.session_for_sid(sid)
+    context = session_store.get(session_id)
+    resume_text = data.get('resume_text')
     job_description = data.get('job_description')
-    file_type = data.get('file_type')
+    if context is None:
+        return None, resume_text, job_description
+    if data.get('session_id'):
+        session_store.bind(sid, session_id) # A reconnected client resumes its session
+    return session_id, resume_text or session_resume_text(context), job_description or context.get('job_description')
 
-    if not resume_file_b64 or not job_description or not file_type:
-        emit('error', {'message': 'Resume file, Job Description, and file type are required.'}, room=request.sid)
-        return
+# --- Chunked Uploads ---
 
-    try:
-        resume_bytes = base64.b64decode(resume_file_b64)
+class ChunkedUpload:
+    """
+    A file arriving through upload_begin / upload_chunk / upload_complete.
+    Chunks are hashed as they arrive and spooled to a temporary file that stays in memory
+    while small and moves to disk past UPLOAD_SPOOL_MAX_MEMORY_BYTES.
+    """
 
-        if len(resume_bytes) > MAX_FILE_SIZE_BYTES:
-            emit('error', {'message': f'File size exceeds the limit of {MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f} MB.'}, room=request.sid)
-            return
+    def __init__(self, upload_id, sid, file_type, size):
+        self.upload_id = upload_id
+        self.sid = sid
+        self.file_type = file_type
+        self.size = size
+        self.received = 0
+        self.complete = False
+        self.updated_at = time.monotonic()
+        self._file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY_BYTES)
+        self._sha256 = hashlib.sha256()
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._sha256.update(chunk)
+        self.received += len(chunk)
+        self.updated_at = time.monotonic()
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def read(self):
+        """Returns the assembled file contents and releases the spool."""
+        self._file.seek(0)
+        data = self._file.read()
+        self.close()
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class ChunkedUploadStore:
+    """
+    In-progress and completed chunked uploads, owned by the connection that started them.
+    Each connection may have only a few pending uploads, and uploads not used within
+    `ttl` seconds of their last chunk are discarded.
+    """
+
+    def __init__(self, ttl, max_pending_per_client):
+        self.ttl = ttl
+        self.max_pending_per_client = max_pending_per_client
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.completed = 0
+        self.expired = 0
+        self.bytes_received = 0
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            stale = [upload for upload in self._uploads.values() if upload.updated_at < cutoff]
+            for upload in stale:
+                del self._uploads[upload.upload_id]
+            self.expired += len(stale)
+        for upload in stale:
+            upload.close()
+
+    def begin(self, sid, file_type, size):
+        """Registers a new upload for a connection, or returns None if it has too many pending."""
+        self._expire()
+        with self._lock:
+            pending = sum(1 for upload in self._uploads.values() if upload.sid == sid)
+            if pending >= self.max_pending_per_client:
+                return None
+            upload = ChunkedUpload(secrets.token_urlsafe(16), sid, file_type, size)
+            self._uploads[upload.upload_id] = upload
+            self.started += 1
+        return upload
+
+    def get(self, upload_id, sid):
+        """Returns the upload if it exists and belongs to this connection."""
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+        return upload if upload is not None and upload.sid == sid else None
+
+    def add_chunk(self, upload, chunk):
+        upload.write(chunk)
+        with self._lock:
+            self.bytes_received += len(chunk)
+
+    def mark_complete(self, upload):
+        upload.complete = True
+        upload.updated_at = time.monotonic()
+        with self._lock:
+            self.completed += 1
+
+    def take(self, upload_id, sid):
+        """Removes and returns a completed upload of this connection, or None."""
+        upload = self.get(upload_id, sid)
+        if upload is None or not upload.complete:
+            return None
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        return upload
+
+    def discard(self, upload_id):
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is not None:
+            upload.close()
+
+    def discard_client(self, sid):
+        """Drops every upload of a disconnected client."""
+        with self._lock:
+            uploads = [upload for upload in self._uploads.values() if upload.sid == sid]
+            for upload in uploads:
+                del self._uploads[upload.upload_id]
+        for upload in uploads:
+            upload.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._uploads),
+                'pending_bytes': sum(upload.received for upload in self._uploads.values()),
+                'started': self.started,
+                'completed': self.completed,
+                'expired': self.expired,
+                'bytes_received': self.bytes_received,
+            }
+
+
+chunked_uploads = ChunkedUploadStore(ttl=UPLOAD_TTL_SECONDS, max_pending_per_client=UPLOAD_MAX_PENDING_PER_CLIENT)
+
+
+# --- Generated Artifacts ---
+
+class ArtifactStore:
+    """
+    Generated files (resume PDFs) kept for download over HTTP from /api/artifacts/<id>,
+    so clients can fetch them with caching and range requests instead of receiving base64 over the socket.
+    Artifacts expire after `ttl` seconds and the store is capped by total size.
+    """
 
-        resume_text = None
-        if file_type == 'application/pdf':
-            resume_text = extract_text_from_pdf(resume_bytes)
-        elif file_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            resume_text = extract_text_from_docx(resume_bytes)
-        elif file_type == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet':
-            resume_text = extract_text_from_xlsx(resume_bytes)
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self._secret = secrets.token_bytes(32) # Keeps ids derived from content keys unguessable
+        # Sized for the data plus its base64 form, which is kept once it has been encoded
+        self._artifacts = BoundedLRUCache(max_entries, max_bytes, sizeof=lambda artifact: len(artifact['data']) * 7 // 3)
+        self.reused = 0
+
+    def put(self, data, mimetype, download_name, content_key=None):
+        """
+        Stores a generated file and returns its id. Files stored with the same `content_key`
+        (e.g. the render cache key) share one artifact while it is kept, instead of a copy each.
+        """
+        if content_key is None:
+            artifact_id = secrets.token_urlsafe(16) # Unguessable: the id grants access to the document
         else:
-            emit('error', {'message': 'Unsupported file type. Please upload PDF, DOCX, or XLSX.'}, room=request.sid)
-            return
+            digest = hmac.new(self._secret, content_key.encode('utf-8'), hashlib.sha256).digest()
+            artifact_id = base64.urlsafe_b64encode(digest[:16]).decode('ascii').rstrip('=')
+            if self._artifacts.get(artifact_id) is not None:
+                self.reused += 1
+                return artifact_id
+        self._artifacts.set(artifact_id, {
+            'data': data,
+            'mimetype': mimetype,
+            'download_name': download_name,
+            'etag': hashlib.sha256(data).hexdigest(),
+        }, ttl=self.ttl)
+        return artifact_id
 
-        if not resume_text:
-            emit('error', {'message': f'Could not extract text from the provided {file_type} file. It might be empty or corrupted.'}, room=request.sid)
-            return
+    def get(self, artifact_id):
+        return self._artifacts.get(artifact_id)
+
+    def base64_data(self, artifact_id):
+        """Returns the data of an artifact as base64 text, encoded on first use only; None if it is gone."""
+        artifact = self._artifacts.get(artifact_id)
+        if artifact is None:
+            return None
+        if 'data_b64' not in artifact:
+            artifact['data_b64'] = base64.b64encode(artifact['data']).decode('utf-8')
+        return artifact['data_b64']
+
+    def stats(self):
+        return {**self._artifacts.stats(), 'reused': self.reused}
+
+
+artifact_store = ArtifactStore(
+    ttl=ARTIFACT_TTL_SECONDS,
+    max_entries=ARTIFACT_STORE_MAX_ENTRIES,
+    max_bytes=ARTIFACT_STORE_MAX_BYTES,
+)
+
+
+# --- Context Budget ---
+
+# Compaction and trimming statistics, reported under prompt_budget in /api/metrics
+prompt_budget_stats = Counter()
+
+PROMPT_SHEET_SEPARATOR = re.compile(r"^--- Sheet: .* ---$")
+PROMPT_PAGE_MARGIN_LINES = 2 # Lines at the top and at the bottom of each page that may be a header or footer
+PROMPT_TRUNCATION_NOTE = "[... trimmed to fit the model's context window ...]"
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting: LLM_CHARS_PER_TOKEN characters per token."""
+    return math.ceil(len(text) / LLM_CHARS_PER_TOKEN)
+
+
+def page_margin_keys(lines):
+    """
+    Returns `{index: key}` for the header lines (first PROMPT_PAGE_MARGIN_LINES non-blank lines) and
+    footer lines (last ones) of a page. Keys ignore digits, so "Page 1" and "Page 2" match, and
+    headers never match footers.
+    """
+    filled = [index for index, line in enumerate(lines) if line]
+    margins = {index: ('header', re.sub(r"\d+", "#", lines[index])) for index in filled[:PROMPT_PAGE_MARGIN_LINES]}
+    for index in filled[-PROMPT_PAGE_MARGIN_LINES:]:
+        margins.setdefault(index, ('footer', re.sub(r"\d+", "#", lines[index])))
+    return margins
+
+
+def compact_prompt_text(text):
+    """
+    Removes what costs prompt tokens without informing the model: runs of spaces, blank line runs,
+    spreadsheet sheet separators, and running headers/footers of PDF pages.
+    Only lines at the top or bottom of a page (pages are separated by PDF_PAGE_BREAK) can be a
+    header or footer; one that recurs in the same place on another page is kept on its first page
+    only. Lines in the body of a page are never dropped.
+    """
+    pages = [[" ".join(line.split()) for line in page.splitlines()] for page in text.split(PDF_PAGE_BREAK)]
+    margins = [page_margin_keys(lines) if len(pages) > 1 else {} for lines in pages]
+    pages_per_key = Counter(key for page_margins in margins for key in set(page_margins.values()))
+    seen = set()
+    compacted = []
+    for lines, page_margins in zip(pages, margins):
+        for index, line in enumerate(lines):
+            if not line:
+                if compacted and compacted[-1]:
+                    compacted.append("")
+                continue
+            if PROMPT_SHEET_SEPARATOR.match(line):
+                continue
+            key = page_margins.get(index)
+            if key is not None and pages_per_key[key] >= 2:
+                if key in seen:
+                    continue
+                seen.add(key)
+            compacted.append(line)
+    return "\n".join(compacted).strip()
+
+
+def trim_to_tokens(text, max_tokens):
+    """Cuts text at a line boundary so it fits `max_tokens`, marking that it was trimmed."""
+    max_chars = int(max_tokens * LLM_CHARS_PER_TOKEN) - len(PROMPT_TRUNCATION_NOTE) - 1
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars].rstrip() + "\n" + PROMPT_TRUNCATION_NOTE
+
+
+def fit_prompt_to_budget(render, sections, output_tokens=None):
+    """
+    Renders a prompt from compacted inputs that fits the context window, leaving `output_tokens`
+    (default: the max_tokens sampling parameter; builders pass generation_budget()) for the answer.
 
-        analysis_prompt = f"""
+    `sections` maps each keyword argument of `render` to `(text, priority)`. If the prompt is still
+    over budget after compaction, sections are trimmed from the end, lowest priority first, but never
+    below LLM_PROMPT_MIN_SECTION_TOKENS.
+    """
+    output_tokens = LM_STUDIO_SAMPLING_PARAMS["max_tokens"] if output_tokens is None else output_tokens
+    budget = LLM_CONTEXT_WINDOW_TOKENS - output_tokens - LLM_CONTEXT_SAFETY_MARGIN_TOKENS
+    texts = {}
+    for name, (text, _) in sections.items():
+        texts[name] = compact_prompt_text(text)
+        prompt_budget_stats['chars_before_compaction'] += len(text)
+        prompt_budget_stats['chars_after_compaction'] += len(texts[name])
+    prompt = render(**texts)
+    prompt_budget_stats['prompts'] += 1
+
+    for name in sorted(sections, key=lambda section: sections[section][1]):
+        over = estimate_tokens(prompt) - budget
+        if over <= 0:
+            break
+        section_tokens = estimate_tokens(texts[name])
+        keep_tokens = max(LLM_PROMPT_MIN_SECTION_TOKENS, section_tokens - over)
+        if keep_tokens < section_tokens:
+            texts[name] = trim_to_tokens(texts[name], keep_tokens)
+            prompt = render(**texts)
+            prompt_budget_stats['trimmed_sections'] += 1
+    else:
+        over = estimate_tokens(prompt) - budget
+        if over > 0:
+            prompt_budget_stats['over_budget_prompts'] += 1
+            print(f"WARNING: Prompt still exceeds the context budget by about {over} tokens after trimming.")
+    return prompt
+
+
+# --- Prompt Builders ---
+
+ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER", "description": "Compatibility score (1-10)"},
+        "suggestions": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "revised_summary": {"type": "STRING", "description": "Suggested professional summary/objective"},
+        "ai_revised_full_resume_text": {"type": "STRING", "description": "The entire rewritten resume content"}
+    },
+    "required": ["score", "suggestions", "revised_summary", "ai_revised_full_resume_text"]
+}
+
+# The single-prompt analysis with the rewrite deferred to request_full_rewrite
+ANALYSIS_SCHEMA_WITHOUT_REWRITE = {
+    "type": "OBJECT",
+    "properties": {key: value for key, value in ANALYSIS_SCHEMA["properties"].items() if key != "ai_revised_full_resume_text"},
+    "required": [key for key in ANALYSIS_SCHEMA["required"] if key != "ai_revised_full_resume_text"],
+}
+
+
+def build_analysis_prompt(resume_text, job_description, include_rewrite=True):
+    """
+    Builds the resume analysis and full rewrite prompt for `analysis_result`, fitted to the context budget.
+    With `include_rewrite=False` the rewrite is left out (see ANALYSIS_SCHEMA_WITHOUT_REWRITE).
+    """
+    rewrite_task = """
+4.  Rewrite the ENTIRE provided resume content to optimize it for the job description and improve the compatibility score. Focus on incorporating relevant keywords, emphasizing achievements pertinent to the role, and making the resume more impactful for this specific job. Maintain the original structure and content where possible, but rephrase and enhance sections as needed. Ensure the revised resume content is coherent and professional.""" if include_rewrite else ""
+    rewrite_key = """
+-   `ai_revised_full_resume_text`: A string containing the entire rewritten resume content, optimized for the job description.""" if include_rewrite else ""
+
+    def render(resume_text, job_description):
+        return f"""
 As an expert resume analyzer, compare the following resume to the provided job description.
 Your task is to:
 1.  Assign a compatibility score between 1 and 10 (10 being a perfect match).
 2.  Identify key areas where the resume could be improved to better align with the job description. Provide specific, actionable suggestions.
-3.  Suggest a brief (2-3 sentences) professional summary/objective for the resume, tailored to the job description.
-4.  Rewrite the ENTIRE provided resume content to optimize it for the job description and improve the compatibility score. Focus on incorporating relevant keywords, emphasizing achievements pertinent to the role, and making the resume more impactful for this specific job. Maintain the original structure and content where possible, but rephrase and enhance sections as needed. Ensure the revised resume content is coherent and professional.
+3.  Suggest a brief (2-3 sentences) professional summary/objective for the resume, tailored to the job description.{rewrite_task}
 
 **IMPORTANT:** Your entire response MUST be a SINGLE JSON object. Do NOT include any other text, explanations, or markdown formatting.
 The JSON object MUST have the following keys:
 -   `score`: An integer from 1 to 10.
 -   `suggestions`: An array of strings, each string being an actionable suggestion.
--   `revised_summary`: A brief (2-3 sentences) suggested professional summary/objective for the resume, tailored to the job description.
--   `ai_revised_full_resume_text`: A string containing the entire rewritten resume content, optimized for the job description.
+-   `revised_summary`: A brief (2-3 sentences) suggested professional summary/objective for the resume, tailored to the job description.{rewrite_key}
 If you cannot generate valid JSON, provide the literal string '{JSON_ERROR_RESPONSE_LITERAL}'.
 
 Resume:
@@ -1314,69 +3565,112 @@ Job Description:
 {job_description}
 ```
 """
-        analysis_schema = {
-            "type": "OBJECT",
-            "properties": {
-                "score": {"type": "INTEGER", "description": "Compatibility score (1-10)"},
-                "suggestions": {"type": "ARRAY", "items": {"type": "STRING"}},
-                "revised_summary": {"type": "STRING", "description": "Suggested professional summary/objective"},
-                "ai_revised_full_resume_text": {"type": "STRING", "description": "The entire rewritten resume content"}
-            },
-            "required": ["score", "suggestions", "revised_summary", "ai_revised_full_resume_text"]
-        }
+    return fit_prompt_to_budget(render, {
+        'resume_text': (resume_text, 2),
+        'job_description': (job_description, 1),
+    }, output_tokens=generation_budget('analysis_result'))
+
+
+# Sub-requests of a fanned-out analysis: result event -> schema. Together they cover ANALYSIS_SCHEMA.
+ANALYSIS_SUBTASKS = {
+    'analysis_score': {
+        "type": "OBJECT",
+        "properties": {
+            "score": {"type": "INTEGER", "description": "Compatibility score (1-10)"},
+            "suggestions": {"type": "ARRAY", "items": {"type": "STRING"}}
+        },
+        "required": ["score", "suggestions"]
+    },
+    'analysis_summary': {
+        "type": "OBJECT",
+        "properties": {
+            "revised_summary": {"type": "STRING", "description": "Suggested professional summary/objective"}
+        },
+        "required": ["revised_summary"]
+    },
+    'analysis_rewrite': {
+        "type": "OBJECT",
+        "properties": {
+            "ai_revised_full_resume_text": {"type": "STRING", "description": "The entire rewritten resume content"}
+        },
+        "required": ["ai_revised_full_resume_text"]
+    },
+}
 
-        # Submit the LLM call to the eventlet background task directly
-        sio.start_background_task(async_lm_studio_call, sid=request.sid, prompt=analysis_prompt, schema=analysis_schema, event_name='analysis_result', original_resume_text=resume_text)
+# Task and output instructions for each analysis sub-request
+ANALYSIS_SUBTASK_INSTRUCTIONS = {
+    'analysis_score': (
+        """Your task is to:
+1.  Assign a compatibility score between 1 and 10 (10 being a perfect match).
+2.  Identify key areas where the resume could be improved to better align with the job description. Provide specific, actionable suggestions.""",
+        """-   `score`: An integer from 1 to 10.
+-   `suggestions`: An array of strings, each string being an actionable suggestion.""",
+    ),
+    'analysis_summary': (
+        """Your task is to suggest a brief (2-3 sentences) professional summary/objective for the resume, tailored to the job description.""",
+        """-   `revised_summary`: A brief (2-3 sentences) suggested professional summary/objective for the resume, tailored to the job description.""",
+    ),
+    'analysis_rewrite': (
+        """Your task is to rewrite the ENTIRE provided resume content to optimize it for the job description and improve the compatibility score. Focus on incorporating relevant keywords, emphasizing achievements pertinent to the role, and making the resume more impactful for this specific job. Maintain the original structure and content where possible, but rephrase and enhance sections as needed. Ensure the revised resume content is coherent and professional.""",
+        """-   `ai_revised_full_resume_text`: A string containing the entire rewritten resume content, optimized for the job description.""",
+    ),
+}
 
-    except Exception as e:
-        print(f"ERROR: Exception during upload_resume_and_jd: {e}")
-        traceback.print_exc()
-        emit('error', {'message': f'Server error during analysis: {e}'}, room=request.sid)
 
+def build_analysis_subtask_prompt(task, resume_text, job_description):
+    """Builds the prompt for one sub-request of a fanned-out analysis (a key of ANALYSIS_SUBTASKS)."""
+    instructions, output_keys = ANALYSIS_SUBTASK_INSTRUCTIONS[task]
 
-@sio.on('apply_edits')
-def handle_apply_edits(data):
-    """
-    Receives edited resume text (now AI-generated and potentially user-tweaked),
-    revised summary, and template choice, then generates a new PDF.
-    """
-    print(f"Received apply_edits event from {request.sid}")
-    edited_resume_text = data.get('edited_resume_text')
-    revised_summary = data.get('revised_summary')
-    selected_template = data.get('selected_template')
-
-    if not edited_resume_text:
-        emit('error', {'message': 'Edited resume text is empty.'}, room=request.sid)
-        return
-    if not selected_template:
-        emit('error', {'message': 'Please select a resume template.'}, room=request.sid)
-        return
-
-    try:
-        new_pdf_bytes = apply_edits_to_template(edited_resume_text, revised_summary, selected_template)
-        new_pdf_b64 = base64.b64encode(new_pdf_bytes).decode('utf-8')
+    def render(resume_text, job_description):
+        return f"""
+As an expert resume analyzer, compare the following resume to the provided job description.
+{instructions}
 
-        emit('updated_resume_pdf', {'pdf_b64': new_pdf_b64}, room=request.sid)
+**IMPORTANT:** Your entire response MUST be a SINGLE JSON object. Do NOT include any other text, explanations, or markdown formatting.
+The JSON object MUST have the following keys:
+{output_keys}
+If you cannot generate valid JSON, provide the literal string '{JSON_ERROR_RESPONSE_LITERAL}'.
 
-    except Exception as e:
-        print(f"ERROR: Exception during apply_edits: {e}")
-        traceback.print_exc()
-        emit('error', {'message': f'Server error during PDF generation: {e}'}, room=request.sid)
+Resume:
+```
+{resume_text}
+```
 
-@sio.on('request_interview_prep')
-def handle_request_interview_prep(data):
-    """
-    Generates interview preparation materials based on job description.
-    """
-    print(f"Received request_interview_prep event from {request.sid}")
-    job_description = data.get('job_description')
+Job Description:
+```
+{job_description}
+```
+"""
+    return fit_prompt_to_budget(render, {
+        'resume_text': (resume_text, 2),
+        'job_description': (job_description, 1),
+    }, output_tokens=generation_budget(task))
+
+
+INTERVIEW_PREP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "interview_questions": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "question": {"type": "STRING"},
+                    "ideal_answer_outline": {"type": "STRING"}
+                },
+                "required": ["question", "ideal_answer_outline"]
+            }
+        },
+        "interview_tips": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": ["interview_questions", "interview_tips"]
+}
 
-    if not job_description:
-        emit('error', {'message': 'Job Description is required for interview prep.'}, room=request.sid)
-        return
 
-    try:
-        interview_prompt = f"""
+def build_interview_prep_prompt(job_description):
+    """Builds the interview preparation prompt for `interview_prep_materials`."""
+    def render(job_description):
+        return f"""
 As an expert interview coach, based on the following job description, generate:
 1.  5-7 common interview questions that an applicant for this role might face.
 2.  For each question, provide a brief, high-level outline of an ideal answer, highlighting what aspects the interviewer is looking for.
@@ -1393,48 +3687,25 @@ Job Description:
 {job_description}
 ```
 """
-        interview_schema = {
-            "type": "OBJECT",
-            "properties": {
-                "interview_questions": {
-                    "type": "ARRAY",
-                    "items": {
-                        "type": "OBJECT",
-                        "properties": {
-                            "question": {"type": "STRING"},
-                            "ideal_answer_outline": {"type": "STRING"}
-                        },
-                        "required": ["question", "ideal_answer_outline"]
-                    }
-                },
-                "interview_tips": {"type": "ARRAY", "items": {"type": "STRING"}}
-            },
-            "required": ["interview_questions", "interview_tips"]
-        }
-
-        # Submit the LLM call to the eventlet background task directly
-        sio.start_background_task(async_lm_studio_call, sid=request.sid, prompt=interview_prompt, schema=interview_schema, event_name='interview_prep_materials')
-
-    except Exception as e:
-        print(f"ERROR: Exception during request_interview_prep: {e}")
-        traceback.print_exc()
-        emit('error', {'message': f'Server error during interview prep: {e}'}, room=request.sid)
-
-@sio.on('start_interview_simulation')
-def handle_start_interview_simulation(data):
-    """
-    Generates a personalized behavioral interview question based on resume and job description.
-    """
-    print(f"Received start_interview_simulation event from {request.sid}")
-    resume_text = data.get('resume_text')
-    job_description = data.get('job_description')
+    return fit_prompt_to_budget(render, {
+        'job_description': (job_description, 1),
+    }, output_tokens=generation_budget('interview_prep_materials'))
+
+
+INTERVIEW_QUESTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "scenario": {"type": "STRING"}
+    },
+    "required": ["question", "scenario"]
+}
 
-    if not resume_text or not job_description:
-        emit('error', {'message': 'Resume text and Job Description are required for interview simulation.'}, room=request.sid)
-        return
 
-    try:
-        simulation_prompt = f"""
+def build_interview_question_prompt(resume_sections, job_description):
+    """Builds the behavioral interview question prompt for `interview_question` from the parsed resume sections."""
+    def render(resume_text, job_description):
+        return f"""
 As an expert interviewer. Based on the following resume and job description, generate ONE challenging behavioral interview question.
 The question should focus on a skill or experience that is crucial for the role but might be a subtle gap or a strong point to elaborate on from the resume.
 Frame it as a STAR method question (e.g., "Tell me about a time when...").
@@ -1446,7 +3717,7 @@ The JSON object MUST have
 -   `scenario`: A brief contextual scenario for the question (string).
 If you cannot generate valid JSON, provide the literal string '{JSON_ERROR_RESPONSE_LITERAL}'.
 
-Resume:
+Resume (relevant sections):
 ```
 {resume_text}
 ```
@@ -1456,40 +3727,31 @@ Job Description:
 {job_description}
 ```
 """
-        simulation_schema = {
-            "type": "OBJECT",
-            "properties": {
-                "question": {"type": "STRING"},
-                "scenario": {"type": "STRING"}
-            },
-            "required": ["question", "scenario"]
-        }
-
-        # Submit the LLM call to the eventlet background task directly
-        sio.start_background_task(async_lm_studio_call, sid=request.sid, prompt=simulation_prompt, schema=simulation_schema, event_name='interview_question')
+    return fit_prompt_to_budget(render, {
+        'resume_text': (format_resume_sections(resume_sections, INTERVIEW_QUESTION_RESUME_SECTIONS), 1),
+        'job_description': (job_description, 2),
+    }, output_tokens=generation_budget('interview_question'))
+
+
+INTERVIEW_FEEDBACK_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "star_feedback": {"type": "STRING"},
+        "relevance_impact_feedback": {"type": "STRING"},
+        "clarity_feedback": {"type": "STRING"},
+        "overall_suggestion": {"type": "STRING"}
+    },
+    "required": ["star_feedback", "relevance_impact_feedback", "clarity_feedback", "overall_suggestion"]
+}
 
-    except Exception as e:
-        print(f"ERROR: Exception during start_interview_simulation: {e}")
-        traceback.print_exc()
-        emit('error', {'message': f'Server error during simulation: {e}'}, room=request.sid)
 
-@sio.on('get_interview_feedback')
-def handle_get_interview_feedback(data):
+def build_interview_feedback_prompt(job_description, resume_sections, question, user_answer):
     """
-    Provides real-time feedback on a user's interview answer.
+    Builds the answer feedback prompt for `interview_feedback`. Only the experience and projects
+    sections of the resume are included, and they are trimmed first.
     """
-    print(f"Received get_interview_feedback event from {request.sid}")
-    question = data.get('question')
-    user_answer = data.get('user_answer')
-    job_description = data.get('job_description')
-    resume_text = data.get('resume_text')
-
-    if not question or not user_answer or not job_description or not resume_text:
-        emit('error', {'message': 'Question, user answer, job description, and resume are required for feedback.'}, room=request.sid)
-        return
-
-    try:
-        feedback_prompt = f"""
+    def render(job_description, resume_text, question, user_answer):
+        return f"""
 As an expert interview coach. Analyze the following user's interview answer for the given question, considering the job description and their resume.
 Provide constructive feedback focusing on:
 1.  **STAR Method Adherence:** Does the answer follow the Situation, Task, Action, Result structure? Point out missing components.
@@ -1511,7 +3773,7 @@ Job Description:
 {job_description}
 ```
 
-Resume:
+Resume (relevant sections):
 ```
 {resume_text}
 ```
@@ -1527,43 +3789,51 @@ User's Answer:
 ```
 ---
 """
-        feedback_schema = {
-            "type": "OBJECT",
-            "properties": {
-                "star_feedback": {"type": "STRING"},
-                "relevance_impact_feedback": {"type": "STRING"},
-                "clarity_feedback": {"type": "STRING"},
-                "overall_suggestion": {"type": "STRING"}
-            },
-            "required": ["star_feedback", "relevance_impact_feedback", "clarity_feedback", "overall_suggestion"]
-        }
-
-        # Submit the LLM call to the eventlet background task directly
-        sio.start_background_task(async_lm_studio_call, sid=request.sid, prompt=feedback_prompt, schema=feedback_schema, event_name='interview_feedback')
-
-    except Exception as e:
-        print(f"ERROR: Exception during get_interview_feedback: {e}")
-        traceback.print_exc()
-        emit('error', {'message': f'Server error during feedback: {e}'}, room=request.sid)
-
-@sio.on('request_career_roadmap')
-def handle_request_career_roadmap(data):
-    """
-    Generates a predictive career trajectory and skill pathing roadmap.
-    """
-    print(f"Received request_career_roadmap event from {request.sid}")
-    resume_text = data.get('resume_text')
-    job_description = data.get('job_description')
-    desired_roles = data.get('desired_roles')
+    return fit_prompt_to_budget(render, {
+        'job_description': (job_description, 2),
+        'resume_text': (format_resume_sections(resume_sections, INTERVIEW_FEEDBACK_RESUME_SECTIONS), 1),
+        'question': (question, 3),
+        'user_answer': (user_answer, 3),
+    }, output_tokens=generation_budget('interview_feedback'))
+
+
+CAREER_ROADMAP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "skill_gaps": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "category": {"type": "STRING"},
+                    "skills": {"type": "ARRAY", "items": {"type": "STRING"}}
+                },
+                "required": ["category", "skills"]
+            }
+        },
+        "learning_recommendations": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "skill_area": {"type": "STRING"},
+                    "resources": {"type": "ARRAY", "items": {"type": "STRING"}}
+                },
+                "required": ["skill_area", "resources"]
+            }
+        },
+        "project_ideas": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "networking_tips": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "aspirational_summary": {"type": "STRING"}
+    },
+    "required": ["skill_gaps", "learning_recommendations", "project_ideas", "networking_tips", "aspirational_summary"]
+}
 
-    if not resume_text or not job_description or not desired_roles:
-        emit('error', {'message': 'Resume text, current job description, and desired roles are required for career roadmap.'}, room=request.sid)
-        return
 
-    desired_roles_str = ", ".join(desired_roles)
-
-    try:
-        roadmap_prompt = f"""
+def build_career_roadmap_prompt(resume_sections, job_description, desired_roles_str):
+    """Builds the career roadmap prompt for `career_roadmap` from the parsed resume sections (contact details left out)."""
+    def render(resume_text, job_description, desired_roles_str):
+        return f"""
 As an expert career coach and talent development specialist.
 Based on the provided resume and the current target job description, and the user's desired future career roles ({desired_roles_str}), generate a personalized career roadmap.
 
@@ -1584,7 +3854,7 @@ The JSON object MUST have the following keys:
 If you cannot generate valid JSON, provide the literal string '{JSON_ERROR_RESPONSE_LITERAL}'.
 
 ---
-Resume:
+Resume (relevant sections):
 ```
 {resume_text}
 ```
@@ -1600,40 +3870,720 @@ Desired Future Roles:
 ```
 ---
 """
-        roadmap_schema = {
-            "type": "OBJECT",
-            "properties": {
-                "skill_gaps": {
-                    "type": "ARRAY",
-                    "items": {
-                        "type": "OBJECT",
-                        "properties": {
-                            "category": {"type": "STRING"},
-                            "skills": {"type": "ARRAY", "items": {"type": "STRING"}}
-                        },
-                        "required": ["category", "skills"]
-                    }
-                },
-                "learning_recommendations": {
-                    "type": "ARRAY",
-                    "items": {
-                        "type": "OBJECT",
-                        "properties": {
-                            "skill_area": {"type": "STRING"},
-                            "resources": {"type": "ARRAY", "items": {"type": "STRING"}}
-                        },
-                        "required": ["skill_area", "resources"]
-                    }
-                },
-                "project_ideas": {"type": "ARRAY", "items": {"type": "STRING"}},
-                "networking_tips": {"type": "ARRAY", "items": {"type": "STRING"}},
-                "aspirational_summary": {"type": "STRING"}
-            },
-            "required": ["skill_gaps", "learning_recommendations", "project_ideas", "networking_tips", "aspirational_summary"]
+    return fit_prompt_to_budget(render, {
+        'resume_text': (format_resume_sections(resume_sections, CAREER_ROADMAP_RESUME_SECTIONS), 2),
+        'job_description': (job_description, 1),
+        'desired_roles_str': (desired_roles_str, 3),
+    }, output_tokens=generation_budget('career_roadmap'))
+
+
+# --- Batch Analysis ---
+
+# MIME type of each supported resume file extension
+EXTENSION_MIME_TYPES = {extension: mime_type for mime_type, extension in ALLOWED_MIME_TYPES.items()}
+
+
+def iter_batch_resumes(resume_source):
+    """
+    Yields `(name, file_bytes, file_type)` for every supported resume in a directory (recursively) or a .zip archive.
+    Files larger than MAX_FILE_SIZE_BYTES are skipped.
+    """
+    if zipfile.is_zipfile(resume_source):
+        with zipfile.ZipFile(resume_source) as archive:
+            for member in sorted(archive.infolist(), key=lambda info: info.filename):
+                file_type = EXTENSION_MIME_TYPES.get(os.path.splitext(member.filename)[1].lower())
+                if member.is_dir() or file_type is None or member.filename.startswith('__MACOSX/'):
+                    continue
+                if member.file_size > MAX_FILE_SIZE_BYTES:
+                    print(f"WARNING: Skipping {member.filename}: larger than {MAX_FILE_SIZE_BYTES} bytes.")
+                    continue
+                yield member.filename, archive.read(member), file_type
+        return
+    for directory, _, file_names in sorted(os.walk(resume_source)):
+        for file_name in sorted(file_names):
+            file_type = EXTENSION_MIME_TYPES.get(os.path.splitext(file_name)[1].lower())
+            if file_type is None:
+                continue
+            path = os.path.join(directory, file_name)
+            if os.path.getsize(path) > MAX_FILE_SIZE_BYTES:
+                print(f"WARNING: Skipping {path}: larger than {MAX_FILE_SIZE_BYTES} bytes.")
+                continue
+            with open(path, 'rb') as resume_file:
+                yield os.path.relpath(path, resume_source), resume_file.read(), file_type
+
+
+def completed_batch_items(output_path, statuses=('ok',)):
+    """
+    Returns the `(resume, job_description_id)` pairs of an output file whose record has one of `statuses`:
+    "ok" for full LLM analyses, "prescored" for pre-score-only records.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding='utf-8') as output_file:
+        for line in output_file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # A line cut short by an interrupted run
+            if record.get('status') in statuses:
+                completed.add((record.get('resume'), record.get('job_description_id')))
+    return completed
+
+
+def run_batch_analysis(resume_source, job_descriptions, output_path, concurrency=None, prescore_only=False):
+    """
+    Analyzes every resume in `resume_source` (a directory or .zip) against each job description
+    and appends one JSON line per (resume, job description) pair to `output_path`.
+
+    `job_descriptions` maps an id (e.g. the JD file name) to its text. Documents are parsed in the
+    extraction process pool and up to `concurrency` LLM analyses run at once. Pairs already written
+    with status "ok" are skipped, so an interrupted run can be resumed with the same arguments.
+    With `prescore_only`, only the local pre-score is recorded (status "prescored") and the LLM is
+    not called; a later full run still analyzes those pairs.
+    Returns counts of analyzed, skipped and failed pairs.
+    """
+    concurrency = concurrency or BATCH_CONCURRENCY
+    completed = completed_batch_items(output_path, ('ok', 'prescored') if prescore_only else ('ok',))
+    counts = Counter()
+    pool = eventlet.GreenPool(concurrency)
+
+    with open(output_path, 'a', encoding='utf-8') as output_file:
+        def write_record(record):
+            record['completed_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            output_file.write(json.dumps(record) + '\n')
+            output_file.flush() # Every finished pair survives an interruption
+            counts['failed' if record['status'] == 'error' else 'ok'] += 1
+
+        def analyze_resume(name, file_bytes, file_type, pending):
+            digest = hashlib.sha256(file_bytes).hexdigest()
+            base = {'resume': name, 'resume_sha256': digest}
+            try:
+                resume_text = extract_document_text(file_bytes, file_type, digest=digest)
+            except WorkerTaskError as e:
+                resume_text = None
+                print(f"ERROR: Could not extract {name}: {e}")
+            for jd_id in pending:
+                record = {**base, 'job_description_id': jd_id}
+                if not resume_text:
+                    write_record({**record, 'status': 'error', 'error': 'Could not extract text from the resume.'})
+                    continue
+                job_description = job_descriptions[jd_id]
+                record['preliminary_analysis'] = compute_preliminary_analysis(resume_text, job_description)
+                if prescore_only:
+                    write_record({**record, 'status': 'prescored'})
+                    continue
+                analysis = cached_lm_studio_call(build_analysis_prompt(resume_text, job_description), ANALYSIS_SCHEMA, 'analysis_result')
+                if "error" in analysis:
+                    write_record({**record, 'status': 'error', 'error': analysis['error']})
+                else:
+                    write_record({**record, 'status': 'ok', 'analysis': analysis})
+
+        for name, file_bytes, file_type in iter_batch_resumes(resume_source):
+            pending = [jd_id for jd_id in job_descriptions if (name, jd_id) not in completed]
+            counts['skipped'] += len(job_descriptions) - len(pending)
+            if pending:
+                pool.spawn_n(analyze_resume, name, file_bytes, file_type, pending)
+        pool.waitall()
+
+    summary = {'analyzed': counts['ok'], 'skipped': counts['skipped'], 'failed': counts['failed'], 'output': output_path}
+    print(f"INFO: Batch analysis finished: {summary}")
+    return summary
+
+
+def batch_main(argv):
+    """Command line entry point: python app.py batch --resumes DIR_OR_ZIP --jd FILE [--jd FILE ...] --output FILE"""
+    parser = argparse.ArgumentParser(prog='app.py batch', description='Analyze a directory or zip of resumes against job descriptions.')
+    parser.add_argument('--resumes', required=True, help='Directory or .zip archive of PDF, DOCX or XLSX resumes')
+    parser.add_argument('--jd', required=True, action='append', help='Job description text file (repeatable)')
+    parser.add_argument('--output', required=True, help='JSONL file to append results to; existing results are skipped')
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY, help='Maximum concurrent LLM analyses')
+    parser.add_argument('--prescore-only', action='store_true', help='Only compute the local pre-score, without the LLM')
+    args = parser.parse_args(argv)
+
+    job_descriptions = {}
+    for path in args.jd:
+        jd_id = os.path.basename(path) # The id recorded in the output, so it must be unique
+        if jd_id in job_descriptions:
+            parser.error(f"two job description files are named {jd_id}; rename one so their results can be told apart")
+        with open(path, encoding='utf-8') as jd_file:
+            job_descriptions[jd_id] = jd_file.read()
+    summary = run_batch_analysis(args.resumes, job_descriptions, args.output,
+                                 concurrency=args.concurrency, prescore_only=args.prescore_only)
+    return 1 if summary['failed'] else 0
+
+
+# --- Flask Routes ---
+@app.route('/')
+def index():
+    """Serves the index.html file from the templates folder."""
+    return render_template('index.html')
+
+@app.route('/test', methods=['GET'])
+def test_api():
+    dummy_data = {
+        "id": 1,
+        "name": "Dummy Data",
+        "status": "success"
+    }
+    return jsonify(dummy_data)
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_api():
+    """Exposes runtime statistics for capacity planning."""
+    return jsonify({
+        'llm_pool': llm_client_pool.stats(),
+        'llm_backends': llm_router.stats(),
+        'llm_cache': llm_response_cache.stats() if llm_response_cache is not None else None,
+        'llm_single_flight': llm_single_flight.stats(),
+        'llm_generation': {
+            'profiles': LLM_GENERATION_PROFILES,
+            'events': {event: dict(counters) for event, counters in llm_generation_stats.items()},
+        },
+        'llm_scheduler': llm_scheduler.stats(),
+        'sessions': session_store.stats(),
+        'extraction_pool': extraction_pool.stats(),
+        'render_pool': render_pool.stats(),
+        'rank_pool': rank_pool.stats(),
+        'render_cache': render_cache.stats(),
+        'prompt_budget': dict(prompt_budget_stats),
+        'extraction_cache': extraction_cache.stats() if extraction_cache is not None else None,
+        'uploads': chunked_uploads.stats(),
+        'artifacts': artifact_store.stats(),
+    })
+
+@app.route('/api/uploads', methods=['POST'])
+def upload_api():
+    """
+    Receives a resume as multipart/form-data (`file`, plus the uploading connection's Socket.IO `sid`)
+    and returns an upload id to send with upload_resume_and_jd, as with chunked socket uploads.
+    The body is parsed as it arrives and the file part is written straight into a ChunkedUpload, so
+    `sid` (and the optional `file_type`) must come before `file` in the form.
+    """
+    if request.content_length is None:
+        return jsonify({'error': 'A Content-Length header is required; chunked request bodies are not accepted.'}), 411
+    if request.content_length > MAX_FILE_SIZE_BYTES + UPLOAD_MULTIPART_OVERHEAD_BYTES:
+        return jsonify({'error': f'File size exceeds the limit of {MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f} MB.'}), 413
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return jsonify({'error': 'The resume must be sent as multipart/form-data.'}), 400
+
+    # Never touches request.form / request.files, which would make Werkzeug spool the whole body first
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_parts=10)
+    fields = {}
+    field_bytes = 0
+    part = None
+    upload = None
+    file_complete = False
+    try:
+        for chunk in iter(lambda: request.stream.read(UPLOAD_CHUNK_SIZE_BYTES), b''):
+            decoder.receive_data(chunk)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, File):
+                    if event.name != 'file' or upload is not None:
+                        return jsonify({'error': 'Send exactly one file, in the `file` field.'}), 400
+                    sid = fields.get('sid')
+                    if not sid or not sio.server.manager.is_connected(sid, '/'):
+                        return jsonify({'error': 'A connected Socket.IO sid is required, before the file part.'}), 400
+                    file_type = fields.get('file_type') or parse_options_header(event.headers.get('Content-Type', ''))[0]
+                    if file_type not in TEXT_EXTRACTORS:
+                        return jsonify({'error': 'Unsupported file type. Please upload PDF, DOCX, or XLSX.'}), 415
+                    upload = chunked_uploads.begin(sid, file_type, MAX_FILE_SIZE_BYTES)
+                    if upload is None:
+                        return jsonify({'error': 'Too many uploads in progress. Please wait for the current one to finish.'}), 429
+                    part = event
+                elif isinstance(event, Field):
+                    part = event
+                    fields[part.name] = ''
+                elif isinstance(event, Data) and isinstance(part, File):
+                    # Hashed and spooled as it arrives, like a chunk sent over the socket
+                    if upload.received + len(event.data) > MAX_FILE_SIZE_BYTES:
+                        return jsonify({'error': f'File size exceeds the limit of {MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f} MB.'}), 413
+                    chunked_uploads.add_chunk(upload, event.data)
+                    file_complete = not event.more_data
+                elif isinstance(event, Data):
+                    field_bytes += len(event.data)
+                    if field_bytes > UPLOAD_MULTIPART_OVERHEAD_BYTES:
+                        return jsonify({'error': 'Form fields are too large.'}), 413
+                    fields[part.name] += event.data.decode('utf-8', 'replace')
+                event = decoder.next_event()
+    except ValueError as e:
+        return jsonify({'error': f'Malformed multipart body: {e}'}), 400
+    finally:
+        if upload is not None and not (file_complete and upload.received):
+            chunked_uploads.discard(upload.upload_id)
+
+    if upload is None:
+        return jsonify({'error': 'Resume file is required.'}), 400
+    if not file_complete:
+        return jsonify({'error': 'The upload ended before the file was complete.'}), 400
+    if upload.received == 0:
+        return jsonify({'error': 'The uploaded file is empty.'}), 400
+
+    upload.size = upload.received
+    chunked_uploads.mark_complete(upload)
+    return jsonify({'upload_id': upload.upload_id, 'size': upload.size, 'sha256': upload.hexdigest()}), 201
+
+@app.route('/api/rank', methods=['POST'])
+def rank_api():
+    """
+    Ranks many resumes against one job description and returns the top-k candidates.
+    JSON body: `job_description`, `candidates` (list of `{id, resume_text}` or `{id, session_id}`),
+    optional `top_k`, and optional `deep_analysis_top` with the Socket.IO `sid` that should receive
+    full LLM analyses (as analysis_result events carrying `candidate_id`) for that many top candidates.
+    """
+    if request.content_length is None:
+        return jsonify({'error': 'A Content-Length header is required; chunked request bodies are not accepted.'}), 411
+    if request.content_length > RANK_MAX_REQUEST_BYTES:
+        return jsonify({'error': f'Request body exceeds the limit of {RANK_MAX_REQUEST_BYTES / (1024 * 1024):.0f} MB.'}), 413
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'The request body must be a JSON object.'}), 400
+    job_description = data.get('job_description')
+    candidates = data.get('candidates')
+    if not job_description or not isinstance(job_description, str) or not isinstance(candidates, list) or not candidates:
+        return jsonify({'error': 'A job description string and a non-empty candidates list are required.'}), 400
+    if len(candidates) > RANK_MAX_CANDIDATES:
+        return jsonify({'error': f'At most {RANK_MAX_CANDIDATES} candidates can be ranked per request.'}), 413
+
+    resolved = []
+    for index, candidate in enumerate(candidates):
+        if not isinstance(candidate, dict):
+            return jsonify({'error': f'Candidate {index} must be an object.'}), 400
+        candidate_id = str(candidate.get('id', index))
+        resume_text = candidate.get('resume_text')
+        if resume_text is not None and not isinstance(resume_text, str):
+            return jsonify({'error': f'Candidate {candidate_id} resume_text must be a string.'}), 400
+        if not resume_text and isinstance(candidate.get('session_id'), str):
+            context = session_store.get(candidate['session_id'])
+            resume_text = context.get('resume_text') if context is not None else None
+        if not resume_text:
+            return jsonify({'error': f'Candidate {candidate_id} needs resume_text or a valid session_id.'}), 400
+        resolved.append((candidate_id, resume_text[:EXTRACTION_MAX_CHARS] if EXTRACTION_MAX_CHARS else resume_text))
+
+    try:
+        top_k = max(1, min(int(data.get('top_k', 10)), len(resolved)))
+        deep_analysis_top = max(0, int(data.get('deep_analysis_top', 0)))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k and deep_analysis_top must be integers.'}), 400
+    sid = data.get('sid')
+    if deep_analysis_top and (not sid or not sio.server.manager.is_connected(sid, '/')):
+        return jsonify({'error': 'deep_analysis_top requires the sid of a connected Socket.IO client.'}), 400
+
+    started_at = time.monotonic()
+    try:
+        # CPU-bound over thousands of resumes, so it runs in a worker process like document parsing
+        result = rank_pool.run(rank_resumes, job_description, resolved, top_k)
+    except WorkerTaskError as e:
+        print(f"ERROR: Candidate ranking failed: {e}")
+        return jsonify({'error': f'Ranking failed: {e}'}), 503
+    if result is None:
+        return jsonify({'error': 'The job description contains no usable keywords.'}), 400
+    result['elapsed_seconds'] = round(time.monotonic() - started_at, 3)
+
+    # Full LLM analysis only for the top slice, through the same scheduler as interactive requests.
+    # Queued as one group, so the per-client queue limit counts them as a single request.
+    deep_analysis_entries = result['ranking'][:deep_analysis_top]
+    jobs = []
+    for entry in deep_analysis_entries:
+        resume_text = resolved[entry['index']][1]
+        # Not bound to the recruiter's connection, whose own follow-up events keep their session
+        entry['session_id'] = session_store.create(sid, resume_text, job_description, bind=False)
+        jobs.append((async_lm_studio_call, 'analysis_result', {
+            'prompt': build_analysis_prompt(resume_text, job_description), 'schema': ANALYSIS_SCHEMA,
+            'session_id': entry['session_id'], 'extra_payload': {'candidate_id': entry['id']},
+        }))
+    result['deep_analysis_queued'] = []
+    if jobs and llm_scheduler.submit_group(sid, jobs):
+        result['deep_analysis_queued'] = [entry['id'] for entry in deep_analysis_entries]
+    elif jobs:
+        for entry in deep_analysis_entries:
+            session_store.discard(entry.pop('session_id'))
+        result['deep_analysis_skipped'] = [entry['id'] for entry in deep_analysis_entries]
+        result['deep_analysis_message'] = 'The deep analyses were not queued; the Socket.IO client was sent the reason. Please request them again later.'
+    return jsonify(result)
+
+@app.route('/api/artifacts/<artifact_id>', methods=['GET'])
+def artifact_api(artifact_id):
+    """Serves a generated file with ETag, Content-Length and Range support."""
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
+        return jsonify({'error': 'Artifact not found or expired.'}), 404
+    response = send_file(
+        io.BytesIO(artifact['data']),
+        mimetype=artifact['mimetype'],
+        as_attachment=True,
+        download_name=artifact['download_name'],
+        etag=artifact['etag'],
+        conditional=True, # Handles If-None-Match and Range
+        max_age=ARTIFACT_TTL_SECONDS,
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True # Resumes are personal data, keep them out of shared caches
+    return response
+
+
+# --- Socket.IO Event Handlers (using Flask-SocketIO decorators) ---
+
+@sio.on('connect')
+def connect():
+    print(f'Client connected: {request.sid}')
+    emit('status', {'message': 'Connected to backend!'}, room=request.sid)
+
+@sio.on('disconnect')
+def disconnect():
+    print(f'Client disconnected: {request.sid}')
+    llm_scheduler.cancel_client(request.sid)
+    session_store.unbind(request.sid) # The session itself stays resumable until it expires
+    chunked_uploads.discard_client(request.sid)
+
+@sio.on('resume_session')
+def handle_resume_session(data):
+    """
+    Re-attaches a (re)connected client to an existing session so later events can omit the texts.
+    """
+    print(f"Received resume_session event from {request.sid}")
+    session_id = data.get('session_id')
+    context = session_store.get(session_id)
+    if context is None:
+        emit('error', {'message': 'Session not found or expired. Please upload your resume again.'}, room=request.sid)
+        return
+    session_store.bind(request.sid, session_id)
+    emit('session_context', {'session_id': session_id, 'has_analysis': context.get('analysis') is not None}, room=request.sid)
+
+@sio.on('upload_begin')
+def handle_upload_begin(data):
+    """
+    Starts a chunked binary upload. The declared size and type are checked before any data is sent.
+    Acknowledges with the upload id and the chunk size to use.
+    """
+    print(f"Received upload_begin event from {request.sid}")
+    file_type = data.get('file_type')
+    size = data.get('size')
+
+    if file_type not in TEXT_EXTRACTORS:
+        emit('error', {'message': 'Unsupported file type. Please upload PDF, DOCX, or XLSX.'}, room=request.sid)
+        return {'ok': False}
+    if not isinstance(size, int) or size <= 0:
+        emit('error', {'message': 'The file is empty or its size is missing.'}, room=request.sid)
+        return {'ok': False}
+    if size > MAX_FILE_SIZE_BYTES:
+        emit('error', {'message': f'File size exceeds the limit of {MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f} MB.'}, room=request.sid)
+        return {'ok': False}
+
+    upload = chunked_uploads.begin(request.sid, file_type, size)
+    if upload is None:
+        emit('error', {'message': 'Too many uploads in progress. Please wait for the current one to finish.'}, room=request.sid)
+        return {'ok': False}
+    return {'ok': True, 'upload_id': upload.upload_id, 'chunk_size': UPLOAD_CHUNK_SIZE_BYTES}
+
+@sio.on('upload_chunk')
+def handle_upload_chunk(data):
+    """
+    Appends one binary chunk to an upload. Chunks must arrive in order; the client waits for
+    each acknowledgement before sending the next, which keeps the socket free for other events.
+    """
+    upload_id = data.get('upload_id')
+    chunk = data.get('data')
+    upload = chunked_uploads.get(upload_id, request.sid)
+    if upload is None:
+        emit('error', {'message': 'Upload not found or expired. Please upload the file again.'}, room=request.sid)
+        return {'ok': False}
+    if not isinstance(chunk, (bytes, bytearray)) or len(chunk) > UPLOAD_CHUNK_SIZE_BYTES:
+        chunked_uploads.discard(upload_id)
+        emit('error', {'message': 'Invalid upload chunk. Please upload the file again.'}, room=request.sid)
+        return {'ok': False}
+    if data.get('offset') != upload.received or upload.received + len(chunk) > upload.size:
+        chunked_uploads.discard(upload_id)
+        emit('error', {'message': 'Upload data does not match the declared file size. Please upload the file again.'}, room=request.sid)
+        return {'ok': False}
+
+    chunked_uploads.add_chunk(upload, chunk)
+    return {'ok': True, 'received': upload.received}
+
+@sio.on('upload_complete')
+def handle_upload_complete(data):
+    """
+    Finishes a chunked upload once every declared byte has arrived.
+    The upload id can then be sent with upload_resume_and_jd in place of the file.
+    """
+    print(f"Received upload_complete event from {request.sid}")
+    upload_id = data.get('upload_id')
+    upload = chunked_uploads.get(upload_id, request.sid)
+    if upload is None:
+        emit('error', {'message': 'Upload not found or expired. Please upload the file again.'}, room=request.sid)
+        return {'ok': False}
+    if upload.received != upload.size:
+        chunked_uploads.discard(upload_id)
+        emit('error', {'message': f'Upload incomplete: received {upload.received} of {upload.size} bytes. Please upload the file again.'}, room=request.sid)
+        return {'ok': False}
+
+    chunked_uploads.mark_complete(upload)
+    return {'ok': True, 'upload_id': upload_id, 'sha256': upload.hexdigest()}
+
+@sio.on('upload_resume_and_jd')
+def handle_upload_resume_and_jd(data):
+    """
+    Receives resume PDF and job description, then performs analysis.
+    Handles multiple file types and size validation.
+    The resume is either a completed chunked upload (`upload_id`) or a base64 `resume_file`.
+    A local pre-score is emitted as preliminary_analysis first; with PRESCORE_SKIP_LLM_BELOW set,
+    low-scoring pairs get an analysis_result from it without calling the LLM (unless `force_llm`).
+    """
+    print(f"Received upload_resume_and_jd event from {request.sid}")
+    resume_file_b64 = data.get('resume_file')
+    upload_id = data.get('upload_id')
+    job_description = data.get('job_description')
+    file_type = data.get('file_type')
+
+    if not (resume_file_b64 or upload_id) or not job_description or not (file_type or upload_id):
+        emit('error', {'message': 'Resume file, Job Description, and file type are required.'}, room=request.sid)
+        return
+
+    try:
+        resume_digest = None
+        if upload_id:
+            upload = chunked_uploads.take(upload_id, request.sid)
+            if upload is None:
+                emit('error', {'message': 'Upload not found, incomplete or expired. Please upload the file again.'}, room=request.sid)
+                return
+            file_type = upload.file_type
+            resume_digest = upload.hexdigest() # Hashed while the chunks arrived, within MAX_FILE_SIZE_BYTES
+            resume_bytes = upload.read # Only read from the spool if the extraction cache misses
+        else:
+            # Reject oversized payloads before decoding them
+            if len(resume_file_b64) // 4 * 3 > MAX_FILE_SIZE_BYTES + 2:
+                emit('error', {'message': f'File size exceeds the limit of {MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f} MB.'}, room=request.sid)
+                return
+            resume_bytes = base64.b64decode(resume_file_b64)
+            if len(resume_bytes) > MAX_FILE_SIZE_BYTES:
+                emit('error', {'message': f'File size exceeds the limit of {MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f} MB.'}, room=request.sid)
+                return
+
+        if file_type not in TEXT_EXTRACTORS:
+            emit('error', {'message': 'Unsupported file type. Please upload PDF, DOCX, or XLSX.'}, room=request.sid)
+            return
+
+        try:
+            resume_text = extract_document_text(resume_bytes, file_type, digest=resume_digest)
+        except WorkerTimeout:
+            emit('error', {'message': f'Reading the {file_type} file took longer than {EXTRACTION_TIMEOUT_SECONDS:.0f} seconds. Please upload a smaller or simpler document.'}, room=request.sid)
+            return
+        except WorkerTaskError as e:
+            print(f"ERROR: Text extraction failed: {e}")
+            resume_text = None
+        finally:
+            if upload_id:
+                upload.close() # Releases the spool when the cache answered without reading it
+
+        if not resume_text:
+            emit('error', {'message': f'Could not extract text from the provided {file_type} file. It might be empty or corrupted.'}, room=request.sid)
+            return
+
+        # Keep the texts server side so follow-up events can reference them by session_id
+        session_id = session_store.create(request.sid, resume_text, job_description)
+        session_resume_sections(session_id, resume_text) # Parsed once here, reused by every follow-up prompt
+        emit('session_context', {'session_id': session_id}, room=request.sid)
+
+        original_resume_text = resume_text if data.get('echo_resume_text', True) else None
+
+        # Instant local score while the LLM works; obviously mismatched pairs can stop here
+        preliminary = compute_preliminary_analysis(resume_text, job_description) if PRESCORE_ENABLED else None
+        if preliminary is not None:
+            session_store.update(session_id, preliminary_analysis=preliminary)
+            emit('preliminary_analysis', {**preliminary, 'session_id': session_id}, room=request.sid)
+            if preliminary['score'] < PRESCORE_SKIP_LLM_BELOW and not data.get('force_llm'):
+                print(f"INFO: Pre-score {preliminary['score']} is below {PRESCORE_SKIP_LLM_BELOW}, skipping the LLM analysis.")
+                analysis_payload = preliminary_analysis_result(preliminary)
+                session_store.update(session_id, analysis=analysis_payload)
+                result = {**analysis_payload, 'session_id': session_id}
+                if original_resume_text is not None:
+                    result['extracted_resume_text'] = original_resume_text # As in every other analysis_result
+                emit('analysis_result', result, room=request.sid)
+                return
+
+        stream = bool(data.get('stream', LLM_STREAMING_DEFAULT))
+        # A deferred rewrite is left out of the analysis and generated by request_full_rewrite instead
+        defer_rewrite = bool(data.get('defer_rewrite', ANALYSIS_DEFER_REWRITE_DEFAULT))
+        if data.get('fanout', ANALYSIS_FANOUT_DEFAULT):
+            # Score, summary and rewrite as concurrent sub-requests, each emitted as soon as it is ready
+            tasks = [task for task in ANALYSIS_SUBTASKS if not (defer_rewrite and task == 'analysis_rewrite')]
+            if not submit_analysis_fanout(request.sid, resume_text, job_description, session_id, original_resume_text, stream, tasks=tasks):
+                print(f"INFO: Analysis for {request.sid} was not queued; the client has been told why.")
+            return
+
+        # Queue the LLM call on the scheduler, which runs it as an eventlet background task
+        llm_scheduler.submit(async_lm_studio_call, sid=request.sid, prompt=build_analysis_prompt(resume_text, job_description, include_rewrite=not defer_rewrite), schema=ANALYSIS_SCHEMA_WITHOUT_REWRITE if defer_rewrite else ANALYSIS_SCHEMA, event_name='analysis_result', original_resume_text=original_resume_text, stream=stream, session_id=session_id, rewrite_deferred=defer_rewrite)
+
+    except Exception as e:
+        print(f"ERROR: Exception during upload_resume_and_jd: {e}")
+        traceback.print_exc()
+        emit('error', {'message': f'Server error during analysis: {e}'}, room=request.sid)
+
+
+@sio.on('apply_edits')
+def handle_apply_edits(data):
+    """
+    Receives edited resume text (now AI-generated and potentially user-tweaked),
+    revised summary, and template choice, then generates a new PDF.
+    The PDF is served from /api/artifacts/<id>; it is also sent inline as base64 unless `inline_pdf` is false.
+    With `preview`, a first-page image is emitted as resume_preview before updated_resume_pdf.
+    """
+    print(f"Received apply_edits event from {request.sid}")
+    edited_resume_text = data.get('edited_resume_text')
+    revised_summary = data.get('revised_summary')
+    selected_template = data.get('selected_template')
+
+    if not edited_resume_text:
+        emit('error', {'message': 'Edited resume text is empty.'}, room=request.sid)
+        return
+    if not selected_template:
+        emit('error', {'message': 'Please select a resume template.'}, room=request.sid)
+        return
+
+    try:
+        new_pdf_bytes, render_key = render_resume_pdf(edited_resume_text, revised_summary, selected_template)
+        # A render cache hit reuses the artifact (and its base64 form) stored for the same render
+        artifact_id = artifact_store.put(new_pdf_bytes, 'application/pdf', 'revised_resume.pdf', content_key=render_key)
+        result = {
+            'artifact_id': artifact_id,
+            'artifact_url': f'/api/artifacts/{artifact_id}',
+            'size': len(new_pdf_bytes),
         }
 
-        # Submit the LLM call to the eventlet background task directly
-        sio.start_background_task(async_lm_studio_call, sid=request.sid, prompt=roadmap_prompt, schema=roadmap_schema, event_name='career_roadmap')
+        if data.get('preview'):
+            preview = render_resume_preview(new_pdf_bytes, dpi=data.get('preview_dpi'))
+            if preview is not None:
+                image_bytes, mimetype = preview
+                emit('resume_preview', {
+                    **result,
+                    'image_b64': base64.b64encode(image_bytes).decode('utf-8'),
+                    'mimetype': mimetype,
+                }, room=request.sid)
+
+        if data.get('inline_pdf', True):
+            result['pdf_b64'] = artifact_store.base64_data(artifact_id) or base64.b64encode(new_pdf_bytes).decode('utf-8')
+
+        emit('updated_resume_pdf', result, room=request.sid)
+
+    except Exception as e:
+        print(f"ERROR: Exception during apply_edits: {e}")
+        traceback.print_exc()
+        emit('error', {'message': f'Server error during PDF generation: {e}'}, room=request.sid)
+
+@sio.on('request_full_rewrite')
+def handle_request_full_rewrite(data):
+    """
+    Generates the full resume rewrite of an analysis that ran with `defer_rewrite`,
+    from the resume and job description already kept in the session.
+    """
+    print(f"Received request_full_rewrite event from {request.sid}")
+    session_id, _, _ = resolve_session_inputs(data, request.sid)
+    context = session_store.get(session_id)
+
+    if context is None:
+        emit('error', {'message': 'An active analysis session is required for the full rewrite. Please analyze your resume again.'}, room=request.sid)
+        return
+
+    rewrite = (context.get('analysis') or {}).get('ai_revised_full_resume_text') or context.get('full_rewrite')
+    if rewrite:
+        emit('full_rewrite', {'ai_revised_full_resume_text': rewrite, 'session_id': session_id}, room=request.sid)
+        return
+
+    try:
+        # Same prompt as the fanned-out rewrite, so a rewrite generated for this resume before is served from the cache
+        prompt = build_analysis_subtask_prompt('analysis_rewrite', context['resume_text'], context['job_description'])
+        llm_scheduler.submit(full_rewrite_call, sid=request.sid, prompt=prompt, schema=ANALYSIS_SUBTASKS['analysis_rewrite'], event_name='analysis_rewrite', session_id=session_id, stream=bool(data.get('stream', LLM_STREAMING_DEFAULT)))
+
+    except Exception as e:
+        print(f"ERROR: Exception during request_full_rewrite: {e}")
+        traceback.print_exc()
+        emit('error', {'message': f'Server error during full rewrite: {e}'}, room=request.sid)
+
+@sio.on('request_interview_prep')
+def handle_request_interview_prep(data):
+    """
+    Generates interview preparation materials based on job description.
+    """
+    print(f"Received request_interview_prep event from {request.sid}")
+    _, _, job_description = resolve_session_inputs(data, request.sid)
+
+    if not job_description:
+        emit('error', {'message': 'Job Description (or an active session) is required for interview prep.'}, room=request.sid)
+        return
+
+    try:
+        # Queue the LLM call on the scheduler, which runs it as an eventlet background task
+        llm_scheduler.submit(async_lm_studio_call, sid=request.sid, prompt=build_interview_prep_prompt(job_description), schema=INTERVIEW_PREP_SCHEMA, event_name='interview_prep_materials', stream=bool(data.get('stream', LLM_STREAMING_DEFAULT)))
+
+    except Exception as e:
+        print(f"ERROR: Exception during request_interview_prep: {e}")
+        traceback.print_exc()
+        emit('error', {'message': f'Server error during interview prep: {e}'}, room=request.sid)
+
+@sio.on('start_interview_simulation')
+def handle_start_interview_simulation(data):
+    """
+    Generates a personalized behavioral interview question based on resume and job description.
+    """
+    print(f"Received start_interview_simulation event from {request.sid}")
+    session_id, resume_text, job_description = resolve_session_inputs(data, request.sid)
+
+    if not resume_text or not job_description:
+        emit('error', {'message': 'Resume text and Job Description (or an active session) are required for interview simulation.'}, room=request.sid)
+        return
+
+    try:
+        # Queue the LLM call on the scheduler, which runs it as an eventlet background task
+        llm_scheduler.submit(async_lm_studio_call, sid=request.sid, prompt=build_interview_question_prompt(session_resume_sections(session_id, resume_text), job_description), schema=INTERVIEW_QUESTION_SCHEMA, event_name='interview_question', stream=bool(data.get('stream', LLM_STREAMING_DEFAULT)))
+
+    except Exception as e:
+        print(f"ERROR: Exception during start_interview_simulation: {e}")
+        traceback.print_exc()
+        emit('error', {'message': f'Server error during simulation: {e}'}, room=request.sid)
+
+@sio.on('get_interview_feedback')
+def handle_get_interview_feedback(data):
+    """
+    Provides real-time feedback on a user's interview answer.
+    """
+    print(f"Received get_interview_feedback event from {request.sid}")
+    question = data.get('question')
+    user_answer = data.get('user_answer')
+    session_id, resume_text, job_description = resolve_session_inputs(data, request.sid)
+
+    if not question or not user_answer or not job_description or not resume_text:
+        emit('error', {'message': 'Question, user answer, job description, and resume (or an active session) are required for feedback.'}, room=request.sid)
+        return
+
+    try:
+        # Queue the LLM call on the scheduler, which runs it as an eventlet background task
+        llm_scheduler.submit(async_lm_studio_call, sid=request.sid, prompt=build_interview_feedback_prompt(job_description, session_resume_sections(session_id, resume_text), question, user_answer), schema=INTERVIEW_FEEDBACK_SCHEMA, event_name='interview_feedback', stream=bool(data.get('stream', LLM_STREAMING_DEFAULT)))
+
+    except Exception as e:
+        print(f"ERROR: Exception during get_interview_feedback: {e}")
+        traceback.print_exc()
+        emit('error', {'message': f'Server error during feedback: {e}'}, room=request.sid)
+
+@sio.on('request_career_roadmap')
+def handle_request_career_roadmap(data):
+    """
+    Generates a predictive career trajectory and skill pathing roadmap.
+    """
+    print(f"Received request_career_roadmap event from {request.sid}")
+    session_id, resume_text, job_description = resolve_session_inputs(data, request.sid)
+    desired_roles = data.get('desired_roles')
+
+    if not resume_text or not job_description or not desired_roles:
+        emit('error', {'message': 'Resume text, current job description (or an active session), and desired roles are required for career roadmap.'}, room=request.sid)
+        return
+
+    desired_roles_str = ", ".join(desired_roles)
+
+    try:
+        # Queue the LLM call on the scheduler, which runs it as an eventlet background task
+        llm_scheduler.submit(async_lm_studio_call, sid=request.sid, prompt=build_career_roadmap_prompt(session_resume_sections(session_id, resume_text), job_description, desired_roles_str), schema=CAREER_ROADMAP_SCHEMA, event_name='career_roadmap', stream=bool(data.get('stream', LLM_STREAMING_DEFAULT)))
 
     except Exception as e:
         print(f"ERROR: Exception during request_career_roadmap: {e}")
@@ -1643,6 +4593,13 @@ Desired Future Roles:
 
 # --- Main entry point ---
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        # Offline batch mode: python app.py batch --resumes DIR_OR_ZIP --jd FILE --output results.jsonl
+        try:
+            sys.exit(batch_main(sys.argv[2:]))
+        finally:
+            llm_client_pool.close()
+
     # When using Flask-SocketIO with async_mode='eventlet', you run the app via sio.run()
     # If running with a production WSGI server like Gunicorn, you would configure Gunicorn
     # to use the eventlet/gevent worker class and bind it to Flask-SocketIO's app.
@@ -1651,8 +4608,5 @@ if __name__ == '__main__':
     try:
         sio.run(app, host='0.0.0.0', port=5000, debug=True)
     finally:
-        # The ThreadPoolExecutor is no longer directly managed as eventlet.monkey_patch()
-        # handles cooperative multitasking for I/O. If there were other CPU-bound tasks
-        # not related to I/O that needed true threading, the executor would be useful.
-        # For now, it's removed as it's not needed for this particular issue.
-        pass
+        # Release pooled keep-alive connections to the LLM backend.
+        llm_client_pool.close()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Keep the caches in memory so the tests never touch the SQLite files next to app.py
+os.environ.setdefault("LLM_CACHE_DB_PATH", "")
+os.environ.setdefault("EXTRACTION_CACHE_DB_PATH", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,86 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    monkeypatch.setattr(app.sio, "emit", lambda event, payload=None, **kwargs: events.append((event, payload)))
+    return events
+
+
+def test_partials_then_merged_result(emitted):
+    fanout = app.AnalysisFanout("sid", ["analysis_score", "analysis_summary", "analysis_rewrite"])
+
+    fanout.complete("analysis_summary", {"revised_summary": "Backend engineer."})
+    fanout.complete("analysis_score", {"score": 7, "suggestions": ["Add metrics"], "revised_summary": "volunteered"})
+    assert [event for event, _ in emitted] == ["analysis_partial", "analysis_partial"]
+
+    fanout.complete("analysis_rewrite", {"ai_revised_full_resume_text": "Rewritten"})
+
+    assert emitted[1][1] == {"task": "score", "score": 7, "suggestions": ["Add metrics"]}
+    event, result = emitted[-1]
+    assert event == "analysis_result"
+    assert result == {
+        "score": 7,
+        "suggestions": ["Add metrics"],
+        "revised_summary": "Backend engineer.",
+        "ai_revised_full_resume_text": "Rewritten",
+    }
+
+
+def test_failed_subrequest_reports_one_error_and_no_result(emitted):
+    fanout = app.AnalysisFanout("sid", ["analysis_score", "analysis_summary", "analysis_rewrite"])
+
+    fanout.complete("analysis_score", {"error": "timeout"})
+    fanout.complete("analysis_summary", {"error": "timeout"})
+    fanout.complete("analysis_rewrite", {"ai_revised_full_resume_text": "Rewritten"})
+
+    events = [event for event, _ in emitted]
+    assert events.count("error") == 1
+    assert "analysis_result" not in events
+
+
+def test_deferred_rewrite_is_flagged_in_the_result(emitted):
+    fanout = app.AnalysisFanout("sid", ["analysis_score", "analysis_summary"], original_resume_text="Resume")
+
+    fanout.complete("analysis_score", {"score": 5, "suggestions": []})
+    fanout.complete("analysis_summary", {"revised_summary": "Summary"})
+
+    _, result = emitted[-1]
+    assert result["rewrite_deferred"] is True
+    assert result["ai_revised_full_resume_text"] == ""
+    assert result["extracted_resume_text"] == "Resume"
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(app, "extract_document_text", lambda file_bytes, file_type, digest=None: "Python developer resume")
+    monkeypatch.setattr(app.llm_scheduler, "submit", lambda fn, sid, event_name, **kwargs: jobs.append((event_name, kwargs)) or True)
+    monkeypatch.setattr(app.llm_scheduler, "submit_group", lambda sid, group: jobs.extend((event_name, kwargs) for _, event_name, kwargs in group) or True)
+    return jobs
+
+
+def upload(**options):
+    client = app.sio.test_client(app.app)
+    client.emit("upload_resume_and_jd", {"resume_file": "JVBERg==", "file_type": "application/pdf",
+                                         "job_description": "Python developer", **options})
+    client.disconnect()
+
+
+def test_deferred_rewrite_without_fanout_is_one_prompt(submitted):
+    upload(defer_rewrite=True, fanout=False)
+
+    [(event_name, kwargs)] = submitted
+    assert event_name == "analysis_result"
+    assert kwargs["schema"] is app.ANALYSIS_SCHEMA_WITHOUT_REWRITE
+    assert "ai_revised_full_resume_text" not in kwargs["prompt"]
+    assert kwargs["rewrite_deferred"] is True
+
+
+def test_fanout_with_deferred_rewrite_skips_the_rewrite_subrequest(submitted):
+    upload(defer_rewrite=True, fanout=True)
+
+    assert [event_name for event_name, _ in submitted] == ["analysis_score", "analysis_summary"]
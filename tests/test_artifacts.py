@@ -0,0 +1,85 @@
+import pytest
+
+import app
+
+
+def make_store():
+    return app.ArtifactStore(ttl=60, max_entries=10, max_bytes=10000)
+
+
+def test_same_content_key_reuses_the_artifact():
+    store = make_store()
+
+    first = store.put(b"%PDF one", "application/pdf", "resume.pdf", content_key="render-key")
+    second = store.put(b"%PDF one", "application/pdf", "resume.pdf", content_key="render-key")
+
+    assert first == second
+    assert store.stats()["entries"] == 1 and store.stats()["reused"] == 1
+
+
+def test_artifacts_without_content_key_are_separate():
+    store = make_store()
+
+    first = store.put(b"%PDF fallback", "application/pdf", "resume.pdf")
+    second = store.put(b"%PDF fallback", "application/pdf", "resume.pdf")
+
+    assert first != second
+
+
+def test_content_key_ids_differ_between_stores():
+    assert make_store().put(b"x", "application/pdf", "a.pdf", content_key="k") != \
+        make_store().put(b"x", "application/pdf", "a.pdf", content_key="k")
+
+
+def test_base64_data_is_encoded_once():
+    store = make_store()
+    artifact_id = store.put(b"%PDF", "application/pdf", "resume.pdf", content_key="k")
+
+    assert store.base64_data(artifact_id) == "JVBERg=="
+    assert store.get(artifact_id)["data_b64"] == "JVBERg=="
+    assert store.base64_data("missing") is None
+
+
+@pytest.fixture
+def pdf_artifact(monkeypatch):
+    store = make_store()
+    monkeypatch.setattr(app, "artifact_store", store)
+    data = bytes(range(256)) * 4
+    return store.put(data, "application/pdf", "resume.pdf"), data
+
+
+def test_artifact_download(pdf_artifact):
+    artifact_id, data = pdf_artifact
+
+    response = app.app.test_client().get(f"/api/artifacts/{artifact_id}")
+
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers["Content-Length"] == str(len(data))
+    assert "private" in response.headers["Cache-Control"]
+
+
+def test_artifact_range_request(pdf_artifact):
+    artifact_id, data = pdf_artifact
+
+    response = app.app.test_client().get(f"/api/artifacts/{artifact_id}", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.data == data[10:20]
+    assert response.headers["Content-Range"] == f"bytes 10-19/{len(data)}"
+
+
+def test_artifact_not_modified(pdf_artifact):
+    artifact_id, _ = pdf_artifact
+    client = app.app.test_client()
+    etag = client.get(f"/api/artifacts/{artifact_id}").headers["ETag"]
+
+    response = client.get(f"/api/artifacts/{artifact_id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_unknown_artifact():
+    assert app.app.test_client().get("/api/artifacts/missing").status_code == 404
+
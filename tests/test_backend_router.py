@@ -0,0 +1,106 @@
+import httpx
+import pytest
+
+import app
+
+
+A = "http://a/v1/chat/completions"
+B = "http://b/v1/chat/completions"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_router(urls=(A, B), failure_threshold=2, reset_timeout=30):
+    return app.LLMBackendRouter(list(urls), failure_threshold=failure_threshold, reset_timeout=reset_timeout,
+                                health_check_interval=0)
+
+
+def fail(router, backend):
+    router.release(backend, error=httpx.ConnectError("refused"))
+
+
+def test_requests_go_to_the_least_loaded_backend():
+    router = make_router()
+    first = router.acquire()
+    second = router.acquire()
+
+    assert {first.url, second.url} == {A, B}
+    router.release(first)
+    assert router.acquire() is first
+
+
+def test_backend_is_ejected_after_consecutive_failures(clock):
+    router = make_router(urls=(A,))
+    for _ in range(2):
+        fail(router, router.acquire())
+
+    assert router.backends[0].state == "open"
+    with pytest.raises(app.LLMBackendUnavailable):
+        router.acquire()
+
+
+def test_success_resets_the_failure_count():
+    router = make_router(urls=(A,))
+    fail(router, router.acquire())
+    router.release(router.acquire())
+    fail(router, router.acquire())
+
+    assert router.backends[0].state == "closed"
+
+
+def test_half_open_allows_one_trial_request(clock):
+    router = make_router(urls=(A,))
+    for _ in range(2):
+        fail(router, router.acquire())
+
+    clock[0] += 31
+    trial = router.acquire()
+    assert trial.state == "half_open"
+    with pytest.raises(app.LLMBackendUnavailable):
+        router.acquire()
+
+    router.release(trial)
+    assert trial.state == "closed"
+
+
+def test_failed_trial_reopens_the_circuit(clock):
+    router = make_router(urls=(A,))
+    for _ in range(2):
+        fail(router, router.acquire())
+    clock[0] += 31
+
+    fail(router, router.acquire())
+
+    assert router.backends[0].state == "open"
+    assert router.backends[0].opened_at == clock[0]
+
+
+@pytest.mark.parametrize("error, is_failure", [
+    (httpx.ConnectError("refused"), True),
+    (httpx.ReadTimeout("slow"), True),
+    (httpx.PoolTimeout("our pool"), False),
+    (httpx.HTTPStatusError("500", request=httpx.Request("POST", A), response=httpx.Response(500)), True),
+    (httpx.HTTPStatusError("400", request=httpx.Request("POST", A), response=httpx.Response(400)), False),
+    (ValueError("bad json"), False),
+])
+def test_only_backend_errors_count_as_failures(error, is_failure):
+    assert app.LLMBackendRouter.is_backend_failure(error) is is_failure
+
+
+def test_unreachable_backends_are_not_reported_as_a_timeout(monkeypatch):
+    router = make_router(failure_threshold=1)
+    monkeypatch.setattr(app, "llm_router", router)
+
+    def refuse(url, *args):
+        raise httpx.ConnectTimeout(f"{url} did not answer")
+    monkeypatch.setattr(app, "request_lm_studio_completion", refuse)
+
+    result = app.call_lm_studio_api("prompt")
+
+    assert result["error"].startswith("All 2 LLM backends are unreachable (2 ejected by their circuit breaker).")
+    assert "timed out after" not in result["error"]
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import app
+
+
+RESUME_TEXT = "Python developer with Flask and SQL experience."
+
+
+@pytest.fixture
+def resumes(tmp_path, monkeypatch):
+    resume_dir = tmp_path / "resumes"
+    resume_dir.mkdir()
+    (resume_dir / "alice.pdf").write_bytes(b"%PDF alice")
+    (resume_dir / "bob.pdf").write_bytes(b"%PDF bob")
+    monkeypatch.setattr(app, "extract_document_text", lambda file_bytes, file_type, digest=None: RESUME_TEXT)
+    return resume_dir
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    def fake_call(prompt, schema, event_name, **kwargs):
+        calls.append(event_name)
+        return {"match_score": 80}
+
+    monkeypatch.setattr(app, "cached_lm_studio_call", fake_call)
+    return calls
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as output_file:
+        return [json.loads(line) for line in output_file]
+
+
+def test_rerun_skips_completed_pairs(resumes, llm_calls, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    job_descriptions = {"backend.txt": "Python Flask SQL"}
+
+    first = app.run_batch_analysis(str(resumes), job_descriptions, output, concurrency=2)
+    second = app.run_batch_analysis(str(resumes), job_descriptions, output, concurrency=2)
+
+    assert first["analyzed"] == 2
+    assert second == {"analyzed": 0, "skipped": 2, "failed": 0, "output": output}
+    assert len(llm_calls) == 2
+
+
+def test_full_run_analyzes_prescored_pairs(resumes, llm_calls, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    job_descriptions = {"backend.txt": "Python Flask SQL"}
+
+    prescored = app.run_batch_analysis(str(resumes), job_descriptions, output, prescore_only=True)
+    rerun_prescore = app.run_batch_analysis(str(resumes), job_descriptions, output, prescore_only=True)
+    full = app.run_batch_analysis(str(resumes), job_descriptions, output)
+
+    assert prescored["analyzed"] == 2 and rerun_prescore["skipped"] == 2
+    assert full["analyzed"] == 2 and full["skipped"] == 0
+    assert len(llm_calls) == 2
+    statuses = sorted(record["status"] for record in read_records(output))
+    assert statuses == ["ok", "ok", "prescored", "prescored"]
+
+
+def test_prescore_only_run_skips_fully_analyzed_pairs(resumes, llm_calls, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    job_descriptions = {"backend.txt": "Python Flask SQL"}
+
+    app.run_batch_analysis(str(resumes), job_descriptions, output)
+    summary = app.run_batch_analysis(str(resumes), job_descriptions, output, prescore_only=True)
+
+    assert summary["skipped"] == 2 and summary["analyzed"] == 0
+
+
+def test_batch_main_rejects_duplicate_job_description_names(resumes, tmp_path):
+    for team in ("a", "b"):
+        (tmp_path / team).mkdir()
+        (tmp_path / team / "jd.txt").write_text("Python", encoding="utf-8")
+
+    with pytest.raises(SystemExit):
+        app.batch_main(["--resumes", str(resumes), "--output", str(tmp_path / "out.jsonl"),
+                        "--jd", str(tmp_path / "a" / "jd.txt"), "--jd", str(tmp_path / "b" / "jd.txt")])
@@ -0,0 +1,97 @@
+import app
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = app.BoundedLRUCache(max_entries=2, max_bytes=1000)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.evictions == 1
+
+
+def test_lru_is_bounded_by_total_bytes():
+    cache = app.BoundedLRUCache(max_entries=10, max_bytes=10)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+
+    assert cache.get("a") is None
+    assert cache.total_bytes == 6
+
+
+def test_lru_rejects_entry_larger_than_the_cache():
+    cache = app.BoundedLRUCache(max_entries=10, max_bytes=10)
+    cache.set("a", "x" * 5)
+
+    assert cache.set("big", "y" * 11) is False
+    assert cache.get("a") == "x" * 5
+
+
+def test_lru_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    cache = app.BoundedLRUCache(max_entries=10, max_bytes=1000)
+    cache.set("a", "1", ttl=60)
+    cache.set("b", "2")
+
+    now[0] += 61
+    assert cache.get("a") is None
+    assert cache.get("b") == "2"
+    assert cache.expirations == 1 and cache.total_bytes == 1
+
+
+def test_tiered_cache_returns_copies():
+    cache = app.TieredCache("test", memory_max_entries=10, memory_max_bytes=10000)
+    value = {"questions": ["Why us?"]}
+    cache.set("k", value, ttl=60)
+    value["questions"].append("changed by the caller")
+
+    first = cache.get("k")
+    first["questions"].append("changed by a reader")
+
+    assert cache.get("k") == {"questions": ["Why us?"]}
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    writer = app.TieredCache("test", 10, 10000, db_path=db_path, disk_max_bytes=10000)
+    writer.set("k", {"score": 80}, ttl=60)
+    writer.close()
+
+    reader = app.TieredCache("test", 10, 10000, db_path=db_path, disk_max_bytes=10000)
+    assert reader.get("k") == {"score": 80}
+    assert reader.memory.get("k") == {"score": 80}
+    reader.close()
+
+
+def test_sampled_interview_events_are_not_cached():
+    assert app.LLM_CACHE_TTL_SECONDS["interview_question"] == 0
+    assert app.LLM_CACHE_TTL_SECONDS["interview_feedback"] == 0
+
+
+def test_session_reads_refresh_expiry_without_measuring_the_context(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    store = app.SessionContextStore(ttl=60, max_entries=10, max_bytes=100000)
+    session_id = store.create("sid", "Resume", "Job", bind=False)
+    store.update(session_id, analysis={"score": 7})
+    dumps = []
+    monkeypatch.setattr(app.json, "dumps", lambda value, **kwargs: dumps.append(value) or "")
+
+    now[0] += 50
+    assert store.get(session_id)["analysis"] == {"score": 7}
+    now[0] += 50
+    assert store.get(session_id) is not None
+    assert dumps == []
+
+
+def test_session_size_follows_updates():
+    store = app.SessionContextStore(ttl=60, max_entries=10, max_bytes=100000)
+    session_id = store.create("sid", "Resume", "Job", bind=False)
+    store.update(session_id, analysis={"score": 7}, full_rewrite="Rewritten")
+    store.update(session_id, analysis=None)
+
+    assert store.stats()["bytes"] == len("Resume") + len("Job") + len("Rewritten")
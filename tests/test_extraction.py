@@ -0,0 +1,53 @@
+import io
+
+import openpyxl
+
+import app
+
+
+def xlsx_bytes(rows):
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_xlsx_rows_become_lines():
+    text = app.extract_text_from_xlsx(xlsx_bytes([["Skills", "Python"], [None, None], ["Years", 5]]))
+
+    assert text == "--- Sheet: Sheet ---\nSkills Python\nYears 5\n\n"
+
+
+def test_xlsx_formula_cells_keep_their_formula():
+    # Files written by other tools carry no cached formula results, so values-only mode would drop them
+    text = app.extract_text_from_xlsx(xlsx_bytes([["Total", "=SUM(1,2)"]]))
+
+    assert "Total =SUM(1,2)" in text
+
+
+def test_xlsx_row_limit():
+    text = app.extract_text_from_xlsx(xlsx_bytes([[f"row {index}"] for index in range(10)]))
+    limited = "".join(app.iter_xlsx_text(xlsx_bytes([[f"row {index}"] for index in range(10)]), max_rows=3))
+
+    assert "row 9" in text
+    assert "row 2" in limited and "row 3" not in limited
+
+
+def test_cached_document_is_not_loaded(monkeypatch):
+    monkeypatch.setattr(app, "extraction_cache", app.TieredCache("test", 10, 100000))
+    monkeypatch.setattr(app, "extract_text_off_loop", lambda file_bytes, file_type: file_bytes.decode())
+    loads = []
+
+    def load():
+        loads.append(1)
+        return b"Resume text"
+
+    digest = app.hashlib.sha256(b"Resume text").hexdigest()
+    first = app.extract_document_text(load, "application/pdf", digest=digest)
+    second = app.extract_document_text(load, "application/pdf", digest=digest)
+    from_bytes = app.extract_document_text(b"Resume text", "application/pdf")
+
+    assert first == second == from_bytes == "Resume text"
+    assert len(loads) == 1
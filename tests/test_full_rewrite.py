@@ -0,0 +1,57 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    record = lambda event, payload=None, **kwargs: events.append((event, payload))
+    monkeypatch.setattr(app, "emit", record)
+    monkeypatch.setattr(app.sio, "emit", record)
+    return events
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(app.llm_scheduler, "submit", lambda fn, sid, event_name, **kwargs: jobs.append((fn, event_name, kwargs)) or True)
+    return jobs
+
+
+def request_full_rewrite(data):
+    client = app.sio.test_client(app.app)
+    client.emit("request_full_rewrite", data)
+    client.disconnect()
+
+
+def test_rewrite_needs_a_session(emitted, submitted):
+    request_full_rewrite({"session_id": "missing"})
+
+    assert [event for event, _ in emitted if event != "status"] == ["error"]
+    assert submitted == []
+
+
+def test_rewrite_is_generated_and_kept_in_the_session(emitted, submitted, monkeypatch):
+    session_id = app.session_store.create("sid", "Resume text", "Job description", bind=False)
+    app.session_store.update(session_id, analysis={"score": 7, "ai_revised_full_resume_text": ""})
+
+    request_full_rewrite({"session_id": session_id})
+    fn, event_name, kwargs = submitted[0]
+    assert event_name == "analysis_rewrite"
+
+    monkeypatch.setattr(app, "cached_lm_studio_call", lambda *args, **kwargs: {"ai_revised_full_resume_text": "Rewritten"})
+    fn(sid="sid", event_name=event_name, **kwargs)
+
+    assert emitted[-1] == ("full_rewrite", {"ai_revised_full_resume_text": "Rewritten", "session_id": session_id})
+    assert app.session_store.get(session_id)["full_rewrite"] == "Rewritten"
+
+
+def test_existing_rewrite_is_sent_without_calling_the_model(emitted, submitted):
+    session_id = app.session_store.create("sid", "Resume text", "Job description", bind=False)
+    app.session_store.update(session_id, full_rewrite="Rewritten before")
+
+    request_full_rewrite({"session_id": session_id})
+
+    assert emitted[-1] == ("full_rewrite", {"ai_revised_full_resume_text": "Rewritten before", "session_id": session_id})
+    assert submitted == []
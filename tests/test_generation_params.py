@@ -0,0 +1,31 @@
+import app
+
+
+def test_short_answers_get_a_fixed_cap():
+    short = app.generation_params("interview_question", "x" * 100)
+    long = app.generation_params("interview_question", "x" * 40000)
+
+    assert short == long == {"temperature": 0.8, "top_p": 0.9, "max_tokens": 384}
+
+
+def test_rewrite_cap_grows_with_the_prompt_up_to_the_profile_limit():
+    small = app.generation_params("analysis_rewrite", "x" * 4000)["max_tokens"]
+    large = app.generation_params("analysis_rewrite", "x" * 8000)["max_tokens"]
+    huge = app.generation_params("analysis_rewrite", "x" * 400000)["max_tokens"]
+
+    assert small == 256 + 1000
+    assert large == 256 + 2000
+    assert huge == app.LLM_GENERATION_PROFILES["analysis_rewrite"]["max_tokens"]
+
+
+def test_events_without_a_profile_use_the_defaults():
+    assert app.generation_params("unknown_event", "prompt") == app.LM_STUDIO_SAMPLING_PARAMS
+    assert app.generation_params("unknown_event", "prompt") is not app.LM_STUDIO_SAMPLING_PARAMS
+
+
+def test_output_scale_applies_to_caps_and_budgets(monkeypatch):
+    monkeypatch.setattr(app, "LLM_OUTPUT_TOKEN_SCALE", 1.5)
+
+    assert app.generation_params("interview_question", "prompt")["max_tokens"] == 576
+    assert app.generation_budget("interview_question") == 576
+    assert app.generation_budget("unknown_event") == int(app.LM_STUDIO_SAMPLING_PARAMS["max_tokens"] * 1.5)
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import app
+
+
+def parse(*chunks, **kwargs):
+    parser = app.IncrementalJSONParser(**kwargs)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser
+
+
+def test_plain_object():
+    assert parse('{"score": 7, "suggestions": ["a", "b"]}').close() == {"score": 7, "suggestions": ["a", "b"]}
+
+
+def test_code_fences_and_trailing_text_are_ignored():
+    text = 'Here you go:\n```json\n{"score": 7}\n```\nHope this helps {not json'
+
+    assert parse(text).close() == {"score": 7}
+
+
+def test_several_objects_are_merged():
+    assert parse('{"score": 7}\n{"revised_summary": "Engineer."}').close() == {"score": 7, "revised_summary": "Engineer."}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7])
+def test_result_does_not_depend_on_chunking(chunk_size):
+    document = json.dumps({"text": 'He said "hi" \\ {not a brace}', "nested": {"list": [1, {"x": "]"}]}, "n": 3})
+    chunks = [document[i:i + chunk_size] for i in range(0, len(document), chunk_size)]
+
+    assert parse(*chunks).close() == json.loads(document)
+
+
+def test_fields_are_reported_as_soon_as_they_complete():
+    fields = []
+    parser = app.IncrementalJSONParser(on_field=lambda key, value: fields.append((key, value)))
+
+    parser.feed('{"score": 7, "suggestions": ["a"')
+    assert fields == [("score", 7)]
+    parser.feed('], "revised_summary": "x"}')
+
+    assert fields == [("score", 7), ("suggestions", ["a"]), ("revised_summary", "x")]
+
+
+def test_raw_newlines_inside_strings_are_accepted():
+    assert parse('{"ai_revised_full_resume_text": "line one\nline two"}').close() == {
+        "ai_revised_full_resume_text": "line one\nline two",
+    }
+
+
+def test_truncated_object_keeps_completed_fields():
+    parser = parse('{"score": 7, "suggestions": ["a"], "revised_summary": "cut of')
+
+    assert parser.close() == {"score": 7, "suggestions": ["a"]}
+    assert parser.truncated
+
+
+def test_malformed_object_keeps_parsed_fields():
+    parser = parse('{"score": 7, "suggestions": [oops], "revised_summary": "x"}')
+
+    assert parser.close() == {"score": 7, "revised_summary": "x"}
+    assert parser.errors == 1
+
+
+def test_complete_needs_a_closed_object_with_every_required_field():
+    parser = app.IncrementalJSONParser(required=("score", "suggestions"))
+
+    parser.feed('{"score": 7, "suggestions": []')
+    assert not parser.complete
+    parser.feed('}')
+    assert parser.complete
@@ -0,0 +1,50 @@
+import base64
+
+import pytest
+
+import app
+
+
+JOB_DESCRIPTION = """We are seeking a passionate engineer. You will be responsible for building Kubernetes
+operators in Go and need to ensure reliability. A great opportunity to join our team."""
+
+
+def test_job_ad_filler_is_not_a_keyword():
+    preliminary = app.compute_preliminary_analysis("Accountant with Excel and SAP experience.", JOB_DESCRIPTION)
+
+    missing = " ".join(preliminary["missing_keywords"])
+    for filler in ("passionate", "responsible", "need", "ensure", "opportunity"):
+        assert filler not in missing.split()
+    assert "kubernetes" in missing
+
+
+def test_matching_resume_scores_higher():
+    matching = app.compute_preliminary_analysis("Go engineer building Kubernetes operators for reliability.", JOB_DESCRIPTION)
+    unrelated = app.compute_preliminary_analysis("Accountant with Excel and SAP experience.", JOB_DESCRIPTION)
+
+    assert matching["score"] > unrelated["score"]
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    monkeypatch.setattr(app, "emit", lambda event, payload=None, **kwargs: events.append((event, payload)))
+    monkeypatch.setattr(app, "extract_document_text", lambda file_bytes, file_type, digest=None: "Accountant with Excel and SAP.")
+    monkeypatch.setattr(app, "PRESCORE_SKIP_LLM_BELOW", 11)
+    return events
+
+
+@pytest.mark.parametrize("echo, expected", [(True, "Accountant with Excel and SAP."), (False, None)])
+def test_skipped_analysis_echoes_the_resume_text(emitted, echo, expected):
+    client = app.sio.test_client(app.app)
+    client.emit("upload_resume_and_jd", {
+        "resume_file": base64.b64encode(b"%PDF").decode(),
+        "file_type": "application/pdf",
+        "job_description": JOB_DESCRIPTION,
+        "echo_resume_text": echo,
+    })
+    client.disconnect()
+
+    result = [payload for event, payload in emitted if event == "analysis_result"][0]
+    assert result["preliminary_only"] is True
+    assert result.get("extracted_resume_text") == expected
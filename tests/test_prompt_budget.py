@@ -0,0 +1,87 @@
+import app
+
+
+def test_compact_collapses_whitespace_blank_runs_and_sheet_separators():
+    text = "--- Sheet: Resume ---\nJane    Roe\n\n\n\nPython   developer\n\n--- Sheet: Other ---\nfoo\n"
+    assert app.compact_prompt_text(text) == "Jane Roe\n\nPython developer\n\nfoo"
+
+
+def test_compact_keeps_body_lines_that_differ_only_in_numbers():
+    text = (
+        "EXPERIENCE\n"
+        "Software Engineer, Acme Corp 2019 - 2021\n"
+        "- Increased revenue by 20% across 3 regions\n"
+        "Software Engineer, Acme Corp 2021 - 2023\n"
+        "- Increased revenue by 35% across 4 regions\n"
+    )
+    assert app.compact_prompt_text(text) == text.strip()
+
+
+def test_compact_keeps_repeated_body_lines_of_a_single_page():
+    text = "\n".join(["- Built dashboards for team 1", "- Built dashboards for team 2", "- Built dashboards for team 3"])
+    assert app.compact_prompt_text(text) == text
+
+
+def test_compact_drops_running_headers_and_footers_after_the_first_page():
+    pages = [
+        "Jane Roe - Resume Page 1\nEXPERIENCE\n- Increased revenue by 20% across 3 regions\nConfidential - jane@example.com\n",
+        "Jane Roe - Resume Page 2\n- Increased revenue by 35% across 4 regions\nEDUCATION\nConfidential - jane@example.com\n",
+    ]
+    compacted = app.compact_prompt_text(app.PDF_PAGE_BREAK.join(pages)).splitlines()
+    assert compacted == [
+        "Jane Roe - Resume Page 1",
+        "EXPERIENCE",
+        "- Increased revenue by 20% across 3 regions",
+        "Confidential - jane@example.com",
+        "- Increased revenue by 35% across 4 regions",
+        "EDUCATION",
+    ]
+
+
+def test_compact_does_not_match_a_footer_with_the_next_page_header():
+    pages = [
+        "HEADER\nbody one\n- Increased revenue by 20% across 3 regions\n",
+        "- Increased revenue by 35% across 4 regions\nbody two\nFOOTER\n",
+    ]
+    compacted = app.compact_prompt_text(app.PDF_PAGE_BREAK.join(pages))
+    assert "- Increased revenue by 20% across 3 regions" in compacted
+    assert "- Increased revenue by 35% across 4 regions" in compacted
+
+
+def render(resume_text, job_description):
+    return f"Resume:\n{resume_text}\nJob:\n{job_description}\n"
+
+
+def test_fit_prompt_leaves_small_prompts_untouched(monkeypatch):
+    monkeypatch.setattr(app, 'LLM_CONTEXT_WINDOW_TOKENS', 8192)
+    prompt = app.fit_prompt_to_budget(render, {'resume_text': ("Jane  Roe", 2), 'job_description': ("Python", 1)}, output_tokens=1024)
+    assert prompt == "Resume:\nJane Roe\nJob:\nPython\n"
+
+
+def test_fit_prompt_trims_the_lowest_priority_section_first(monkeypatch):
+    monkeypatch.setattr(app, 'LLM_CONTEXT_WINDOW_TOKENS', 2000)
+    monkeypatch.setattr(app, 'LLM_CONTEXT_SAFETY_MARGIN_TOKENS', 0)
+    monkeypatch.setattr(app, 'LLM_PROMPT_MIN_SECTION_TOKENS', 50)
+    resume = "\n".join(f"resume line {i} with some words" for i in range(100))
+    job = "\n".join(f"job line {i} with some words" for i in range(200))
+    prompt = app.fit_prompt_to_budget(render, {'resume_text': (resume, 2), 'job_description': (job, 1)}, output_tokens=1000)
+
+    assert app.estimate_tokens(prompt) <= 1000
+    assert resume in prompt # The higher priority section is intact
+    assert prompt.rstrip().endswith(app.PROMPT_TRUNCATION_NOTE)
+
+
+def test_fit_prompt_never_trims_below_the_section_minimum(monkeypatch):
+    monkeypatch.setattr(app, 'LLM_CONTEXT_WINDOW_TOKENS', 300)
+    monkeypatch.setattr(app, 'LLM_CONTEXT_SAFETY_MARGIN_TOKENS', 0)
+    monkeypatch.setattr(app, 'LLM_PROMPT_MIN_SECTION_TOKENS', 100)
+    resume = "\n".join(f"resume line {i}" for i in range(200))
+    job = "\n".join(f"job line {i}" for i in range(200))
+    before = app.prompt_budget_stats['over_budget_prompts']
+    prompt = app.fit_prompt_to_budget(render, {'resume_text': (resume, 2), 'job_description': (job, 1)}, output_tokens=200)
+
+    resume_part = prompt.split("Job:\n")[0].removeprefix("Resume:\n")
+    job_part = prompt.split("Job:\n")[1]
+    assert 90 <= app.estimate_tokens(resume_part) <= 101
+    assert 90 <= app.estimate_tokens(job_part) <= 101
+    assert app.prompt_budget_stats['over_budget_prompts'] == before + 1
@@ -0,0 +1,66 @@
+import pytest
+
+import app
+
+
+CANDIDATES = [
+    {"id": "go", "resume_text": "Go engineer building Kubernetes operators."},
+    {"id": "py", "resume_text": "Python developer with Flask and Docker."},
+    {"id": "acc", "resume_text": "Accountant with Excel and SAP experience."},
+]
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.fixture
+def groups(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(app.sio.server.manager, "is_connected", lambda sid, namespace: True)
+    monkeypatch.setattr(app.llm_scheduler, "submit_group", lambda sid, jobs: submitted.append(jobs) or True)
+    return submitted
+
+
+def test_ranking(client):
+    response = client.post("/api/rank", json={"job_description": "Python developer, Flask, Docker", "candidates": CANDIDATES, "top_k": 2})
+
+    assert response.status_code == 200
+    assert [entry["id"] for entry in response.json["ranking"]] == ["py", "go"]
+    assert response.json["deep_analysis_queued"] == []
+
+
+def test_missing_content_length_is_rejected(client):
+    response = client.post("/api/rank", data=b"{}", headers={"Transfer-Encoding": "chunked", "Content-Type": "application/json"})
+
+    assert response.status_code == 411
+
+
+@pytest.mark.parametrize("body", [
+    {"job_description": ["Python"], "candidates": CANDIDATES},
+    {"job_description": "Python", "candidates": [{"id": "x", "resume_text": 42}]},
+    ["not", "an", "object"],
+])
+def test_non_string_texts_are_rejected(client, body):
+    assert client.post("/api/rank", json=body).status_code == 400
+
+
+def test_deep_analyses_are_queued_as_one_group(client, groups):
+    response = client.post("/api/rank", json={"job_description": "Python developer, Flask, Docker", "candidates": CANDIDATES,
+                                              "deep_analysis_top": 3, "sid": "recruiter"})
+
+    assert len(groups) == 1 and len(groups[0]) == 3
+    assert response.json["deep_analysis_queued"] == ["py", "go", "acc"]
+    assert all(app.session_store.get(entry["session_id"]) for entry in response.json["ranking"])
+
+
+def test_rejected_deep_analyses_are_reported(client, groups, monkeypatch):
+    monkeypatch.setattr(app.llm_scheduler, "submit_group", lambda sid, jobs: False)
+
+    response = client.post("/api/rank", json={"job_description": "Python developer, Flask, Docker", "candidates": CANDIDATES,
+                                              "deep_analysis_top": 2, "sid": "recruiter"})
+
+    assert response.json["deep_analysis_queued"] == []
+    assert response.json["deep_analysis_skipped"] == ["py", "go"]
+    assert all("session_id" not in entry for entry in response.json["ranking"])
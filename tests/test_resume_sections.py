@@ -0,0 +1,74 @@
+import pytest
+
+import app
+
+
+RESUME = """Jane Doe
+jane@example.com
+
+SUMMARY
+Backend engineer.
+
+Relevant Work Experience
+Senior Engineer, Acme 2020-2024
+- Built the billing API
+- Led three engineers
+Engineer, Initech 2017-2020
+- Maintained the reporting jobs
+
+Technical Skills
+Python, SQL
+"""
+
+
+@pytest.mark.parametrize("heading, section", [
+    ("EXPERIENCE", "experience"),
+    ("Experience:", "experience"),
+    ("Relevant Work Experience", "experience"),
+    ("Internships", "experience"),
+    ("Professional Background", "experience"),
+    ("Work Experience & Internships", "experience"),
+    ("Education and Certifications", "education"),
+    ("Technical Skills", "skills"),
+])
+def test_headings(heading, section):
+    assert app.resume_section_for_heading(heading) == section
+
+
+@pytest.mark.parametrize("line", [
+    "Experience with Python and Go",
+    "Senior Engineer, Acme 2020-2024",
+    "Skills: Python, SQL",
+    "Built the billing and reporting APIs for the whole company",
+])
+def test_ordinary_lines_are_not_headings(line):
+    assert app.resume_section_for_heading(line) is None
+
+
+def test_parse_resume_sections():
+    sections = app.parse_resume_sections(RESUME)
+
+    assert sections["contact"] == "Jane Doe\njane@example.com"
+    assert sections["summary"] == "Backend engineer."
+    assert sections["skills"] == "Python, SQL"
+    assert sections["experience"] == [
+        "Senior Engineer, Acme 2020-2024\n- Built the billing API\n- Led three engineers",
+        "Engineer, Initech 2017-2020\n- Maintained the reporting jobs",
+    ]
+
+
+def test_format_renders_only_the_requested_sections():
+    sections = app.parse_resume_sections(RESUME)
+
+    text = app.format_resume_sections(sections, ("experience",))
+
+    assert text.startswith("EXPERIENCE\nSenior Engineer, Acme")
+    assert "Python, SQL" not in text and "jane@example.com" not in text
+
+
+def test_format_falls_back_to_everything_when_experience_is_missing():
+    sections = app.parse_resume_sections("Jane Doe\n\nSKILLS\nPython\n\nMy Journey\nEngineer at Acme\n")
+
+    text = app.format_resume_sections(sections, ("experience", "skills"))
+
+    assert "Jane Doe" in text and "Engineer at Acme" in text
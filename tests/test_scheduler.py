@@ -0,0 +1,120 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    monkeypatch.setattr(app.sio, "emit", lambda event, payload=None, **kwargs: events.append((event, payload)))
+    return events
+
+
+@pytest.fixture
+def started(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(app.sio, "start_background_task", lambda fn, job: jobs.append(job))
+    return jobs
+
+
+def make_scheduler(max_concurrent=0, max_queued_per_client=5, max_queue_length=500):
+    return app.LLMJobScheduler(
+        max_concurrent=max_concurrent,
+        priorities={"analysis_score": 0, "analysis_summary": 1, "career_roadmap": 2},
+        event_limits={},
+        max_queued_per_client=max_queued_per_client,
+        max_queue_length=max_queue_length,
+    )
+
+
+def noop(**kwargs):
+    pass
+
+
+def test_group_holds_one_client_slot(emitted, started):
+    scheduler = make_scheduler(max_queued_per_client=2)
+    group = [(noop, "analysis_score", {}), (noop, "analysis_summary", {})]
+
+    assert scheduler.submit_group("sid", group)
+    assert scheduler.submit(noop, "sid", "career_roadmap")
+    assert scheduler.submit(noop, "sid", "career_roadmap") is False
+    assert scheduler.stats()["queued"] == 3
+
+
+def test_group_is_rejected_as_a_whole_when_the_queue_is_short(emitted, started):
+    scheduler = make_scheduler(max_queue_length=2)
+    group = [(noop, "analysis_score", {}), (noop, "analysis_summary", {}), (noop, "career_roadmap", {})]
+
+    assert scheduler.submit_group("sid", group) is False
+    assert scheduler.stats()["queued"] == 0
+    assert [event for event, _ in emitted] == ["error"]
+
+
+def test_group_slot_is_released_when_its_first_job_starts(emitted, started):
+    scheduler = make_scheduler(max_queued_per_client=1)
+    group = [(noop, "analysis_score", {}), (noop, "analysis_summary", {})]
+    assert scheduler.submit_group("sid", group)
+    assert scheduler.submit_group("sid", group) is False
+
+    scheduler.max_concurrent = 1
+    scheduler._dispatch()
+
+    assert [job.event_name for job in started] == ["analysis_score"]
+    assert scheduler.submit_group("sid", group)
+
+
+def test_higher_priority_events_start_first(emitted, started):
+    scheduler = make_scheduler()
+    scheduler.submit(noop, "a", "career_roadmap")
+    scheduler.submit(noop, "b", "analysis_score")
+
+    scheduler.max_concurrent = 2
+    scheduler._dispatch()
+
+    assert [job.event_name for job in started] == ["analysis_score", "career_roadmap"]
+
+
+def test_clients_take_turns_within_a_priority(emitted, started):
+    scheduler = make_scheduler()
+    for _ in range(3):
+        scheduler.submit(noop, "busy", "career_roadmap")
+    scheduler.submit(noop, "other", "career_roadmap")
+
+    scheduler.max_concurrent = 4
+    scheduler._dispatch()
+
+    assert [job.sid for job in started] == ["busy", "other", "busy", "busy"]
+
+
+def test_event_limit_leaves_room_for_other_events(emitted, started):
+    scheduler = make_scheduler()
+    scheduler.event_limits = {"career_roadmap": 1}
+    scheduler.submit(noop, "a", "career_roadmap")
+    scheduler.submit(noop, "b", "career_roadmap")
+    scheduler.submit(noop, "c", "analysis_summary")
+
+    scheduler.max_concurrent = 3
+    scheduler._dispatch()
+
+    assert sorted(job.sid for job in started) == ["a", "c"]
+    assert scheduler.stats()["queued"] == 1
+
+
+def test_waiting_clients_are_told_their_position(emitted, started):
+    scheduler = make_scheduler()
+    scheduler.submit(noop, "a", "career_roadmap")
+    scheduler.submit(noop, "b", "career_roadmap")
+
+    positions = [payload["position"] for event, payload in emitted if event == "queue_position"]
+    assert positions == [1, 2]
+
+
+def test_cancel_client_drops_its_queued_jobs(emitted, started):
+    scheduler = make_scheduler()
+    scheduler.submit(noop, "a", "career_roadmap")
+    scheduler.submit(noop, "b", "career_roadmap")
+
+    scheduler.cancel_client("a")
+
+    assert scheduler.stats()["queued"] == 1 and scheduler.stats()["cancelled"] == 1
+    assert scheduler.submit(noop, "a", "career_roadmap")
@@ -0,0 +1,98 @@
+import threading
+
+import eventlet
+
+import app
+
+
+def test_concurrent_calls_share_one_generation():
+    single_flight = app.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def generate(flight):
+        calls.append(1)
+        release.wait()
+        return {"score": 7}
+
+    first = eventlet.spawn(single_flight.do, "key", generate)
+    second = eventlet.spawn(single_flight.do, "key", generate)
+    eventlet.sleep(0)
+    release.set()
+
+    assert first.wait() == second.wait() == {"score": 7}
+    assert len(calls) == 1
+    assert single_flight.stats()["coalesced"] == 1
+
+
+def test_late_joiner_receives_the_output_streamed_so_far():
+    single_flight = app.SingleFlight()
+    streamed_some = threading.Event()
+    release = threading.Event()
+    leader_deltas, joiner_deltas, joiner_fields = [], [], []
+
+    def generate(flight):
+        flight.publish_delta('{"score": ')
+        flight.publish_delta("7")
+        flight.publish_field("score", 7)
+        streamed_some.set()
+        release.wait()
+        flight.publish_delta("}")
+        return {"score": 7}
+
+    leader = eventlet.spawn(single_flight.do, "key", generate, on_delta=leader_deltas.append)
+    streamed_some.wait()
+    joiner = eventlet.spawn(single_flight.do, "key", generate, on_delta=joiner_deltas.append,
+                            on_field=lambda key, value: joiner_fields.append((key, value)))
+    eventlet.sleep(0)
+    release.set()
+
+    assert leader.wait() == joiner.wait() == {"score": 7}
+    assert "".join(joiner_deltas) == "".join(leader_deltas) == '{"score": 7}'
+    assert joiner_fields == [("score", 7)]
+
+
+def test_joiner_gets_its_own_copy_of_the_result():
+    single_flight = app.SingleFlight()
+    release = threading.Event()
+
+    def generate(flight):
+        release.wait()
+        return {"suggestions": ["a"]}
+
+    leader = eventlet.spawn(single_flight.do, "key", generate)
+    joiner = eventlet.spawn(single_flight.do, "key", generate)
+    eventlet.sleep(0)
+    release.set()
+    leader_result, joiner_result = leader.wait(), joiner.wait()
+    leader_result["suggestions"].append("changed")
+
+    assert joiner_result == {"suggestions": ["a"]}
+
+
+def test_streaming_caller_does_not_join_a_non_streaming_generation(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def call_lm_studio_api(prompt, schema, on_delta=None, on_field=None, **kwargs):
+        calls.append(on_delta is not None)
+        release.wait()
+        if on_delta is not None:
+            on_delta('{"score": 7}')
+            on_field("score", 7)
+        return {"score": 7}
+    monkeypatch.setattr(app, "call_lm_studio_api", call_lm_studio_api)
+    monkeypatch.setattr(app, "llm_response_cache", None)
+    monkeypatch.setattr(app, "llm_single_flight", app.SingleFlight())
+    deltas, fields = [], []
+
+    plain = eventlet.spawn(app.cached_lm_studio_call, "prompt", {}, "analysis_score")
+    eventlet.sleep(0)
+    streaming = eventlet.spawn(app.cached_lm_studio_call, "prompt", {}, "analysis_score", on_delta=deltas.append,
+                               on_field=lambda key, value: fields.append((key, value)))
+    eventlet.sleep(0)
+    release.set()
+
+    assert plain.wait() == streaming.wait() == {"score": 7}
+    assert sorted(calls) == [False, True]
+    assert deltas == ['{"score": 7}'] and fields == [("score", 7)]
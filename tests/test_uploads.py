@@ -0,0 +1,69 @@
+import hashlib
+import io
+
+import pytest
+
+import app
+
+
+def test_upload_without_content_length_is_rejected():
+    response = app.app.test_client().post("/api/uploads", data=b"x" * 10, content_type="multipart/form-data; boundary=x",
+                                          headers={"Transfer-Encoding": "chunked"})
+
+    assert response.status_code == 411
+
+
+def test_oversized_upload_is_rejected_before_parsing(monkeypatch):
+    monkeypatch.setattr(app, "MAX_FILE_SIZE_BYTES", 10)
+    monkeypatch.setattr(app, "UPLOAD_MULTIPART_OVERHEAD_BYTES", 10)
+
+    response = app.app.test_client().post("/api/uploads", data={"sid": "x", "file": (io.BytesIO(b"x" * 100), "a.pdf")})
+
+    assert response.status_code == 413
+
+
+@pytest.fixture
+def connected(monkeypatch):
+    monkeypatch.setattr(app.sio.server.manager, "is_connected", lambda sid, namespace: True)
+
+
+def multipart(*parts, boundary="b0undary"):
+    body = b""
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        content_type = "Content-Type: application/pdf\r\n" if filename else ""
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n{content_type}\r\n".encode() + value + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def test_file_is_streamed_into_a_chunked_upload(connected, monkeypatch):
+    monkeypatch.setattr(app, "UPLOAD_CHUNK_SIZE_BYTES", 7)
+    content = b"%PDF-1.4 " + bytes(range(256)) * 3
+    body, content_type = multipart(("sid", b"client", None), ("file", content, "resume.pdf"))
+
+    response = app.app.test_client().post("/api/uploads", data=body, content_type=content_type)
+
+    assert response.status_code == 201
+    assert response.json["size"] == len(content)
+    assert response.json["sha256"] == hashlib.sha256(content).hexdigest()
+    upload = app.chunked_uploads.take(response.json["upload_id"], "client")
+    assert upload.file_type == "application/pdf"
+    assert upload.read() == content
+
+
+def test_sid_must_come_before_the_file(connected):
+    body, content_type = multipart(("file", b"%PDF", "resume.pdf"), ("sid", b"client", None))
+
+    response = app.app.test_client().post("/api/uploads", data=body, content_type=content_type)
+
+    assert response.status_code == 400
+    assert app.chunked_uploads.stats()["pending"] == 0
+
+
+def test_truncated_upload_is_discarded(connected):
+    body, content_type = multipart(("sid", b"client", None), ("file", b"%PDF" * 100, "resume.pdf"))
+
+    response = app.app.test_client().post("/api/uploads", data=body[:-60], content_type=content_type)
+
+    assert response.status_code == 400
+    assert app.chunked_uploads.stats()["pending"] == 0
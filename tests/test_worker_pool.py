@@ -0,0 +1,56 @@
+import eventlet
+import pytest
+
+import app
+
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Evaluated inside a worker: the server modules it must not have imported
+SERVER_MODULES_LOADED = "sorted(name for name in ('app', 'eventlet', 'flask', 'flask_socketio') if name in __import__('sys').modules)"
+
+
+@pytest.fixture
+def pool():
+    pool = app.ProcessWorkerPool("test", max_workers=1, task_timeout=30)
+    yield pool
+    pool.shutdown()
+
+
+def test_workers_do_not_import_the_server(pool):
+    assert pool.run(eval, SERVER_MODULES_LOADED) == []
+
+
+def test_tasks_run_in_the_worker(pool):
+    assert pool.run(app.rank_resumes, "python developer", [("a", "python developer")])["ranking"][0]["id"] == "a"
+    assert pool.stats()["completed"] == 1
+
+
+def test_workers_are_reused_between_tasks(pool):
+    for _ in range(3):
+        pool.run(eval, "1")
+        eventlet.sleep(0.2)
+
+    assert pool.stats()["workers_started"] == 1
+    assert pool._idle[0].process.is_alive()
+
+
+def test_task_errors_are_raised_in_the_caller(pool):
+    with pytest.raises(app.WorkerTaskError, match="KeyError"):
+        pool.run(app.extract_text_from_document, b"", "text/plain")
+    assert pool.stats()["failed"] == 1
+
+
+def test_unreadable_document_returns_none(pool):
+    assert pool.run(app.extract_text_from_document, b"not a spreadsheet", XLSX) is None
+
+
+def test_shutdown_lets_idle_workers_exit(pool):
+    pool.run(eval, "1")
+    worker = pool._idle[0]
+
+    pool.shutdown()
+
+    assert worker.process.exitcode == 0
+    with pytest.raises(app.WorkerTaskError):
+        pool.run(eval, "1")
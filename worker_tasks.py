@@ -0,0 +1,535 @@
+"""
+Tasks run by the server's worker process pools: document text extraction, resume PDF rendering and
+previews, and local pre-scoring and ranking, plus the loop that runs them inside each worker.
+
+Spawned workers import this module instead of app.py, so it must stay free of the server: no eventlet
+monkey-patching, no Flask or Socket.IO objects, and no caches, pools or LLM clients.
+"""
+import io
+import os
+import re
+import traceback
+
+import fitz  # PyMuPDF for PDF text extraction
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, Spacer, SimpleDocTemplate, HRFlowable
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
+from reportlab.lib import colors
+from docx import Document # For .docx files
+import openpyxl # For .xlsx files
+import numpy as np # For local resume/job description pre-scoring
+
+# Extraction limits: parsing stops early once any is reached, bounding memory and prompt size per upload. 0 disables a limit.
+EXTRACTION_MAX_PAGES = int(os.environ.get("EXTRACTION_MAX_PAGES", "50")) # PDF pages
+EXTRACTION_MAX_ROWS = int(os.environ.get("EXTRACTION_MAX_ROWS", "5000")) # spreadsheet rows across all sheets
+EXTRACTION_MAX_CHARS = int(os.environ.get("EXTRACTION_MAX_CHARS", "100000")) # total extracted characters
+PDF_PAGE_BREAK = "\f" # Separates PDF pages in extracted text, so page headers and footers can be recognised
+
+# Local pre-score and candidate ranking
+PRESCORE_MAX_KEYWORDS = int(os.environ.get("PRESCORE_MAX_KEYWORDS", "15")) # matched/missing keywords reported
+BM25_K1 = 1.5 # term frequency saturation
+BM25_B = 0.75 # resume length normalisation
+
+
+# --- Worker Process Entry Point ---
+
+def process_worker_main(conn):
+    """Entry point of pool worker processes: runs the tasks received over `conn` until told to stop."""
+    # The pipe was created in the server, where eventlet makes sockets non-blocking; this process is not
+    # monkey-patched, so reads must block until the next task arrives
+    os.set_blocking(conn.fileno(), True)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        fn, args, kwargs = task
+        try:
+            result = (True, fn(*args, **kwargs))
+        except Exception as e:
+            traceback.print_exc()
+            result = (False, f"{type(e).__name__}: {e}")
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send((False, f"Could not send the task result back: {e}"))
+
+
+# --- Text Extraction ---
+
+def join_text_chunks(chunks, max_chars=None):
+    """
+    Joins text chunks from an extraction generator once, instead of growing a string per chunk.
+    Stops pulling chunks (and so stops parsing) as soon as `max_chars` characters are collected.
+    """
+    max_chars = EXTRACTION_MAX_CHARS if max_chars is None else max_chars
+    parts = []
+    total = 0
+    try:
+        for chunk in chunks:
+            if max_chars and total + len(chunk) >= max_chars:
+                parts.append(chunk[:max_chars - total])
+                print(f"INFO: Extraction stopped early at the {max_chars} character limit.")
+                break
+            parts.append(chunk)
+            total += len(chunk)
+    finally:
+        chunks.close() # Releases the parser when stopping early
+    return "".join(parts)
+
+def iter_pdf_text(pdf_bytes, max_pages=None):
+    """
+    Yields the text of each PDF page using PyMuPDF, up to `max_pages` pages.
+    """
+    max_pages = EXTRACTION_MAX_PAGES if max_pages is None else max_pages
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        page_count = min(len(doc), max_pages) if max_pages else len(doc)
+        if page_count < len(doc):
+            print(f"INFO: Reading the first {page_count} of {len(doc)} PDF pages.")
+        for page_num in range(page_count):
+            if page_num:
+                yield PDF_PAGE_BREAK
+            yield doc.load_page(page_num).get_text()
+    finally:
+        doc.close()
+
+def iter_docx_text(docx_bytes):
+    """
+    Yields the text of each DOCX paragraph using python-docx.
+    """
+    doc = Document(io.BytesIO(docx_bytes))
+    for paragraph in doc.paragraphs:
+        yield paragraph.text + "\n"
+
+def iter_xlsx_text(xlsx_bytes, max_rows=None):
+    """
+    Yields one line per non-empty spreadsheet row using openpyxl in read-only mode, so cells are
+    streamed from the file rather than materialized. Formula cells yield their formula, as before
+    streaming. Stops after `max_rows` rows in total.
+    """
+    max_rows = EXTRACTION_MAX_ROWS if max_rows is None else max_rows
+    workbook = openpyxl.load_workbook(io.BytesIO(xlsx_bytes), read_only=True)
+    try:
+        rows_read = 0
+        for sheet in workbook.worksheets:
+            yield f"--- Sheet: {sheet.title} ---\n"
+            for row in sheet.iter_rows(values_only=True):
+                if max_rows and rows_read >= max_rows:
+                    print(f"INFO: Reading the first {max_rows} spreadsheet rows only.")
+                    return
+                rows_read += 1
+                row_values = [str(value) for value in row if value is not None]
+                if row_values:
+                    yield " ".join(row_values) + "\n"
+            yield "\n"
+    finally:
+        workbook.close()
+
+def extract_text_from_pdf(pdf_bytes):
+    """
+    Extracts text content from PDF bytes using PyMuPDF.
+    """
+    try:
+        return join_text_chunks(iter_pdf_text(pdf_bytes))
+    except Exception as e:
+        print(f"Error extracting text from PDF: {e}")
+        return None
+
+def extract_text_from_docx(docx_bytes):
+    """
+    Extracts text content from DOCX bytes using python-docx.
+    """
+    try:
+        return join_text_chunks(iter_docx_text(docx_bytes))
+    except Exception as e:
+        print(f"Error extracting text from DOCX: {e}")
+        return None
+
+def extract_text_from_xlsx(xlsx_bytes):
+    """
+    Extracts text content from XLSX bytes using openpyxl.
+    Iterates through all sheets and rows.
+    """
+    try:
+        return join_text_chunks(iter_xlsx_text(xlsx_bytes))
+    except Exception as e:
+        print(f"Error extracting text from XLSX: {e}")
+        return None
+
+# Extractor for each supported MIME type
+TEXT_EXTRACTORS = {
+    'application/pdf': extract_text_from_pdf,
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': extract_text_from_docx,
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': extract_text_from_xlsx,
+}
+
+def extract_text_from_document(file_bytes, file_type):
+    """
+    Extracts text from a document of any supported type.
+    Runs inside an extraction worker process (see extract_text_off_loop in app.py).
+    """
+    return TEXT_EXTRACTORS[file_type](file_bytes)
+
+
+# --- Resume PDF Templates ---
+
+class ResumeTemplate:
+    """
+    A named resume layout: page size, margins, fonts and precompiled ReportLab paragraph styles.
+    Templates are built once at startup (see RESUME_TEMPLATES); rendering only looks them up.
+    """
+
+    def __init__(self, name, fonts, margins=(inch, inch, inch, inch), pagesize=letter,
+                 heading_alignment=TA_CENTER, body_alignment=TA_JUSTIFY, accent_color=colors.black,
+                 heading_size=24, body_size=10, section_rule=False, bullet_char=None,
+                 content_title="--- Main Resume Content ---"):
+        self.name = name
+        self.fonts = fonts
+        self.pagesize = pagesize
+        self.margins = margins # (top, right, bottom, left)
+        self.accent_color = accent_color
+        self.section_rule = section_rule # Draw a rule under each section heading
+        self.bullet_char = bullet_char
+        self.content_title = content_title
+        self.styles = self._build_styles(heading_alignment, body_alignment, heading_size, body_size)
+
+    def _build_styles(self, heading_alignment, body_alignment, heading_size, body_size):
+        base = getSampleStyleSheet()
+        return {
+            'heading': ParagraphStyle(
+                f'{self.name} Heading',
+                parent=base['h1'],
+                fontName=self.fonts['bold'],
+                fontSize=heading_size,
+                leading=heading_size + 4,
+                alignment=heading_alignment,
+                textColor=self.accent_color,
+                spaceAfter=14
+            ),
+            'summary': ParagraphStyle(
+                f'{self.name} Summary',
+                parent=base['Normal'],
+                fontName=self.fonts['italic'],
+                fontSize=body_size + 1,
+                leading=body_size + 3,
+                alignment=heading_alignment,
+                spaceAfter=12
+            ),
+            'normal': ParagraphStyle(
+                f'{self.name} Normal',
+                parent=base['Normal'],
+                fontName=self.fonts['regular'],
+                fontSize=body_size,
+                leading=body_size + 2,
+                alignment=body_alignment,
+                spaceAfter=6
+            ),
+            'bullet': ParagraphStyle(
+                f'{self.name} Bullet',
+                parent=base['Normal'],
+                fontName=self.fonts['regular'],
+                fontSize=body_size,
+                leading=body_size + 2,
+                alignment=TA_LEFT,
+                leftIndent=0.5 * inch,
+                bulletIndent=0.25 * inch,
+                bulletFontName=self.fonts['regular'],
+                bulletColor=self.accent_color,
+                spaceAfter=3
+            ),
+            'h2': ParagraphStyle(
+                f'{self.name} H2',
+                parent=base['h2'],
+                fontName=self.fonts['bold'],
+                fontSize=body_size + 4,
+                leading=body_size + 6,
+                alignment=TA_LEFT,
+                textColor=self.accent_color,
+                spaceAfter=4 if self.section_rule else 10
+            ),
+        }
+
+    def section_heading(self, title):
+        """Returns the flowables for a section heading."""
+        flowables = [Paragraph(title, self.styles['h2'])]
+        if self.section_rule:
+            flowables.append(HRFlowable(width="100%", thickness=0.75, color=self.accent_color, spaceAfter=8))
+        return flowables
+
+
+HELVETICA_FONTS = {'regular': 'Helvetica', 'bold': 'Helvetica-Bold', 'italic': 'Helvetica-Oblique'}
+TIMES_FONTS = {'regular': 'Times-Roman', 'bold': 'Times-Bold', 'italic': 'Times-Italic'}
+
+# Templates offered in the edit dialog, keyed by the name the client sends
+RESUME_TEMPLATES = {
+    template.name: template for template in (
+        ResumeTemplate("Basic Template", HELVETICA_FONTS),
+        ResumeTemplate(
+            "Professional Template", TIMES_FONTS,
+            margins=(0.75 * inch, 0.9 * inch, 0.75 * inch, 0.9 * inch),
+            heading_alignment=TA_LEFT, heading_size=22, body_size=11,
+            section_rule=True, content_title="Experience and Qualifications",
+        ),
+        ResumeTemplate(
+            "Modern Template", HELVETICA_FONTS,
+            margins=(0.6 * inch, 0.7 * inch, 0.6 * inch, 0.7 * inch),
+            heading_alignment=TA_LEFT, body_alignment=TA_LEFT, accent_color=colors.HexColor("#1d4ed8"),
+            heading_size=26, section_rule=True, bullet_char="•", content_title="Resume",
+        ),
+    )
+}
+DEFAULT_RESUME_TEMPLATE = "Basic Template"
+
+def apply_edits_to_template(edited_text: str, revised_summary: str, template_name: str) -> bytes:
+    """
+    Applies edited resume text and revised summary to a selected template
+    and generates a PDF using ReportLab.
+
+    `template_name` selects a layout from RESUME_TEMPLATES (fonts, margins, styles);
+    unknown names fall back to the basic template.
+    """
+    template = RESUME_TEMPLATES.get(template_name)
+    if template is None:
+        print(f"WARNING: Unknown resume template '{template_name}', using '{DEFAULT_RESUME_TEMPLATE}'.")
+        template = RESUME_TEMPLATES[DEFAULT_RESUME_TEMPLATE]
+    styles = template.styles
+    top_margin, right_margin, bottom_margin, left_margin = template.margins
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=template.pagesize,
+                            rightMargin=right_margin, leftMargin=left_margin,
+                            topMargin=top_margin, bottomMargin=bottom_margin)
+
+    story = []
+
+    story.append(Paragraph(f"AI-Enhanced Resume ({template_name})", styles['heading']))
+    
+    if revised_summary:
+        story.extend(template.section_heading("Professional Summary"))
+        story.append(Paragraph(revised_summary, styles['summary']))
+        story.append(Spacer(1, 0.2 * inch))
+
+    story.extend(template.section_heading(template.content_title))
+
+    lines = edited_text.split('\n')
+    for line in lines:
+        stripped_line = line.strip()
+        if stripped_line.startswith('- '):
+            story.append(Paragraph(stripped_line.lstrip('- ').strip(), styles['bullet'], bulletText=template.bullet_char))
+        elif stripped_line:
+            story.append(Paragraph(stripped_line, styles['normal']))
+        else:
+            story.append(Spacer(1, 0.1 * inch))
+
+    try:
+        doc.build(story)
+    except Exception as e:
+        print(f"Error building PDF with ReportLab: {e}")
+        traceback.print_exc()
+        return generate_fallback_pdf(edited_text)
+
+    buffer.seek(0)
+    return buffer.getvalue()
+
+def generate_fallback_pdf(edited_text):
+    """
+    Draws a minimal one-page PDF with the start of the text, used when templated rendering fails.
+    """
+    fallback_buffer = io.BytesIO()
+    p_fallback = canvas.Canvas(fallback_buffer, pagesize=letter)
+    p_fallback.drawString(inch, letter[1] - inch, "Error generating templated PDF.")
+    p_fallback.drawString(inch, letter[1] - inch - 20, "Please see backend logs for details.")
+    p_fallback.drawString(inch, letter[1] - inch - 40, "Generated Content (Basic):")
+    p_fallback.drawString(inch, letter[1] - inch - 60, edited_text[:500] + "...")
+    p_fallback.save()
+    fallback_buffer.seek(0)
+    return fallback_buffer.getvalue()
+
+# MIME type of each preview image format PyMuPDF can write
+PREVIEW_IMAGE_MIMETYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+}
+
+def render_pdf_preview(pdf_bytes, dpi, image_format):
+    """
+    Rasterizes only the first page of a PDF to PNG or JPEG bytes using PyMuPDF.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        pixmap = doc.load_page(0).get_pixmap(dpi=dpi)
+        return pixmap.tobytes(output=image_format)
+    finally:
+        doc.close()
+
+
+# --- Local Pre-Scoring ---
+
+# Terms: lowercase words that may carry tech punctuation (c++, c#, node.js, ci/cd)
+PRESCORE_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+# Segments used as the documents for inverse document frequency: lines and sentences
+PRESCORE_SEGMENT_PATTERN = re.compile(r"\n+|(?<=[.!?;])\s+")
+PRESCORE_STOPWORDS = frozenset("""
+a about above across after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each etc few for from further had has have having he
+her here hers him his how i if in into is it its itself just me more most my no nor not of off on once only or
+other our ours out over own same she should so some such than that the their them then there these they this those
+through to too under until up upon very via was we were what when where which while who whom why will with would you
+your yours ability able across candidate candidates company degree excellent experience good great ideal including
+job join just knowledge looking must needed plus preferred required requirements responsibilities role seeking skills
+strong team using want work working year years
+apply applicants benefits bonus closely day demonstrated desired duties ensure environment equal essential employer
+employees highly key like may need needs new offer opportunities opportunity passionate per position proven
+qualifications related relevant responsible salary several understanding various well within
+""".split())
+
+
+def prescore_terms(text):
+    """
+    Returns the terms of a text: single words plus pairs of adjacent words (e.g. "machine learning"),
+    skipping stopwords and bare numbers.
+    """
+    terms = []
+    previous = None
+    for token in PRESCORE_TOKEN_PATTERN.findall(text.lower()):
+        if token in PRESCORE_STOPWORDS or token.isdigit() or len(token) < 2:
+            previous = None
+            continue
+        terms.append(token)
+        if previous is not None:
+            terms.append(f"{previous} {token}")
+        previous = token
+    return terms
+
+
+def compute_preliminary_analysis(resume_text, job_description, max_keywords=None):
+    """
+    Scores a resume against a job description locally, in milliseconds, without the LLM.
+
+    Each line or sentence of both texts is treated as a document to weight terms by TF-IDF,
+    so words repeated everywhere count less than specific skills. The score (1-10) blends the
+    share of the job description's single-word term weight found in the resume with the cosine
+    similarity of the two TF-IDF vectors (which also rewards shared word pairs). Returns None if either text has no usable terms.
+    """
+    max_keywords = PRESCORE_MAX_KEYWORDS if max_keywords is None else max_keywords
+    resume_segments = [terms for terms in map(prescore_terms, PRESCORE_SEGMENT_PATTERN.split(resume_text)) if terms]
+    jd_segments = [terms for terms in map(prescore_terms, PRESCORE_SEGMENT_PATTERN.split(job_description)) if terms]
+    if not resume_segments or not jd_segments:
+        return None
+
+    vocabulary = {}
+    def term_ids(segments):
+        ids = [vocabulary.setdefault(term, len(vocabulary)) for terms in segments for term in terms]
+        segment_ids = [vocabulary[term] for terms in segments for term in set(terms)]
+        return ids, segment_ids
+    resume_ids, resume_segment_ids = term_ids(resume_segments)
+    jd_ids, jd_segment_ids = term_ids(jd_segments)
+    vocabulary_size = len(vocabulary)
+
+    # Document frequency over segments, then sublinear TF-IDF vectors for the two texts
+    segment_count = len(resume_segments) + len(jd_segments)
+    df = np.bincount(resume_segment_ids + jd_segment_ids, minlength=vocabulary_size)
+    idf = np.log((segment_count + 1) / (df + 1)) + 1.0
+    resume_tf = np.bincount(resume_ids, minlength=vocabulary_size)
+    jd_tf = np.bincount(jd_ids, minlength=vocabulary_size)
+    resume_vector = np.log1p(resume_tf) * idf
+    jd_vector = np.log1p(jd_tf) * idf
+
+    similarity = float(resume_vector @ jd_vector / (np.linalg.norm(resume_vector) * np.linalg.norm(jd_vector)))
+    terms = list(vocabulary)
+    is_word = np.fromiter((' ' not in term for term in terms), dtype=bool, count=vocabulary_size)
+    in_resume = resume_tf > 0
+    coverage = float(jd_vector[in_resume & is_word].sum() / jd_vector[is_word].sum())
+    blended = 0.7 * coverage + 0.3 * min(1.0, similarity / 0.6)
+    score = int(max(1, min(10, round(1 + 9 * blended))))
+
+    # Keywords: the job description's heaviest terms; word pairs only if the JD repeats them
+    matched, missing = [], []
+    for index in np.argsort(-jd_vector, kind='stable'):
+        if jd_vector[index] <= 0 or (len(matched) >= max_keywords and len(missing) >= max_keywords):
+            break
+        term = terms[index]
+        if not is_word[index] and jd_tf[index] < 2:
+            continue
+        target = matched if in_resume[index] else missing
+        if len(target) < max_keywords:
+            target.append(term)
+
+    return {
+        'score': score,
+        'similarity': round(similarity, 3),
+        'keyword_coverage': round(coverage, 3),
+        'matched_keywords': matched,
+        'missing_keywords': missing,
+    }
+
+
+def rank_resumes(job_description, candidates, top_k=10, max_keywords=None):
+    """
+    Ranks many resumes against one job description with BM25, scoring all of them in one matrix operation.
+    `candidates` is a list of `(candidate_id, resume_text)`. Only the job description's terms are counted,
+    so the matrix is candidates x JD terms however long the resumes are.
+    Returns the best `top_k` candidates with keyword coverage, or None if the job description has no terms.
+    """
+    max_keywords = PRESCORE_MAX_KEYWORDS if max_keywords is None else max_keywords
+    jd_terms = prescore_terms(job_description)
+    if not jd_terms or not candidates:
+        return None
+
+    vocabulary = {}
+    for term in jd_terms:
+        vocabulary.setdefault(term, len(vocabulary))
+    terms = list(vocabulary)
+    term_count = len(terms)
+    candidate_count = len(candidates)
+
+    # Term frequency matrix built with a single bincount over flattened (row, term) indices
+    flat_ids = []
+    lengths = np.empty(candidate_count)
+    for row, (_, resume_text) in enumerate(candidates):
+        resume_terms = prescore_terms(resume_text)
+        lengths[row] = len(resume_terms)
+        offset = row * term_count
+        flat_ids.extend(offset + vocabulary[term] for term in resume_terms if term in vocabulary)
+    tf = np.bincount(flat_ids, minlength=candidate_count * term_count).reshape(candidate_count, term_count)
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((candidate_count - df + 0.5) / (df + 0.5))
+    query_weight = np.log1p(np.bincount([vocabulary[term] for term in jd_terms], minlength=term_count))
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+    saturated = tf * (BM25_K1 + 1) / (tf + length_norm[:, None])
+    scores = saturated @ (idf * query_weight)
+
+    is_word = np.fromiter((' ' not in term for term in terms), dtype=bool, count=term_count)
+    present = tf > 0
+    coverage = (present[:, is_word] @ query_weight[is_word]) / query_weight[is_word].sum()
+
+    # Keywords in order of importance; word pairs only if the JD repeats them
+    keyword_order = [index for index in np.argsort(-(idf + 1) * query_weight, kind='stable')
+                     if is_word[index] or query_weight[index] > np.log1p(1)]
+    best_score = float(scores.max()) or 1.0
+    ranking = []
+    for rank, row in enumerate(np.argsort(-scores, kind='stable')[:top_k], start=1):
+        matched = [terms[index] for index in keyword_order if present[row, index]][:max_keywords]
+        missing = [terms[index] for index in keyword_order if not present[row, index]][:max_keywords]
+        ranking.append({
+            'rank': rank,
+            'id': candidates[row][0],
+            'index': int(row),
+            'score': round(float(scores[row]), 4),
+            'relevance': round(100 * float(scores[row]) / best_score, 1), # Relative to the best candidate
+            'keyword_coverage': round(float(coverage[row]), 3),
+            'matched_keywords': matched,
+            'missing_keywords': missing,
+        })
+    return {
+        'candidates_scored': candidate_count,
+        'job_description_terms': term_count,
+        'ranking': ranking,
+    }